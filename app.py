@@ -1,122 +1,130 @@
 import streamlit as st
-import pandas as pd
-import requests
 from datetime import datetime
+import appender
+import cache
+import charts
 import config
-import os
+import history_index
+import lazy
+import log_setup
+import metrics
+import outbox
+import storage
 import logging
 import json
 
+# Loaded on first use, so importing the app and saving a set never pay for them
+pd = lazy.module('pandas')
+requests = lazy.module('requests')
+
+logger = logging.getLogger(__name__)
+
 # Set up logging
 def setup_logging(config_data):
     """Configure logging based on config settings."""
-    log_level = getattr(logging, config_data.get('log_level', 'INFO').upper())
-    log_format = config_data.get('log_format', '%(asctime)s - %(levelname)s - %(message)s')
-    
-    logging.basicConfig(
-        level=log_level,
-        format=log_format,
-        handlers=[
-            logging.StreamHandler(),
-            logging.FileHandler('workout_logger.log')
-        ]
-    )
+    log_setup.configure(config_data)
     return logging.getLogger(__name__)
 
-# Initialize logger
-logger = setup_logging(config.load_config())
+def setup_page():
+    """Set the page config and CSS for a mobile-first design."""
+    st.set_page_config(
+        page_title="Workout Logger",
+        page_icon="💪",
+        layout="wide",
+        initial_sidebar_state="collapsed"
+    )
 
-# Set page config for mobile-first design
-st.set_page_config(
-    page_title="Workout Logger",
-    page_icon="💪",
-    layout="wide",
-    initial_sidebar_state="collapsed"
-)
+    # Custom CSS for mobile-first design
+    st.markdown("""
+        <style>
+        .stButton>button {
+            width: 100%;
+            margin-top: 1rem;
+        }
+        .stTextInput>div>div>input {
+            width: 100%;
+        }
+        .stNumberInput>div>div>input {
+            width: 100%;
+        }
+        </style>
+    """, unsafe_allow_html=True)
 
-# Custom CSS for mobile-first design
-st.markdown("""
-    <style>
-    .stButton>button {
-        width: 100%;
-        margin-top: 1rem;
-    }
-    .stTextInput>div>div>input {
-        width: 100%;
-    }
-    .stNumberInput>div>div>input {
-        width: 100%;
-    }
-    </style>
-""", unsafe_allow_html=True)
+def load_history(filename, backend='csv'):
+    """Load workout history from the given storage backend.
 
-def load_history(filename):
-    """Load workout history from CSV file."""
-    if os.path.exists(filename):
-        try:
-            df = pd.read_csv(filename)
-            return {
-                'workouts': sorted(df['workout_name'].unique().tolist()),
-                'exercises': sorted(df['exercise_name'].unique().tolist()),
-                'data': df
-            }
-        except Exception:
-            return {'workouts': [], 'exercises': [], 'data': pd.DataFrame()}
-    return {'workouts': [], 'exercises': [], 'data': pd.DataFrame()}
+    CSV parsing is delegated to a process-wide incremental index, so a rerun
+    only pays for rows appended since the previous one.
+    """
+    try:
+        if backend == 'csv':
+            return history_index.get_history_index(filename).snapshot()
+        return storage.get_storage(config.get_config(), backend, filename).history()
+    except Exception as e:
+        logger.error(f"Failed to load history from {filename}: {str(e)}")
+        return {
+            'workouts': [], 'exercises': [], 'data': pd.DataFrame(), 'index': None, 'stats': None, 'suggestions': None
+        }
 
-def get_exercise_history(df, exercise_name):
-    """Get the last two workouts for a specific exercise."""
-    if df.empty:
-        return None
-    
-    # Filter for the exercise and sort by timestamp
-    exercise_data = df[df['exercise_name'] == exercise_name].sort_values('timestamp', ascending=False)
-    
-    if exercise_data.empty:
-        return None
-    
-    # Convert timestamp to datetime
-    exercise_data['timestamp'] = pd.to_datetime(exercise_data['timestamp'])
-    
-    # Get unique workout dates
-    workout_dates = exercise_data['timestamp'].dt.date.unique()
-    
-    history = []
-    for date in workout_dates[:2]:  # Get last two workouts
-        workout_data = exercise_data[exercise_data['timestamp'].dt.date == date]
-        sets = []
-        for _, row in workout_data.iterrows():
-            sets.append({
-                'set': row['set_number'],
-                'weight': row['weight_kg'],
-                'reps': row['reps']
-            })
-        history.append({
-            'date': date.strftime('%Y-%m-%d'),
-            'sets': sorted(sets, key=lambda x: x['set'])
-        })
-    
-    return history
+def get_exercise_history(df, exercise_name, sessions=2, index=None):
+    """Get the last workouts for a specific exercise.
+
+    Uses a prebuilt exercise index when one is given, otherwise builds one
+    from the DataFrame.
+    """
+    if index is None:
+        if df.empty:
+            return None
+        index = history_index.ExerciseIndex.from_frame(df)
+    return index.last_sessions(exercise_name, sessions)
+
+def format_exercise_stats(summary):
+    """Format an exercise's aggregates for the history expander."""
+    parts = []
+    if summary['best_weight'] is not None:
+        parts.append(f"**Best:** {summary['best_weight']:g}kg")
+    if summary['best_e1rm'] is not None:
+        parts.append(f"**Est. 1RM:** {summary['best_e1rm']:.1f}kg")
+    parts.append(f"**Sets:** {summary['sets']} in {summary['sessions']} sessions")
+    if summary['last_date']:
+        parts.append(f"**Last:** {summary['last_date']} ({summary['last_volume']:g}kg volume)")
+    return " · ".join(parts)
+
+def show_progress_chart(history, exercise_name, config_data):
+    """Chart an exercise's progress from the history's daily aggregates."""
+    if not config_data['chart_points'] or history.get('stats') is None:
+        return
+    labels = {label: metric for metric, label in charts.METRICS.items()}
+    label = st.radio("Progress", list(labels), horizontal=True, key='progress_metric')
+    with metrics.span('form.progress_chart'):
+        chart = charts.progress(
+            history['stats'], exercise_name, labels[label], config_data['chart_points'],
+            source=(config_data['storage_backend'], storage.storage_path(config_data))
+        )
+    if len(chart) > 1:
+        with charts.render_lock:
+            st.line_chart(chart)
 
 def save_to_csv(data, filename):
     """Save workout data to CSV file."""
-    df = pd.DataFrame([data])
-    if os.path.exists(filename):
-        df.to_csv(filename, mode='a', header=False, index=False)
-    else:
-        df.to_csv(filename, index=False)
+    appender.get_appender(filename, list(data)).append(data)
+
+def save_set(data, config_data):
+    """Save workout data to the configured storage backend."""
+    storage.get_storage(config_data).append(data)
 
 def send_to_webhook(data, webhook_url):
     """Send workout data to webhook."""
     try:
         logger.info(f"Attempting to send data to webhook: {webhook_url}")
-        logger.debug(f"Data payload: {json.dumps(data, indent=2)}")
+        logger.debug("Data payload: %s", log_setup.Lazy(json.dumps, data, indent=2))
         
-        response = requests.post(webhook_url, json=data)
+        with metrics.span('webhook.send'):
+            response = requests.post(webhook_url, json=data)
         response.raise_for_status()
         
         logger.info(f"Successfully sent data to webhook. Status code: {response.status_code}")
-        logger.debug(f"Response content: {response.text}")
+        logger.debug("Response content: %s", log_setup.Lazy(getattr, response, 'text'))
         return True
     except requests.exceptions.RequestException as e:
         logger.error(f"Failed to send data to webhook: {str(e)}")
@@ -127,9 +135,53 @@ def send_to_webhook(data, webhook_url):
         logger.error(f"Unexpected error while sending data to webhook: {str(e)}")
         return False
 
+def flush_webhook():
+    """Send any partially filled webhook batch right away in web mode."""
+    if st.session_state.get('mode') != "web":
+        return
+    try:
+        outbox.get_outbox(config.get_config()).flush()
+    except Exception as e:
+        logger.error(f"Failed to flush webhook outbox: {str(e)}")
+
+def is_known_name(history, field, name):
+    """Check whether a workout or exercise name appears in the history."""
+    suggestions = (history.get('suggestions') or {}).get(field)
+    if suggestions is not None:
+        return name in suggestions
+    return name in history['workouts' if field == 'workout_name' else 'exercises']
+
+def select_name(history, field, label, limit):
+    """Show a selectbox of the most used and most recent workout or exercise names.
+
+    At most ``limit`` names are listed; when there are more, a search box
+    narrows them down by prefix, substring or fuzzy match.
+    """
+    new_option = f"New {label}"
+    current = st.session_state.form_data.get(field)
+    suggestions = (history.get('suggestions') or {}).get(field)
+    if suggestions is None:
+        names = history['workouts' if field == 'workout_name' else 'exercises']
+    elif len(suggestions) > limit:
+        query = st.text_input(f"Search {label.lower()}s", key=f"{field}_search")
+        names = suggestions.suggest(query, limit)
+    else:
+        names = suggestions.suggest(limit=limit)
+
+    options = [new_option] + list(names)
+    # Keep the current choice selectable even when it drops out of the ranking
+    if current and current not in options and is_known_name(history, field, current):
+        options.insert(1, current)
+    return st.selectbox(
+        f"Select {label}",
+        options,
+        index=options.index(current) if current in options else 0
+    )
+
 def get_workout_form():
     """Display and handle the workout form."""
-    config_data = config.load_config()
+    with metrics.span('form.config'):
+        config_data = config.get_config()
     
     # Initialize session state for form data if not exists
     if 'form_data' not in st.session_state:
@@ -146,7 +198,8 @@ def get_workout_form():
         st.session_state.last_workout = None
     
     # Load history for dropdowns
-    history = load_history(config_data['local_file'])
+    with metrics.span('form.load_history'):
+        history = load_history(storage.storage_path(config_data), config_data['storage_backend'])
     
     # Required fields
     for field in config_data['required_fields']:
@@ -174,14 +227,8 @@ def get_workout_form():
             col1, col2 = st.columns([3, 1])
             with col1:
                 # Always show the selectbox, even if no history
-                options = ["New Workout"]
-                if history['workouts']:
-                    options.extend(history['workouts'])
-                
-                st.session_state.form_data[field] = st.selectbox(
-                    "Select Workout",
-                    options,
-                    format_func=lambda x: "New Workout" if x == "New Workout" else x
+                st.session_state.form_data[field] = select_name(
+                    history, field, "Workout", config_data['suggestion_limit']
                 )
             with col2:
                 if st.session_state.form_data.get(field) == "New Workout":
@@ -194,14 +241,8 @@ def get_workout_form():
             col1, col2 = st.columns([3, 1])
             with col1:
                 # Always show the selectbox, even if no history
-                options = ["New Exercise"]
-                if history['exercises']:
-                    options.extend(history['exercises'])
-                
-                st.session_state.form_data[field] = st.selectbox(
-                    "Select Exercise",
-                    options,
-                    format_func=lambda x: "New Exercise" if x == "New Exercise" else x
+                st.session_state.form_data[field] = select_name(
+                    history, field, "Exercise", config_data['suggestion_limit']
                 )
             with col2:
                 if st.session_state.form_data.get(field) == "New Exercise":
@@ -213,11 +254,26 @@ def get_workout_form():
             # Show exercise history if an existing exercise is selected
             if (st.session_state.form_data.get(field) and 
                 st.session_state.form_data[field] != "New Exercise" and 
-                st.session_state.form_data[field] in history['exercises']):
+                is_known_name(history, field, st.session_state.form_data[field])):
                 
-                exercise_history = get_exercise_history(history['data'], st.session_state.form_data[field])
+                # The index avoids copying the shared history frame
+                index = history.get('index')
+                with metrics.span('form.exercise_history'):
+                    exercise_history = get_exercise_history(
+                        history['data'] if index is None else None,
+                        st.session_state.form_data[field],
+                        sessions=config_data['history_sessions'],
+                        index=index
+                    )
+                exercise_stats = None
+                if history.get('stats') is not None:
+                    exercise_stats = history['stats'].exercise(st.session_state.form_data[field])
                 if exercise_history:
                     with st.expander("📊 Exercise History"):
+                        if exercise_stats:
+                            st.write(format_exercise_stats(exercise_stats))
+                            st.markdown("---")
+                        show_progress_chart(history, st.session_state.form_data[field], config_data)
                         for workout in exercise_history:
                             st.write(f"**Date:** {workout['date']}")
                             for set_data in workout['sets']:
@@ -295,7 +351,8 @@ def main():
         
         if st.session_state.workout_active:
             st.subheader("Log Exercise")
-            form_data = get_workout_form()
+            with metrics.span('form'):
+                form_data = get_workout_form()
             
             # Show current workout status
             if form_data.get('workout_name'):
@@ -305,17 +362,22 @@ def main():
             
             # Save button
             if st.button("Save Set", use_container_width=True):
-                config_data = config.load_config()
+                config_data = config.get_config()
                 
-                # Save to CSV regardless of mode
-                save_to_csv(form_data, config_data['local_file'])
+                # Save locally regardless of mode
+                with metrics.span('save'):
+                    save_set(form_data, config_data)
+                metrics.inc('sets_saved')
                 
-                # Send to webhook if in web mode
+                # Queue for webhook delivery if in web mode
                 if st.session_state.mode == "web":
-                    if send_to_webhook(form_data, config_data['webhook_url']):
-                        st.success("Set saved and sent to webhook!")
-                    else:
-                        st.error("Failed to send data to webhook")
+                    try:
+                        with metrics.span('webhook.queue'):
+                            outbox.get_outbox(config_data).put(form_data)
+                        st.success("Set saved and queued for webhook!")
+                    except Exception as e:
+                        logger.error(f"Failed to queue data for webhook: {str(e)}")
+                        st.error("Failed to queue data for webhook")
                 else:
                     st.success("Set saved locally!")
                 
@@ -335,6 +397,7 @@ def main():
             col1, col2 = st.columns(2)
             with col1:
                 if st.button("New Exercise", use_container_width=True):
+                    flush_webhook()
                     st.session_state.form_data = {
                         'workout_name': form_data.get('workout_name')
                     }
@@ -345,6 +408,7 @@ def main():
                     st.rerun()
             with col2:
                 if st.button("End Workout", use_container_width=True):
+                    flush_webhook()
                     st.session_state.workout_active = False
                     st.session_state.current_exercise = None
                     st.session_state.set_count = 1
@@ -352,5 +416,37 @@ def main():
                     st.session_state.last_workout = None
                     st.rerun()
 
+def show_metrics_panel(config_data):
+    """Show the timings of the last rerun in a debug sidebar panel."""
+    if not (config_data['metrics_enabled'] and config_data['metrics_panel']):
+        return
+    data = metrics.registry.snapshot()
+    with st.sidebar.expander("⏱️ Timings", expanded=True):
+        for name, seconds in sorted(data['last'].items()):
+            histogram = data['histograms'][name]
+            mean = histogram['sum'] / histogram['count']
+            st.write(f"**{name}**: {seconds * 1000:.1f} ms (mean {mean * 1000:.1f} ms over {histogram['count']})")
+        for name, value in sorted(data['counters'].items()):
+            st.write(f"{name}: {value}")
+        usage = cache.shared.stats()
+        st.write(f"history cache: {usage['entries']} entries, "
+                 f"{usage['bytes'] / 2**20:.1f} of {usage['budget_bytes'] / 2**20:.0f} MB")
+
+def run():
+    """Run the app once, timing the whole rerun when metrics are enabled."""
+    config_data = config.get_config()
+    setup_logging(config_data)
+    setup_page()
+    metrics.configure(config_data)
+    cache.configure(config_data)
+    metrics.inc('reruns')
+    with metrics.span('rerun'):
+        main()
+    show_metrics_panel(config_data)
+    try:
+        metrics.maybe_export(config_data)
+    except OSError as e:
+        logger.error(f"Failed to export metrics to {config_data['metrics_file']}: {str(e)}")
+
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    run() 
\ No newline at end of file
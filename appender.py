@@ -0,0 +1,168 @@
+import csv
+import io
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+
+def _lock(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+
+
+def _unlock(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+class CsvAppender:
+    """Pandas-free, lock-protected appender for the training log CSV.
+
+    Each append encodes the rows in a fixed column order and writes them
+    with a single ``write`` on an ``O_APPEND`` descriptor while holding an
+    exclusive file lock, so concurrent writers in other threads or processes
+    can neither interleave rows nor write a second header. The column order
+    is the existing file's header, or ``columns`` for a new file.
+
+    ``fsync_every`` and ``fsync_interval`` enable group commit: the file is
+    fsynced once per that many appended rows or seconds rather than after
+    every row. Both default to 0, which leaves flushing to the OS.
+    """
+
+    def __init__(self, path, columns, fsync_every=0, fsync_interval=0.0):
+        self.path = path
+        self.columns = list(columns)
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._fd = None
+        self._inode = None
+        self._fieldnames = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._warned_extra = False
+
+    def _open(self):
+        try:
+            inode = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            inode = None
+        if self._fd is not None and inode == self._inode:
+            return
+        # First use, or the file was removed or replaced underneath us
+        self.close()
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._inode = os.fstat(self._fd).st_ino
+        self._fieldnames = None
+
+    def _replaced(self):
+        try:
+            return os.stat(self.path).st_ino != self._inode
+        except FileNotFoundError:
+            return True
+
+    def _read_header(self):
+        with open(self.path, newline='') as f:
+            return next(csv.reader(f), None)
+
+    def _encode(self, rows, header):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        if header:
+            writer.writerow(self._fieldnames)
+        for record in rows:
+            writer.writerow([record.get(column) for column in self._fieldnames])
+            extra = set(record) - set(self._fieldnames)
+            if extra and not self._warned_extra:
+                logger.warning(f"Ignoring fields not in {self.path} header: {sorted(extra)}")
+                self._warned_extra = True
+        return buffer.getvalue().encode('utf-8')
+
+    def append(self, record):
+        """Append a single set."""
+        self.append_many([record])
+
+    def append_many(self, records):
+        """Append several sets with one write."""
+        if not records:
+            return
+        with self._lock:
+            self._open()
+            _lock(self._fd)
+            while self._replaced():
+                # Another process swapped the file between open and lock
+                _unlock(self._fd)
+                self._open()
+                _lock(self._fd)
+            try:
+                # Decided under the file lock, so only one writer ever adds the header
+                write_header = os.fstat(self._fd).st_size == 0
+                if write_header:
+                    self._fieldnames = self.columns
+                elif self._fieldnames is None:
+                    self._fieldnames = self._read_header() or self.columns
+                os.write(self._fd, self._encode(records, write_header))
+                self._unsynced += len(records)
+                if self._sync_due():
+                    self._sync()
+            finally:
+                _unlock(self._fd)
+
+    def _sync_due(self):
+        if self.fsync_every and self._unsynced >= self.fsync_every:
+            return True
+        return bool(self.fsync_interval) and time.monotonic() - self._last_sync >= self.fsync_interval
+
+    def _sync(self):
+        os.fsync(self._fd)
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def sync(self):
+        """Force appended rows to disk."""
+        with self._lock:
+            if self._fd is not None and self._unsynced:
+                self._sync()
+
+    def close(self):
+        """Sync pending rows and close the file."""
+        if self._fd is None:
+            return
+        if self._unsynced and (self.fsync_every or self.fsync_interval):
+            os.fsync(self._fd)
+        os.close(self._fd)
+        self._fd = None
+        self._unsynced = 0
+
+
+_appenders = {}
+_appenders_lock = threading.Lock()
+
+
+def get_appender(path, columns, fsync_every=0, fsync_interval=0.0):
+    """Return the process-wide appender for a log file."""
+    key = os.path.abspath(path)
+    with _appenders_lock:
+        appender = _appenders.get(key)
+        if appender is None:
+            appender = CsvAppender(path, columns, fsync_every, fsync_interval)
+            _appenders[key] = appender
+        else:
+            appender.fsync_every = fsync_every
+            appender.fsync_interval = fsync_interval
+    return appender
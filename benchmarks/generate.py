@@ -0,0 +1,91 @@
+"""Seeded generator for synthetic training logs.
+
+    python -m benchmarks.generate training_log.csv --rows 1000000 --seed 0
+"""
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+import config
+import storage
+
+WORKOUTS = [f"Workout {letter}" for letter in 'ABCDEFGH']
+EXERCISES_PER_WORKOUT = 8
+SETS_PER_EXERCISE = 4
+SETS_PER_SESSION = 20
+SESSION_SPACING = 2 * 86400  # Seconds between sessions
+MAX_SPAN = 20 * 365 * 86400  # Large logs pack sessions closer to stay within this many seconds
+CHUNK_ROWS = 1_000_000
+
+
+def exercise_names():
+    return [f"{workout} Exercise {i + 1}" for workout in WORKOUTS for i in range(EXERCISES_PER_WORKOUT)]
+
+
+def session_spacing(total_rows):
+    """Seconds between sessions for a log of ``total_rows`` sets."""
+    sessions = max(total_rows // SETS_PER_SESSION, 1)
+    return max(min(SESSION_SPACING, MAX_SPAN // sessions), 3600)
+
+
+def generate_frame(rows, seed=0, start='2000-01-01', start_row=0, spacing=SESSION_SPACING):
+    """Return ``rows`` synthetic sets; the same seed always gives the same log.
+
+    Sets are grouped into sessions of ``SETS_PER_SESSION`` sets, one workout
+    per session and ``SETS_PER_EXERCISE`` sets per exercise, one session
+    every ``spacing`` seconds and weights that slowly progress.
+    """
+    rng = np.random.default_rng([seed, start_row])
+    row = np.arange(start_row, start_row + rows)
+    session = row // SETS_PER_SESSION
+    position = row % SETS_PER_SESSION
+
+    workout = session % len(WORKOUTS)
+    slot = (position // SETS_PER_EXERCISE + session // len(WORKOUTS)) % EXERCISES_PER_WORKOUT
+    exercise = workout * EXERCISES_PER_WORKOUT + slot
+    names = np.array(exercise_names())
+
+    offset = session * spacing + 6 * 3600 + position * 150
+    base = np.datetime64(start, 's') + offset.astype('timedelta64[s]')
+    progress = 1.5 - 0.5 * np.exp(-session / 500)
+    weight = np.round((20 + exercise % 13 * 7.5) * progress + rng.normal(0, 2.5, rows), 1).clip(0)
+
+    return pd.DataFrame({
+        'workout_name': np.array(WORKOUTS)[workout],
+        'exercise_name': names[exercise],
+        'set_number': position % SETS_PER_EXERCISE + 1,
+        'weight_kg': weight,
+        'reps': rng.integers(5, 13, rows),
+        'rpe': rng.integers(6, 11, rows),
+        'rest_sec': rng.integers(60, 241, rows),
+        'notes': np.where(rng.random(rows) < 0.05, 'felt good', ''),
+        'timestamp': np.datetime_as_string(base, unit='s')
+    })
+
+
+def generate_log(path, rows, seed=0, columns=None):
+    """Write a synthetic CSV log of ``rows`` sets to ``path`` in chunks."""
+    columns = columns or storage.log_columns(config.DEFAULT_CONFIG)
+    spacing = session_spacing(rows)
+    for start_row in range(0, max(rows, 1), CHUNK_ROWS):
+        count = min(CHUNK_ROWS, rows - start_row)
+        frame = generate_frame(count, seed, start_row=start_row, spacing=spacing).reindex(columns=columns)
+        frame.to_csv(path, mode='w' if start_row == 0 else 'a', header=start_row == 0, index=False)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic training log")
+    parser.add_argument('path', help="CSV file to write")
+    parser.add_argument('--rows', type=int, default=100_000, help="Number of sets")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed")
+    args = parser.parse_args(argv)
+    generate_log(args.path, args.rows, args.seed)
+    print(f"Wrote {args.rows} sets to {args.path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,324 @@
+"""Load test of many concurrent lifters against one app process.
+
+    python -m benchmarks.load_test --sessions 1,4,16 --sets 10 --rows 10000
+    python -m benchmarks.load_test --sessions 32 --mode local --output load.json
+
+Every simulated session is a Streamlit ``AppTest`` driving the real page
+in its own thread: pick a mode, start a workout, pick a workout and an
+exercise from the history, save ``--sets`` sets and end the workout. All
+sessions share one process, so they share the history cache, the CSV
+appender and the outbox, like the sessions of a single server; in Web
+Mode the outbox delivers to a local stub webhook.
+
+For each number of concurrent sessions the run reports the p50, p95 and
+p99 latency of a rerun, throughput in sets and reruns per second, and
+errors: exceptions raised in a session, and sets that went missing from
+or came out malformed in the shared log.
+
+Streamlit's ``AppTest`` is built for one test at a time: every run swaps
+a process-wide mock runtime in and out, compiles the script afresh, and
+clicked buttons stay pressed through the pass started by ``st.rerun()``.
+``ConcurrentAppTest`` behaves like a real server instead: one runtime and
+one compiled script shared by all sessions, and buttons released before
+such a pass, so sessions can overlap.
+
+That takes Streamlit internals which are not a public API and change
+between releases: ``AppTest._run``, ``LocalScriptRunner._script_cache``
+and ``_on_script_finished``, ``SafeSessionState._state._reset_triggers``
+and ``Runtime._instance``. The harness refuses to run on any Streamlit
+but ``STREAMLIT_VERSION``, the release pinned in ``requirements.txt``;
+re-check those internals before moving the pin.
+"""
+import argparse
+import csv
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from datetime import datetime
+from unittest.mock import MagicMock
+from urllib import parse
+
+import streamlit
+import yaml
+from streamlit.runtime import Runtime
+from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+from streamlit.runtime.scriptrunner import ScriptRunnerEvent
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+
+import cache
+import config
+import outbox
+from benchmarks.generate import generate_log
+from benchmarks.stub_server import StubWebhook
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOG_FILE = 'training_log.csv'
+MODES = {'web': "Web Mode", 'local': "Local Mode"}
+# The only Streamlit release whose internals the harness was validated against
+STREAMLIT_VERSION = '1.31.1'
+# Compiling the script in many threads at once trips over CPython's AST
+# constructor; a server compiles it once for all sessions too
+SCRIPT_CACHE = ScriptCache()
+
+
+def percentile(samples, q):
+    """Return the ``q``-th percentile (0-100) of ``samples`` by the nearest-rank method."""
+    if not samples:
+        return None
+    samples = sorted(samples)
+    rank = max(1, -(-len(samples) * q // 100))  # ceil without floats
+    return samples[int(rank) - 1]
+
+
+class RerunSafeScriptRunner(LocalScriptRunner):
+    """Script runner that shares the compiled script and releases clicked
+    buttons before a pass started by ``st.rerun()``.
+
+    The test runner keeps buttons pressed so tests can inspect them, which
+    makes a button whose handler calls ``st.rerun()`` fire on every pass.
+    """
+
+    def __init__(self, script_path, session_state):
+        super().__init__(script_path, session_state)
+        self._script_cache = SCRIPT_CACHE
+
+    def _on_script_finished(self, ctx, event, premature_stop):
+        if event == ScriptRunnerEvent.SCRIPT_STOPPED_FOR_RERUN:
+            self._session_state._state._reset_triggers()
+        super()._on_script_finished(ctx, event, premature_stop)
+
+
+def check_streamlit_version(version=None):
+    """Raise RuntimeError unless the installed Streamlit is the validated one."""
+    version = version or streamlit.__version__
+    if version != STREAMLIT_VERSION:
+        raise RuntimeError(
+            f"The load test relies on Streamlit internals validated on {STREAMLIT_VERSION} only, "
+            f"found {version}; install streamlit=={STREAMLIT_VERSION} or re-validate the harness"
+        )
+
+
+def install_runtime():
+    """Install one mock runtime shared by every ``ConcurrentAppTest``."""
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage('/mock/media'))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime._instance = runtime
+
+
+class ConcurrentAppTest(AppTest):
+    """``AppTest`` whose runs may overlap in threads of one process.
+
+    Requires ``install_runtime()``; secrets and multipage apps are not
+    supported.
+    """
+
+    def _run(self, widget_state=None, timeout=None):
+        runner = RerunSafeScriptRunner(self._script_path, self.session_state)
+        self._tree = runner.run(widget_state, self.query_params, timeout or self.default_timeout)
+        self._tree._runner = self
+        self.query_params = parse.parse_qs(runner.event_data[-1]['client_state'].query_string)
+        return self
+
+
+class Session:
+    """One simulated lifter: a page driven through a full workout."""
+
+    def __init__(self, number, sets, mode='web', timeout=60):
+        self.number = number
+        self.sets = sets
+        self.mode = mode
+        self.timeout = timeout
+        self.latencies = []
+        self.errors = []
+        self.saved = 0  # "Save Set" clicks whose page ran without an exception
+
+    def _run(self, element=None):
+        """Rerun the page, after interacting with ``element`` if given, and time it.
+
+        Returns False if the page raised an exception.
+        """
+        started = time.perf_counter()
+        (element or self.at).run(timeout=self.timeout)
+        self.latencies.append(time.perf_counter() - started)
+        for exception in self.at.exception:
+            self.errors.append(exception.message)
+        return not self.at.exception
+
+    def _button(self, label):
+        return next(button for button in self.at.button if button.label == label)
+
+    def _select_existing(self, position):
+        selectbox = self.at.selectbox[position]
+        options = [option for option in selectbox.options if not option.startswith('New ')]
+        # Spread the sessions over the logged names
+        self._run(selectbox.select(options[self.number % len(options)]))
+
+    def run(self):
+        """Drive the workout; errors are recorded rather than raised."""
+        try:
+            self.at = ConcurrentAppTest(os.path.join(ROOT, 'app.py'), default_timeout=self.timeout)
+            self._run()
+            self._run(self._button(MODES[self.mode]).click())
+            # "Start New Workout" calls st.rerun(); AppTest runs the follow-up pass itself
+            self._run(self._button("Start New Workout").click())
+            self._select_existing(0)
+            self._select_existing(1)
+            for _ in range(self.sets):
+                if self._run(self._button("Save Set").click()):
+                    self.saved += 1
+            self._run(self._button("End Workout").click())
+        except Exception as e:
+            self.errors.append(f"{type(e).__name__}: {e}")
+            traceback.print_exc(file=sys.stderr)
+        return self
+
+
+def check_log(path, columns):
+    """Return ``(rows, malformed rows)`` of a CSV log."""
+    rows = malformed = 0
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            rows += 1
+            if len(row) != columns:
+                malformed += 1
+    return rows, malformed
+
+
+def wait_for(condition, timeout):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return condition()
+
+
+def run_level(sessions, sets, rows, stub, mode='web', seed=0, timeout=60):
+    """Run ``sessions`` concurrent workouts against a fresh log and return their results."""
+    generate_log(LOG_FILE, rows, seed)
+    cache.shared.clear()
+    with open(LOG_FILE, newline='') as f:
+        columns = len(next(csv.reader(f)))
+    delivered_before = len(stub.payloads)
+
+    workers = [Session(number, sets, mode, timeout) for number in range(sessions)]
+    threads = [threading.Thread(target=worker.run, name=f'load-session-{worker.number}') for worker in workers]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+
+    logged, malformed = check_log(LOG_FILE, columns)
+    # The log is the ground truth; a set counts as missing if a clean save left no row
+    saved = logged - rows
+    missing = max(0, sum(worker.saved for worker in workers) - saved)
+    delivered = None
+    if mode == 'web':
+        wait_for(lambda: len(stub.payloads) - delivered_before >= saved, timeout)
+        delivered = len(stub.payloads) - delivered_before
+
+    latencies = [latency for worker in workers for latency in worker.latencies]
+    errors = [error for worker in workers for error in worker.errors]
+    return {
+        'sessions': sessions,
+        'reruns': len(latencies),
+        'sets_saved': saved,
+        'seconds': seconds,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+        'max': max(latencies, default=None),
+        'sets_per_second': saved / seconds if seconds else 0.0,
+        'reruns_per_second': len(latencies) / seconds if seconds else 0.0,
+        'session_errors': len(errors),
+        'missing_sets': missing,
+        'malformed_rows': malformed,
+        'webhook_delivered': delivered,
+        'error_samples': sorted(set(errors))[:5]
+    }
+
+
+def run_load_test(levels, sets=10, rows=10000, mode='web', seed=0, timeout=60):
+    """Run every concurrency level in a temporary working directory and return the JSON-ready results."""
+    check_streamlit_version()
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix='workout-load-')
+    stub = StubWebhook()
+    results = []
+    try:
+        os.chdir(workdir)
+        sys.path.insert(0, ROOT)
+        install_runtime()
+        with open(config.CONFIG_FILE, 'w') as f:
+            yaml.dump({'local_file': LOG_FILE, 'log_level': 'WARNING', 'webhook_url': stub.url}, f)
+        for sessions in levels:
+            result = run_level(sessions, sets, rows, stub, mode, seed, timeout)
+            results.append(result)
+            print(format_result(result), file=sys.stderr)
+    finally:
+        outbox_dir = os.path.abspath(config.DEFAULT_CONFIG['outbox_dir'])
+        entry = outbox._outboxes.pop(outbox_dir, None)
+        if entry is not None:
+            entry[0].stop(timeout=5)
+        Runtime._instance = None
+        stub.close()
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'meta': {
+            'created': datetime.now().isoformat(),
+            'levels': list(levels),
+            'sets': sets,
+            'rows': rows,
+            'mode': mode,
+            'seed': seed
+        },
+        'results': results
+    }
+
+
+def format_result(result):
+    errors = result['session_errors'] + result['missing_sets'] + result['malformed_rows']
+    p50, p95, p99 = (1000 * (result[name] or 0.0) for name in ('p50', 'p95', 'p99'))
+    return (f"{result['sessions']:4d} sessions: p50 {p50:8.1f} ms  p95 {p95:8.1f} ms  p99 {p99:8.1f} ms  "
+            f"{result['sets_per_second']:7.1f} sets/s  {result['reruns_per_second']:7.1f} reruns/s  "
+            f"{errors} errors")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the workout logger with concurrent sessions")
+    parser.add_argument('--sessions', default='1,4,16', help="Comma-separated numbers of concurrent sessions")
+    parser.add_argument('--sets', type=int, default=10, help="Sets saved by every session")
+    parser.add_argument('--rows', type=int, default=10000, help="Sets in the log before the test")
+    parser.add_argument('--mode', choices=list(MODES), default='web',
+                        help="Web Mode also delivers every set to a local stub webhook")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the generated log")
+    parser.add_argument('--timeout', type=float, default=60, help="Seconds a single rerun may take")
+    parser.add_argument('--output', default='load_test_results.json', help="Where to write the JSON results")
+    args = parser.parse_args(argv)
+
+    levels = [int(level) for level in args.sessions.split(',') if level]
+    current = run_load_test(levels, args.sets, args.rows, args.mode, args.seed, args.timeout)
+    with open(args.output, 'w') as f:
+        json.dump(current, f, indent=2)
+    print(f"Wrote {args.output}")
+    failed = any(result['session_errors'] or result['missing_sets'] or result['malformed_rows']
+                 for result in current['results'])
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
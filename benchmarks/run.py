@@ -0,0 +1,272 @@
+"""Reproducible benchmarks for the workout logger's hot paths.
+
+    python -m benchmarks.run --sizes 1000,100000 --output results.json
+    python -m benchmarks.run --baseline results.json --threshold 1.25
+
+Every benchmark runs offline inside a temporary working directory against
+logs from ``benchmarks.generate``; webhook delivery goes to a local stub
+server. Results are written as JSON, and with ``--baseline`` any benchmark
+whose median got slower than ``threshold`` times the baseline median is
+reported and the run exits with status 1.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import yaml
+
+import cache
+import config
+from benchmarks.generate import exercise_names, generate_frame, generate_log
+from benchmarks.stub_server import StubWebhook
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOG_FILE = 'training_log.csv'
+# Modules whose cold import is timed: the app, the save path and the headless importer
+IMPORT_TARGETS = ('app', 'storage', 'importer')
+HEAVY_MODULES = ('pandas', 'requests', 'streamlit')
+IMPORT_CODE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+print(json.dumps({{'seconds': time.perf_counter() - start,
+                  'loaded': [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def summarize(samples):
+    """Summarize durations in seconds."""
+    samples = sorted(samples)
+    return {
+        'runs': len(samples),
+        'median': statistics.median(samples),
+        'min': samples[0],
+        'p95': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        'max': samples[-1]
+    }
+
+
+def measure(func, repeat):
+    """Run ``func`` ``repeat`` times and summarize the durations in seconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def import_profile(module, top=10):
+    """Return the ``top`` slowest imports, with cumulative seconds, of a cold ``import module``."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 0:
+            # Children are listed before their parent; keep only the target's direct imports
+            if name.strip() == module:
+                break
+            entries = []
+        elif depth == 1:
+            entries.append([name.strip(), int(cumulative) / 1e6])
+    return sorted(entries, key=lambda entry: -entry[1])[:top]
+
+
+def bench_import_time(repeat):
+    """Time cold imports of the app's entry points, each in a fresh interpreter."""
+    results = {}
+    for module in IMPORT_TARGETS:
+        code = IMPORT_CODE.format(module=module, heavy=HEAVY_MODULES)
+        samples = []
+        for _ in range(repeat):
+            output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True,
+                                    check=True).stdout
+            samples.append(json.loads(output))
+        summary = summarize([sample['seconds'] for sample in samples])
+        summary['loaded'] = samples[-1]['loaded']
+        summary['slowest'] = import_profile(module)
+        results[f'import.{module}'] = summary
+    return results
+
+
+def sample_set(rng):
+    record = generate_frame(1, seed=rng.randrange(1 << 30)).iloc[0].to_dict()
+    record['timestamp'] = datetime.now().isoformat()
+    return {key: value.item() if hasattr(value, 'item') else value for key, value in record.items()}
+
+
+def bench_load_history(app, path, repeat, rng):
+    def cold():
+        cache.shared.clear()
+        app.load_history(path)
+
+    def append_then_load():
+        app.save_to_csv(sample_set(rng), path)
+        app.load_history(path)
+
+    results = {'load_history.cold': measure(cold, max(1, repeat // 4))}
+    results['load_history.warm'] = measure(lambda: app.load_history(path), repeat)
+    results['load_history.after_append'] = measure(append_then_load, repeat)
+    return results
+
+
+def bench_exercise_history(app, path, repeat, rng):
+    history = app.load_history(path)
+    names = history['exercises'] or exercise_names()
+
+    def indexed():
+        app.get_exercise_history(None, rng.choice(names), index=history['index'])
+
+    frame = history['data']
+
+    def from_frame():
+        app.get_exercise_history(frame, rng.choice(names))
+
+    return {
+        'get_exercise_history.indexed': measure(indexed, repeat * 10),
+        'get_exercise_history.from_frame': measure(from_frame, max(1, repeat // 4))
+    }
+
+
+def bench_save_to_csv(app, path, repeat, rng):
+    target = path + '.save.csv'
+    shutil.copyfile(path, target)
+    records = [sample_set(rng) for _ in range(repeat * 10)]
+    records_iter = iter(records)
+    return {'save_to_csv': measure(lambda: app.save_to_csv(next(records_iter), target), len(records))}
+
+
+def bench_send_to_webhook(app, repeat, rng):
+    stub = StubWebhook()
+    try:
+        record = sample_set(rng)
+        return {'send_to_webhook': measure(lambda: app.send_to_webhook(record, stub.url), repeat * 5)}
+    finally:
+        stub.close()
+
+
+def bench_rerun(repeat, timeout):
+    """Time full-page reruns of the form with an exercise and its history shown."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(ROOT, 'app.py'), default_timeout=timeout)
+    first = measure(at.run, 1)
+
+    def click(label):
+        next(button for button in at.button if button.label == label).click().run()
+
+    def select_existing(selectbox):
+        selectbox.select(next(option for option in selectbox.options if not option.startswith('New '))).run()
+
+    click("Local Mode")
+    # "Start New Workout" calls st.rerun(); AppTest runs the follow-up pass itself
+    click("Start New Workout")
+    select_existing(at.selectbox[0])
+    select_existing(at.selectbox[1])
+    return {'app.first_run': first, 'app.rerun': measure(at.run, repeat)}
+
+
+def run_benchmarks(sizes, repeat=20, seed=0, timeout=60, rerun=True):
+    """Run every benchmark for each log size and return the JSON-ready results."""
+    rng = random.Random(seed)
+    results = {}
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix='workout-bench-')
+    try:
+        os.chdir(workdir)
+        sys.path.insert(0, ROOT)
+        with open(config.CONFIG_FILE, 'w') as f:
+            yaml.dump({'local_file': LOG_FILE, 'log_level': 'WARNING'}, f)
+        import app
+
+        for rows in sizes:
+            path = os.path.join(workdir, LOG_FILE)
+            generate_log(path, rows, seed)
+            cache.shared.clear()
+            suite = {}
+            suite.update(bench_load_history(app, path, repeat, rng))
+            suite.update(bench_exercise_history(app, path, repeat, rng))
+            suite.update(bench_save_to_csv(app, path, repeat, rng))
+            if rerun:
+                cache.shared.clear()
+                suite.update(bench_rerun(repeat, timeout))
+            for name, summary in suite.items():
+                results[f"{name}[rows={rows}]"] = summary
+            print(f"Finished {len(suite)} benchmarks on {rows} rows", file=sys.stderr)
+        results.update(bench_send_to_webhook(app, repeat, rng))
+        results.update(bench_import_time(max(3, repeat // 4)))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'meta': {
+            'created': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'sizes': list(sizes),
+            'repeat': repeat,
+            'seed': seed
+        },
+        'results': results
+    }
+
+
+def compare(current, baseline, threshold):
+    """Return ``(name, baseline_median, current_median)`` for every regression."""
+    regressions = []
+    for name, summary in current['results'].items():
+        previous = baseline['results'].get(name)
+        if previous and summary['median'] > previous['median'] * threshold:
+            regressions.append((name, previous['median'], summary['median']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the workout logger benchmarks")
+    parser.add_argument('--sizes', default='1000,100000',
+                        help="Comma-separated log sizes in sets (up to 10000000)")
+    parser.add_argument('--repeat', type=int, default=20, help="Runs per benchmark")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the generated logs")
+    parser.add_argument('--output', default='benchmark_results.json', help="Where to write the JSON results")
+    parser.add_argument('--baseline', help="Earlier results to check for regressions")
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help="Allowed slowdown of a median over the baseline")
+    parser.add_argument('--no-rerun', action='store_true', help="Skip the full-page AppTest benchmarks")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    current = run_benchmarks(sizes, args.repeat, args.seed, rerun=not args.no_rerun)
+    with open(args.output, 'w') as f:
+        json.dump(current, f, indent=2, sort_keys=True)
+    for name, summary in sorted(current['results'].items()):
+        print(f"{name:60} median {summary['median'] * 1000:10.3f} ms  p95 {summary['p95'] * 1000:10.3f} ms")
+    print(f"Wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: {before * 1000:.3f} ms -> {after * 1000:.3f} ms")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold}x of {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
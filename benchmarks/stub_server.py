@@ -0,0 +1,47 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubWebhook:
+    """Local stand-in for the webhook that records every JSON payload.
+
+    ``statuses`` is a list of status codes returned to the next requests
+    before falling back to 200; only accepted payloads are recorded.
+    """
+
+    def __init__(self, statuses=None, delay=0.0):
+        self.payloads = []
+        self.statuses = list(statuses or [])
+        self.delay = delay
+        self.requests = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                if stub.delay:
+                    threading.Event().wait(stub.delay)
+                with stub._lock:
+                    stub.requests += 1
+                    status = stub.statuses.pop(0) if stub.statuses else 200
+                    if status == 200:
+                        stub.payloads.append(json.loads(body))
+                self.send_response(status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}/hook"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
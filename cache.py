@@ -0,0 +1,128 @@
+import logging
+import threading
+from collections import OrderedDict
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUDGET_MB = 512.0
+
+
+def estimate_size(value):
+    """Approximate the memory held by a cached value, in bytes."""
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    if isinstance(value, (tuple, list)):
+        return sum(estimate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sum(estimate_size(item) for item in value.values())
+    if callable(getattr(value, 'memory_usage', None)):  # DataFrames, without importing pandas here
+        return int(value.memory_usage(deep=False, index=False).sum())
+    return 0
+
+
+class LRUCache:
+    """Process-wide cache of loaded logs and derived indexes.
+
+    Entries are keyed by log path and stamped with the file version, so
+    every session of the server process shares one parsed copy of a log.
+    The least recently used entries are evicted once their estimated size
+    exceeds the memory budget; the most recently used entry is always kept,
+    even if it alone is larger.
+    Sizes are measured again on every hit, since some entries keep growing.
+    """
+
+    def __init__(self, budget_bytes=int(DEFAULT_BUDGET_MB * 2**20)):
+        self.budget_bytes = budget_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> [value, size, version]
+        self._loading = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_create(self, key, create, version=None, sizeof=estimate_size):
+        """Return the cached value for ``key``, calling ``create()`` on a miss.
+
+        An entry cached for a different ``version`` of the key, such as an
+        older state of the log file, counts as a miss and is replaced.
+        Concurrent misses on the same key wait for a single ``create`` call.
+        """
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[2] == version:
+                    self.hits += 1
+                    metrics.inc('cache_hits')
+                    self._entries.move_to_end(key)
+                    self._resize(entry, sizeof(entry[0]))
+                    self._evict()
+                    return entry[0]
+                loading = self._loading.get(key)
+                if loading is None:
+                    loading = self._loading[key] = threading.Event()
+                    self.misses += 1
+                    metrics.inc('cache_misses')
+                    break
+            loading.wait()
+
+        try:
+            value = create()
+            with self._lock:
+                old = self._entries.pop(key, None)
+                if old is not None:
+                    self._bytes -= old[1]
+                entry = self._entries[key] = [value, 0, version]
+                self._resize(entry, sizeof(value))
+                self._evict()
+            return value
+        finally:
+            with self._lock:
+                del self._loading[key]
+            loading.set()
+
+    def _resize(self, entry, size):
+        self._bytes += size - entry[1]
+        entry[1] = size
+
+    def _evict(self):
+        while self._bytes > self.budget_bytes and len(self._entries) > 1:
+            key, (_, size, _) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+            metrics.inc('cache_evictions')
+            logger.info(f"Evicted {key} ({size / 2**20:.1f} MB) from the history cache")
+
+    def set_budget(self, budget_bytes):
+        with self._lock:
+            self.budget_bytes = budget_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Return the cache counters and current size."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'budget_bytes': self.budget_bytes
+            }
+
+
+shared = LRUCache()
+
+
+def configure(config_data):
+    """Apply the ``cache_budget_mb`` setting to the shared cache."""
+    budget = int(config_data.get('cache_budget_mb', DEFAULT_BUDGET_MB) * 2**20)
+    if budget != shared.budget_bytes:
+        shared.set_budget(budget)
@@ -0,0 +1,106 @@
+"""Exercise progress charts built from daily aggregates.
+
+A chart plots one value per session day, taken from the aggregates the
+history already keeps (see ``stats``), so years of sets never have to be
+re-read. Long series are downsampled with Largest-Triangle-Three-Buckets,
+which keeps the peaks and dips that give a progress line its shape, and
+the result is cached until new sets arrive: rendering a chart costs the
+same whether an exercise has ten sessions or ten thousand.
+"""
+import threading
+
+import cache
+import lazy
+
+np = lazy.module('numpy')
+pd = lazy.module('pandas')
+
+# Plotted value -> chart label
+METRICS = {
+    'top_weight': 'Top set (kg)',
+    'e1rm': 'Est. 1RM (kg)',
+    'volume': 'Volume (kg)'
+}
+DEFAULT_POINTS = 200
+# Rough size of one cached chart point, for the cache budget
+POINT_BYTES = 16
+
+# Held while Streamlit draws a chart: it swaps a process-wide Altair data
+# transformer, so charts drawn by two sessions at once can mix up their data.
+# It lives here because the app script's own globals are rebuilt every rerun.
+render_lock = threading.Lock()
+
+
+def lttb(x, y, threshold):
+    """Downsample a series to ``threshold`` points with Largest-Triangle-Three-Buckets.
+
+    ``x`` must be sorted. Returns the indices of the points kept, always
+    including the first and the last one.
+    """
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    n = len(x)
+    if threshold >= n:
+        return np.arange(n)
+    if threshold < 3:
+        raise ValueError("LTTB needs a threshold of at least 3 points")
+
+    # The first and last points are kept; the rest are split into equal buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype('int64')
+    kept = np.empty(threshold, dtype='int64')
+    kept[0] = 0
+    kept[-1] = n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # The next bucket's average, or the last point for the final bucket
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x = x[end:next_end].mean()
+        next_y = y[end:next_end].mean()
+        # Keep the point forming the largest triangle with the previous kept point and that average
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(areas.argmax())
+        kept[bucket + 1] = previous
+    return kept
+
+
+def daily_frame(daily):
+    """Turn ``(date, top weight, e1rm, volume)`` rows into a date-indexed frame."""
+    frame = pd.DataFrame.from_records(daily, columns=['date', 'top_weight', 'e1rm', 'volume'])
+    frame.index = pd.to_datetime(frame.pop('date'))
+    return frame.astype('float64')
+
+
+def downsample(series, points):
+    """Downsample a date-indexed series, dropping days without a value first."""
+    series = series.dropna()
+    if points and len(series) > points:
+        days = series.index.to_numpy(dtype='datetime64[D]').astype('int64')
+        series = series.iloc[lttb(days, series.to_numpy(), max(points, 3))]
+    return series
+
+
+def progress(daily_stats, exercise_name, metric='e1rm', points=DEFAULT_POINTS, source=None):
+    """Return the downsampled progress of an exercise as a one-column DataFrame.
+
+    ``daily_stats`` is the history's stats store. The chart is cached in
+    the shared ``cache`` under ``source`` (such as the log path) and the
+    exercise, and rebuilt only once the store's version changes.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric {metric!r}, expected one of {', '.join(METRICS)}")
+
+    def build():
+        daily = daily_stats.daily(exercise_name)
+        if not daily:
+            return pd.DataFrame(columns=[METRICS[metric]])
+        series = downsample(daily_frame(daily)[metric], points)
+        return series.rename(METRICS[metric]).to_frame()
+
+    key = ('progress', source, exercise_name, metric, points)
+    return cache.shared.get_or_create(
+        key, build, version=daily_stats.version, sizeof=lambda frame: POINT_BYTES * len(frame) + 1024
+    )
@@ -0,0 +1,172 @@
+"""Compact in-memory dtypes for training log history.
+
+    python compact.py training_log.csv
+
+prints how much memory the log takes with default and with compact dtypes.
+"""
+import argparse
+import io
+import sys
+import warnings
+from datetime import datetime
+
+import lazy
+
+pd = lazy.module('pandas')
+
+CATEGORY_COLUMNS = ('workout_name', 'exercise_name')
+FLOAT_COLUMNS = ('weight_kg',)
+INTEGER_COLUMNS = ('set_number', 'reps', 'rpe', 'rest_sec')
+# Free text is only parsed on request
+LAZY_COLUMNS = ('notes',)
+# A time of day followed by ``Z`` or a UTC offset such as ``+01:00``
+OFFSET_PATTERN = r':\d{2}(?:\.\d+)?\s*(?:[zZ]|[+-]\d{2}(?::?\d{2})?)$'
+
+
+def read_csv(source, columns=None, lazy=LAZY_COLUMNS):
+    """Read log rows with compact dtypes, skipping the ``lazy`` columns.
+
+    ``columns`` names the columns of a headerless chunk; without it the
+    first row is the header.
+    """
+    options = {'header': None, 'names': columns} if columns is not None else {}
+    rows = pd.read_csv(
+        source,
+        usecols=lambda column: column not in lazy,
+        dtype={column: 'category' for column in CATEGORY_COLUMNS},
+        **options
+    )
+    return compact_frame(rows)
+
+
+def compact_frame(df):
+    """Return ``df`` with compact dtypes and the timestamp parsed.
+
+    Names become categoricals, weights float32, and whole-number columns the
+    smallest integer type that fits them; columns with missing values or
+    fractions stay float, as float32.
+    """
+    df = df.copy(deep=False)
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype('category')
+    for column in FLOAT_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype('float32')
+    for column in INTEGER_COLUMNS:
+        if column not in df.columns:
+            continue
+        values = pd.to_numeric(df[column], errors='coerce')
+        if values.notna().all() and (values % 1 == 0).all():
+            df[column] = pd.to_numeric(values.astype('int64'), downcast='integer')
+        else:
+            df[column] = values.astype('float32')
+    if 'timestamp' in df.columns:
+        df['timestamp'] = parse_timestamps(df['timestamp'])
+    return df
+
+
+def local_timestamp(value):
+    """Return an ISO timestamp as a naive local datetime, or None if it is invalid.
+
+    The app logs naive local times; a timestamp with a UTC offset is
+    converted to local time so it reads on the same clock.
+    """
+    try:
+        moment = datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        return None
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    return moment
+
+
+def _to_local(parsed):
+    from dateutil import tz
+
+    return parsed.dt.tz_convert(tz.tzlocal()).dt.tz_localize(None)
+
+
+def parse_timestamps(values):
+    """Parse a Series of ISO timestamps into naive local datetimes, like ``local_timestamp``.
+
+    Invalid timestamps become NaT. Logs without offsets take a single
+    vectorized parse; only a mix of offsets is parsed in two parts.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return _to_local(values) if values.dt.tz is not None else values
+    try:
+        with warnings.catch_warnings():
+            # pandas warns before returning mixed offsets as objects, handled below
+            warnings.simplefilter('ignore', FutureWarning)
+            parsed = pd.to_datetime(values, errors='coerce', format='ISO8601')
+    except (TypeError, ValueError):
+        parsed = None
+    if parsed is not None and pd.api.types.is_datetime64_any_dtype(parsed):
+        return _to_local(parsed) if parsed.dt.tz is not None else parsed
+
+    text = values.astype('string').str.strip()
+    aware = text.str.contains(OFFSET_PATTERN, na=False)
+    parsed = pd.to_datetime(text.where(~aware), errors='coerce', format='ISO8601')
+    parsed[aware] = _to_local(pd.to_datetime(text[aware], errors='coerce', format='ISO8601', utc=True))
+    return parsed
+
+
+def concat(frames):
+    """Concatenate compact frames, keeping categorical columns categorical."""
+    frames = [frame for frame in frames if not frame.empty] or frames[:1]
+    if len(frames) == 1:
+        return frames[0]
+    for column in CATEGORY_COLUMNS:
+        if not all(isinstance(frame[column].dtype, pd.CategoricalDtype) for frame in frames if column in frame):
+            continue
+        categories = frames[0][column].cat.categories
+        for frame in frames[1:]:
+            categories = categories.union(frame[column].cat.categories)
+        frames = [
+            frame if frame[column].cat.categories.equals(categories)
+            else frame.assign(**{column: frame[column].cat.set_categories(categories)})
+            for frame in frames
+        ]
+    return pd.concat(frames, ignore_index=True)
+
+
+def widen_weights(series):
+    """Return float32 weights as float64 rounded to grams, for display and sums."""
+    if series.dtype == 'float32':
+        return series.astype('float64').round(3)
+    return series
+
+
+def memory_report(df):
+    """Return the deep memory usage of a frame in bytes, in total and per column."""
+    usage = df.memory_usage(deep=True, index=False)
+    return {
+        'rows': len(df),
+        'bytes': int(usage.sum()),
+        'columns': {column: int(size) for column, size in usage.items()}
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report the memory footprint of a training log")
+    parser.add_argument('path', help="CSV training log")
+    args = parser.parse_args(argv)
+
+    with open(args.path, 'rb') as f:
+        raw = io.BytesIO(f.read())
+    default = memory_report(pd.read_csv(raw))
+    raw.seek(0)
+    compact = memory_report(read_csv(raw))
+    print(f"{'column':16} {'default':>14} {'compact':>14}")
+    for column, size in default['columns'].items():
+        compact_size = compact['columns'].get(column)
+        shown = f"{compact_size:,}" if compact_size is not None else 'lazy'
+        print(f"{column:16} {size:>14,} {shown:>14}")
+    ratio = compact['bytes'] / default['bytes'] if default['bytes'] else 0
+    print(f"{'total':16} {default['bytes']:>14,} {compact['bytes']:>14,} ({ratio:.0%})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
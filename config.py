@@ -1,37 +1,181 @@
+import copy
 import os
+import threading
+import time
+from types import MappingProxyType
+
 import yaml
 
+CONFIG_FILE = 'config.yaml'
+CHECK_INTERVAL = 2.0  # Seconds between mtime checks of the cached config
+
 # Default configuration
 DEFAULT_CONFIG = {
     'webhook_url': 'https://hook.eu2.make.com/g06cmor51yt154js78btaty67ssr5i8l',  # Replace with your webhook URL
+    'storage_backend': 'csv',  # Possible values: csv, sqlite, parquet, partitioned
     'local_file': 'training_log.csv',
+    'fsync_every': 0,  # Fsync the CSV log after this many appended sets, 0 to leave it to the OS
+    'fsync_interval': 0.0,  # Fsync the CSV log at most this many seconds after an append, 0 to disable
+    'sqlite_file': 'training_log.db',
+    'parquet_dir': 'training_log_parquet',
+    'partition_dir': 'training_log_partitions',  # Monthly partitions used by the partitioned backend
+    'outbox_dir': 'outbox',  # Spool directory for undelivered webhook records
+    'outbox_max_queue': 1000,
+    'webhook_timeout': 10.0,  # Seconds
+    'webhook_max_retries': 5,
+    'webhook_backoff': 0.5,  # Initial retry delay in seconds, doubled on every attempt
+    'webhook_batching': False,  # Send pending sets as one JSON array instead of one request per set
+    'webhook_batch_size': 20,
+    'webhook_batch_interval': 30.0,  # Seconds before a partial batch is sent
+    'replay_concurrency': 4,  # Parallel requests of a webhook backfill
+    'replay_rate': 5.0,  # Requests per second of a webhook backfill, 0 for no limit
     'required_fields': ['workout_name', 'exercise_name', 'set_number', 'weight_kg', 'reps'],
     'optional_fields': ['rpe', 'rest_sec', 'notes'],
+    'history_sessions': 2,  # Number of past sessions shown in exercise history
+    'chart_points': 200,  # Most points plotted in an exercise progress chart, 0 hides the chart
+    'suggestion_limit': 50,  # Most workout or exercise names listed in a dropdown
+    'muscle_groups': {},  # Muscle group of an exercise name, for reports; others are guessed from the name
+    'cache_budget_mb': 512.0,  # Memory the shared history cache may use
+    'metrics_enabled': False,  # Time the stages of every rerun
+    'metrics_panel': False,  # Show the timings in a debug sidebar panel
+    'metrics_file': '',  # Where to export metrics, empty to disable
+    'metrics_format': 'json',  # Possible values: json, prometheus
+    'metrics_export_interval': 10.0,  # Minimum seconds between exports
     'log_level': 'INFO',  # Possible values: DEBUG, INFO, WARNING, ERROR
-    'log_format': '%(asctime)s - %(levelname)s - %(message)s'
+    'log_format': '%(asctime)s - %(levelname)s - %(message)s',
+    'log_file': 'workout_logger.log',
+    'log_max_bytes': 5_000_000,  # Rotate the log file at this size
+    'log_backup_count': 3,  # Rotated log files to keep
+    'log_json': False  # Write one JSON object per line instead of log_format
+}
+
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+STORAGE_BACKENDS = ('csv', 'sqlite', 'parquet', 'partitioned')
+METRICS_FORMATS = ('json', 'prometheus')
+# Numeric settings that may be zero; all other counts must be at least 1
+# and all other durations greater than 0
+ZERO_ALLOWED = {
+    'webhook_max_retries', 'webhook_backoff', 'fsync_every', 'fsync_interval', 'log_backup_count', 'replay_rate',
+    'chart_points'
 }
 
-def load_config():
+
+def validate_config(config):
+    """Fill in missing keys and replace values of the wrong type with defaults."""
+    if not isinstance(config, dict):
+        print("Warning: Config is not a mapping, using defaults")
+        config = {}
+
+    for key, default in DEFAULT_CONFIG.items():
+        if key not in config:
+            config[key] = copy.deepcopy(default)
+            continue
+        value = config[key]
+        if isinstance(default, bool):
+            valid = isinstance(value, bool)
+        elif isinstance(default, int):
+            minimum = 0 if key in ZERO_ALLOWED else 1
+            valid = isinstance(value, int) and not isinstance(value, bool) and value >= minimum
+        elif isinstance(default, float):
+            valid = (isinstance(value, (int, float)) and not isinstance(value, bool)
+                     and (value >= 0 if key in ZERO_ALLOWED else value > 0))
+        elif isinstance(default, list):
+            valid = isinstance(value, list) and all(isinstance(item, str) for item in value)
+        else:
+            valid = isinstance(value, type(default))
+        if not valid:
+            print(f"Warning: Invalid value for '{key}' in config: {value!r}, using default")
+            config[key] = copy.deepcopy(default)
+
+    if config['storage_backend'] not in STORAGE_BACKENDS:
+        print(f"Warning: Unknown storage_backend {config['storage_backend']!r}, using default")
+        config['storage_backend'] = DEFAULT_CONFIG['storage_backend']
+    if config['metrics_format'] not in METRICS_FORMATS:
+        print(f"Warning: Unknown metrics_format {config['metrics_format']!r}, using default")
+        config['metrics_format'] = DEFAULT_CONFIG['metrics_format']
+    if str(config['log_level']).upper() not in LOG_LEVELS:
+        print(f"Warning: Unknown log_level {config['log_level']!r}, using default")
+        config['log_level'] = DEFAULT_CONFIG['log_level']
+    return config
+
+
+def load_config(path=CONFIG_FILE):
     """Load configuration from config.yaml if it exists, otherwise use defaults."""
     try:
-        if os.path.exists('config.yaml'):
-            with open('config.yaml', 'r') as f:
+        if os.path.exists(path):
+            with open(path, 'r') as f:
                 config = yaml.safe_load(f)
         else:
-            config = DEFAULT_CONFIG
+            config = copy.deepcopy(DEFAULT_CONFIG)
             # Save default config to file
             try:
-                with open('config.yaml', 'w') as f:
+                with open(path, 'w') as f:
                     yaml.dump(config, f)
             except Exception as e:
                 print(f"Warning: Could not save default config: {e}")
-        
-        # Ensure all required keys exist
-        for key, value in DEFAULT_CONFIG.items():
-            if key not in config:
-                config[key] = value
-        
-        return config
+
+        return validate_config(config)
     except Exception as e:
         print(f"Warning: Error loading config, using defaults: {e}")
-        return DEFAULT_CONFIG 
\ No newline at end of file
+        return copy.deepcopy(DEFAULT_CONFIG)
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class ConfigCache:
+    """Immutable config snapshot that is reloaded when the file changes.
+
+    The file's mtime is checked at most once every ``check_interval``
+    seconds, so repeated lookups within a rerun do no filesystem I/O.
+    """
+
+    def __init__(self, path=CONFIG_FILE, check_interval=CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._mtime_ns = None
+        self._next_check = 0.0
+
+    def get(self):
+        """Return the current config snapshot."""
+        now = time.monotonic()
+        if self._snapshot is not None and now < self._next_check:
+            return self._snapshot
+
+        with self._lock:
+            self._next_check = now + self.check_interval
+            try:
+                mtime_ns = os.stat(self.path).st_mtime_ns
+            except OSError:
+                mtime_ns = None
+            if self._snapshot is None or mtime_ns != self._mtime_ns:
+                self._snapshot = _freeze(load_config(self.path))
+                if mtime_ns is None:
+                    # load_config may just have written the default file
+                    try:
+                        mtime_ns = os.stat(self.path).st_mtime_ns
+                    except OSError:
+                        pass
+                # Keep the mtime seen before loading, so an edit made while
+                # loading still looks like a change on the next check
+                self._mtime_ns = mtime_ns
+            return self._snapshot
+
+    def invalidate(self):
+        """Force the next lookup to check the file again."""
+        self._next_check = 0.0
+
+
+_cache = ConfigCache()
+
+
+def get_config():
+    """Return the cached, read-only configuration snapshot."""
+    return _cache.get()
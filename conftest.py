@@ -0,0 +1,25 @@
+import config
+import storage
+
+COLUMNS = storage.log_columns(config.DEFAULT_CONFIG)
+
+
+def make_set(exercise='Squat', set_number=1, timestamp='2024-01-15T10:00:00', weight=100.0, reps=5,
+             workout='Legs', **fields):
+    """Return a set record with every stored column, as the app saves it.
+
+    ``fields`` set the remaining columns, such as ``rpe`` or ``notes``.
+    """
+    record = {
+        'workout_name': workout,
+        'exercise_name': exercise,
+        'set_number': set_number,
+        'weight_kg': weight,
+        'reps': reps,
+        'rpe': 8,
+        'rest_sec': 60,
+        'notes': None,
+        'timestamp': timestamp
+    }
+    record.update(fields)
+    return record
@@ -0,0 +1,447 @@
+import array
+import bisect
+import csv
+import io
+import logging
+import math
+import os
+import sys
+import threading
+from collections.abc import Mapping
+from datetime import date
+
+import cache
+import compact
+import lazy
+import stats
+import suggest
+
+pd = lazy.module('pandas')
+
+logger = logging.getLogger(__name__)
+
+# Size of one parsed row not yet in a frame, measured with tracemalloc, for the cache budget
+RECORD_BYTES = 610
+# Column -> array typecode of the exercise index: day as days since 1970-01-01
+# and float32 numbers, so a missing set number or rep count stays NaN
+TYPECODES = {'day': 'i', 'set': 'f', 'weight': 'f', 'reps': 'f'}
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+# Appended chunks smaller than this are parsed with the csv module, not pandas
+SMALL_CHUNK_BYTES = 64 * 1024
+
+
+def _value(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _day(timestamp):
+    """Return the local day of a timestamp as days since 1970-01-01, or None."""
+    moment = compact.local_timestamp(timestamp)
+    return moment.toordinal() - EPOCH_ORDINAL if moment is not None else None
+
+
+def _whole(value):
+    return int(value) if value == value else math.nan
+
+
+def _set_order(set_data):
+    number = set_data['set']
+    return (number != number, number if number == number else 0)
+
+
+class ExerciseIndex:
+    """Per-exercise sets sorted by day, ready to be displayed.
+
+    Every exercise keeps its sets in parallel ``array`` columns of day, set
+    number, weight and reps, 16 bytes a set rather than a dict each, sorted
+    by day. Fetching the last N sessions is a dictionary lookup and one
+    binary search per session, regardless of how large the log is.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._columns = {}  # exercise -> (days, set numbers, weights, reps)
+        self._sets = 0
+
+    @classmethod
+    def from_frame(cls, df):
+        """Build an index from a history DataFrame."""
+        index = cls()
+        index.add_frame(df)
+        return index
+
+    def add_frame(self, df):
+        """Add the rows of a DataFrame to the index."""
+        if df.empty or 'timestamp' not in df.columns:
+            return
+        days = compact.parse_timestamps(df['timestamp'])
+        rows = pd.DataFrame({
+            'exercise': df['exercise_name'],
+            'day': days.to_numpy(dtype='datetime64[D]').astype('int64'),
+            'set': pd.to_numeric(df['set_number'], errors='coerce'),
+            'weight': pd.to_numeric(df['weight_kg'], errors='coerce'),
+            'reps': pd.to_numeric(df['reps'], errors='coerce')
+        })[days.notna().to_numpy()].dropna(subset=['exercise'])
+        if rows.empty:
+            return
+        rows = rows.sort_values(['exercise', 'day'], kind='stable')
+        for exercise, group in rows.groupby('exercise', observed=True, sort=False):
+            self._add(exercise, [group[column].to_numpy(dtype=code) for column, code in TYPECODES.items()])
+
+    def add_records(self, records):
+        """Add rows given as dicts, such as freshly parsed CSV rows."""
+        by_exercise = {}
+        for record in records:
+            exercise = record.get('exercise_name')
+            day = _day(record.get('timestamp'))
+            if exercise is None or day is None:
+                continue
+            by_exercise.setdefault(exercise, []).append((
+                day, _value(record.get('set_number')), _value(record.get('weight_kg')), _value(record.get('reps'))
+            ))
+        for exercise, rows in by_exercise.items():
+            rows.sort(key=lambda row: row[0])
+            self._add(exercise, list(zip(*rows)))
+
+    def _add(self, exercise, values):
+        """Append day-sorted ``values`` of every column to an exercise's columns."""
+        with self._lock:
+            columns = self._columns.get(exercise)
+            if columns is None:
+                columns = self._columns[exercise] = tuple(array.array(code) for code in TYPECODES.values())
+            in_order = not columns[0] or values[0][0] >= columns[0][-1]
+            for column, new in zip(columns, values):
+                if hasattr(new, 'tobytes'):
+                    column.frombytes(new.tobytes())
+                else:
+                    column.extend(new)
+            if not in_order:
+                # Sets older than the newest indexed day: restore the day order
+                days = columns[0]
+                order = sorted(range(len(days)), key=days.__getitem__)
+                for column in columns:
+                    column[:] = array.array(column.typecode, [column[i] for i in order])
+            self._sets += len(values[0])
+
+    @property
+    def nbytes(self):
+        """Memory held by the index's columns."""
+        with self._lock:
+            columns = list(self._columns.values())
+        return sum(sys.getsizeof(column) for exercise in columns for column in exercise)
+
+    def last_sessions(self, exercise_name, sessions=2):
+        """Return the most recent sessions for an exercise, newest first."""
+        sessions = int(sessions)
+        if sessions < 1:
+            return None
+        with self._lock:
+            columns = self._columns.get(exercise_name)
+            if columns is None:
+                return None
+            days, set_numbers, weights, reps = columns
+            found = []
+            end = len(days)
+            while end and len(found) < sessions:
+                day = days[end - 1]
+                start = bisect.bisect_left(days, day, 0, end)
+                sets = [
+                    # Weights are float32, rounded to grams like compact.widen_weights
+                    {'set': _whole(set_numbers[i]), 'weight': round(weights[i], 3), 'reps': _whole(reps[i])}
+                    for i in range(start, end)
+                ]
+                sets.sort(key=_set_order)
+                found.append({'date': date.fromordinal(EPOCH_ORDINAL + day).isoformat(), 'sets': sets})
+                end = start
+        return found
+
+
+class HistorySnapshot(Mapping):
+    """Read-only history structure shared between sessions.
+
+    The underlying DataFrame belongs to the process-wide index, so ``'data'``
+    hands out a private copy, made on first access only. ``data`` may also be
+    a callable that loads the frame on that first access. ``stats`` holds
+    the per-exercise and per-workout aggregates and ``suggestions`` the
+    ranked name indexes keyed by column, if the source keeps them.
+    """
+
+    def __init__(self, workouts, exercises, data, index, stats=None, suggestions=None):
+        self._items = {
+            'workouts': list(workouts),
+            'exercises': list(exercises),
+            'data': None,
+            'index': index,
+            'stats': stats,
+            'suggestions': suggestions
+        }
+        self._shared_data = data
+
+    def __getitem__(self, key):
+        if key == 'data' and self._items['data'] is None:
+            if callable(self._shared_data):
+                self._items['data'] = self._shared_data()
+            else:
+                self._items['data'] = self._shared_data.copy()
+        return self._items[key]
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class IncrementalHistory:
+    """Rows of a training log and the indexes derived from them, extended as sets arrive.
+
+    Subclasses read the rows added since their last ``refresh`` and hand
+    them over with ``_append_rows``, as a compact DataFrame, or
+    ``_append_records``, as dicts; records are only turned into a DataFrame
+    when ``data`` is read. ``_reset`` starts over when the source was
+    rewritten rather than appended to.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.columns = []
+        self.rows = 0
+        self.workouts = set()
+        self.exercises = set()
+        self._frames = []
+        self._records = []  # Rows of small appends not yet in a frame
+        self._sorted = None
+        self.exercise_index = ExerciseIndex()
+        self.stats = stats.StatsStore()
+        self.suggestions = {
+            'workout_name': suggest.SuggestionIndex(),
+            'exercise_name': suggest.SuggestionIndex()
+        }
+
+    def _kept_columns(self):
+        return [column for column in self.columns if column not in compact.LAZY_COLUMNS]
+
+    def _flush_records(self):
+        if self._records:
+            frame = pd.DataFrame.from_records(self._records, columns=self._kept_columns())
+            self._frames.append(compact.compact_frame(frame))
+            self._records = []
+
+    @property
+    def data(self):
+        """All parsed rows as a single DataFrame."""
+        self._flush_records()
+        if len(self._frames) != 1:
+            self._frames = [compact.concat(self._frames) if self._frames
+                            else pd.DataFrame(columns=self._kept_columns())]
+        return self._frames[0]
+
+    def _data_copy(self):
+        with self._lock:
+            return self.data.copy()
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the rows and every derived index."""
+        # Deep, for the categories' strings; the frames hold no free-text columns
+        size = sum(int(frame.memory_usage(index=False, deep=True).sum()) for frame in self._frames)
+        size += len(self._records) * RECORD_BYTES + self.exercise_index.nbytes + self.stats.nbytes
+        return size + sum(suggestions.nbytes for suggestions in self.suggestions.values())
+
+    def memory_usage(self):
+        """Return the memory footprint in bytes of ``data``, in total and per column,
+        of every derived index under ``'indexes'``, and of everything under ``'total'``.
+        """
+        with self._lock:
+            report = compact.memory_report(self.data)
+            report['indexes'] = {
+                'exercise_index': self.exercise_index.nbytes,
+                'stats': self.stats.nbytes,
+                'suggestions': sum(suggestions.nbytes for suggestions in self.suggestions.values())
+            }
+        report['total'] = report['bytes'] + sum(report['indexes'].values())
+        return report
+
+    def refresh(self):
+        """Bring the history up to date with its source."""
+        raise NotImplementedError
+
+    def snapshot(self):
+        """Return the history in the structure used by the app."""
+        self.refresh()
+        with self._lock:
+            if self._sorted is None:
+                self._sorted = (sorted(self.workouts), sorted(self.exercises))
+            workouts, exercises = self._sorted
+            # The frame is only built if a caller actually asks for 'data'
+            return HistorySnapshot(
+                workouts, exercises, self._data_copy, self.exercise_index, self.stats, self.suggestions
+            )
+
+    def _append_records(self, records):
+        self._records.extend(records)
+        self.rows += len(records)
+        self.exercise_index.add_records(records)
+        for record in records:
+            self.stats.update(record)
+        for column, suggestions in self.suggestions.items():
+            for record in records:
+                suggestions.add(record.get(column), last_seen=record.get('timestamp'))
+        self._add_names(
+            {record['workout_name'] for record in records if record.get('workout_name') is not None},
+            {record['exercise_name'] for record in records if record.get('exercise_name') is not None}
+        )
+
+    def _append_rows(self, rows):
+        # Keep the rows in the order they were added
+        self._flush_records()
+        self._frames.append(rows)
+        self.rows += len(rows)
+        self.exercise_index.add_frame(rows)
+        self.stats.add_frame(rows)
+        for column, suggestions in self.suggestions.items():
+            suggestions.add_frame(rows, column)
+        self._add_names(
+            set(rows['workout_name'].dropna().unique().tolist()),
+            set(rows['exercise_name'].dropna().unique().tolist())
+        )
+
+    def _add_names(self, workouts, exercises):
+        new_workouts = workouts - self.workouts
+        new_exercises = exercises - self.exercises
+        if new_workouts or new_exercises:
+            self.workouts |= new_workouts
+            self.exercises |= new_exercises
+            self._sorted = None
+
+
+class HistoryIndex(IncrementalHistory):
+    """Incrementally maintained view of a training log CSV file.
+
+    The index remembers how far into the file it has parsed. On refresh it
+    only parses rows appended since the last call, and falls back to a full
+    rebuild when the file was truncated, replaced or rewritten.
+
+    Rows are kept with compact dtypes (see ``compact``) and free-text
+    columns such as ``notes`` are left out of ``data``; ``lazy_column``
+    parses them on request. Small appends, such as the set saved by the
+    last rerun, are parsed with the csv module and only turned into a
+    DataFrame when ``data`` is read, so a small log never loads pandas.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        super().__init__()
+
+    def _reset(self):
+        super()._reset()
+        self.offset = 0
+        self.mtime_ns = None
+        self.inode = None
+        self.header = b''
+        self.last_line = b''
+
+    def lazy_column(self, column):
+        """Parse a column left out of ``data``, aligned with its rows."""
+        with self._lock:
+            offset = self.offset
+        with open(self.filename, 'rb') as f:
+            content = f.read(offset)
+        return pd.read_csv(io.BytesIO(content), usecols=[column])[column]
+
+    def refresh(self):
+        """Bring the index up to date with the file on disk."""
+        with self._lock:
+            try:
+                stat = os.stat(self.filename)
+            except FileNotFoundError:
+                if self.mtime_ns is not None:
+                    self._reset()
+                return self
+
+            if stat.st_mtime_ns == self.mtime_ns and stat.st_size == self.offset:
+                return self
+
+            if self._was_rewritten(stat):
+                logger.info(f"History file {self.filename} changed, rebuilding index")
+                self._reset()
+
+            full_load = self.offset == 0
+            self._read_from_offset(stat)
+            if full_load:
+                logger.info(f"Loaded {self.rows} sets from {self.filename} into {self.nbytes / 2**20:.1f} MB")
+            return self
+
+    def _was_rewritten(self, stat):
+        if self.mtime_ns is None:
+            return False
+        if stat.st_ino != self.inode or stat.st_size < self.offset:
+            return True
+        # Appends never touch the bytes already parsed, so a different
+        # header or last parsed line means the file was rewritten in place
+        with open(self.filename, 'rb') as f:
+            if f.read(len(self.header)) != self.header:
+                return True
+            if self.last_line:
+                f.seek(self.offset - len(self.last_line))
+                return f.read(len(self.last_line)) != self.last_line
+        return False
+
+    def _read_from_offset(self, stat):
+        with open(self.filename, 'rb') as f:
+            f.seek(self.offset)
+            chunk = f.read(stat.st_size - self.offset)
+
+        # Leave a partially written trailing line for the next refresh
+        end = chunk.rfind(b'\n') + 1
+        chunk = chunk[:end]
+
+        if not self.header:
+            header_end = chunk.find(b'\n') + 1
+            if header_end == 0:
+                return
+            self.header = chunk[:header_end]
+            self.columns = next(csv.reader([self.header.decode('utf-8')]))
+            chunk = chunk[header_end:]
+            self.offset += header_end
+
+        self.inode = stat.st_ino
+        self.mtime_ns = stat.st_mtime_ns
+        if not chunk:
+            return
+
+        self.offset += len(chunk)
+        self.last_line = chunk[chunk.rfind(b'\n', 0, len(chunk) - 1) + 1:]
+        if len(chunk) < SMALL_CHUNK_BYTES:
+            self._append_records(self._parse_records(chunk))
+        else:
+            self._append_rows(compact.read_csv(io.BytesIO(chunk), self.columns))
+
+    def _parse_records(self, chunk):
+        kept = [(i, column) for i, column in enumerate(self.columns) if column not in compact.LAZY_COLUMNS]
+        records = []
+        for row in csv.reader(io.StringIO(chunk.decode('utf-8'), newline='')):
+            if row:
+                records.append({column: row[i] if i < len(row) and row[i] != '' else None for i, column in kept})
+        return records
+
+
+def get_history_index(filename):
+    """Return the process-wide history index for a log file.
+
+    Indexes live in the shared ``cache``, keyed by path and stamped with
+    the file's inode: appends are picked up incrementally by the index
+    itself, while a replaced file gets a fresh index.
+    """
+    key = ('history', os.path.abspath(filename))
+    try:
+        inode = os.stat(filename).st_ino
+    except FileNotFoundError:
+        inode = None
+    return cache.shared.get_or_create(key, lambda: HistoryIndex(filename), version=inode)
@@ -0,0 +1,256 @@
+"""Bulk import of training log exports, without starting the app.
+
+    python importer.py export.csv
+    python importer.py export.jsonl.gz --chunk-rows 50000
+
+Rows are streamed in chunks of ``--chunk-rows`` sets. Every row is
+checked against the configured ``required_fields`` and ``optional_fields``
+and skipped if it is invalid or already stored, identified by workout,
+exercise, set number and timestamp. Valid rows are appended to the
+configured storage backend. Duplicates are found through the hashed keys
+of every stored and imported set, about 70 bytes each, the only memory
+that grows with the size of the log and the export.
+"""
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+import time
+
+import compact
+import config
+import outbox
+import storage
+
+MAX_ERRORS_SHOWN = 10
+# The columns identifying a set, see ``dedup_key``
+KEY_COLUMNS = ('workout_name', 'exercise_name', 'set_number', 'timestamp')
+
+
+class InvalidRow(ValueError):
+    """A row that cannot be stored."""
+
+
+def _open(path):
+    if path == '-':
+        return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', newline='')
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def detect_format(path):
+    """Return ``'jsonl'`` for JSON lines exports and ``'csv'`` otherwise."""
+    name = path[:-3] if path.endswith('.gz') else path
+    return 'jsonl' if name.endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def read_rows(f, fmt):
+    """Yield ``(line number, row)`` pairs from an open export."""
+    if fmt == 'csv':
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, InvalidRow(f"invalid JSON: {e.msg}")
+            continue
+        yield line_number, row if isinstance(row, dict) else InvalidRow("not a JSON object")
+
+
+def _number(column, value, integer):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise InvalidRow(f"{column} is not a number: {value!r}")
+    if number != number or number in (float('inf'), float('-inf')):
+        raise InvalidRow(f"{column} is not a number: {value!r}")
+    if integer:
+        if not number.is_integer():
+            raise InvalidRow(f"{column} is not a whole number: {value!r}")
+        return int(number)
+    return number
+
+
+class Validator:
+    """Checks rows against the configured fields and converts them to records.
+
+    The per-column rules are worked out once, so validating a row is a
+    single pass over the stored columns.
+    """
+
+    def __init__(self, config_data):
+        required = set(config_data['required_fields'])
+        self.rules = [
+            (column, column in required, column in storage.NUMERIC_COLUMNS,
+             storage.NUMERIC_COLUMNS.get(column) == 'INTEGER')
+            for column in config_data['required_fields'] + config_data['optional_fields']
+        ]
+
+    def __call__(self, row):
+        """Return ``row`` as a record of the stored columns, or raise InvalidRow."""
+        record = {}
+        for column, required, numeric, integer in self.rules:
+            value = row.get(column)
+            if isinstance(value, str):
+                value = value.strip()
+            if value is None or value == '':
+                if required:
+                    raise InvalidRow(f"missing {column}")
+                record[column] = None
+            elif numeric:
+                record[column] = _number(column, value, integer)
+            else:
+                record[column] = str(value)
+
+        timestamp = row.get('timestamp')
+        if timestamp is None or not str(timestamp).strip():
+            raise InvalidRow("missing timestamp")
+        moment = compact.local_timestamp(timestamp)
+        if moment is None:
+            raise InvalidRow(f"invalid timestamp: {timestamp!r}")
+        # Stored like the app's own sets: naive local time
+        record['timestamp'] = moment.isoformat()
+        return record
+
+
+def validate(row, config_data):
+    """Return ``row`` as a record of the stored columns, or raise InvalidRow."""
+    return Validator(config_data)(row)
+
+
+def dedup_key(record):
+    """Return a hash identifying a set by workout, exercise, set number and timestamp.
+
+    The set is identified like the outbox does (``outbox.record_identity``).
+    Only the hash is kept, so the seen set stays small for exports of many
+    millions of rows. It is only compared within one process.
+    """
+    return hash(outbox.record_identity(record))
+
+
+def existing_keys(backend):
+    """Return the dedup keys of every set already stored.
+
+    Only the key columns are read, streamed from the backend.
+    """
+    return {dedup_key(record) for record in backend.iter_records(KEY_COLUMNS)}
+
+
+class ImportReport:
+    """Counts and timing of one import."""
+
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.errors = []
+        self.bytes = 0
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def summary(self):
+        mb_per_second = self.bytes / 2**20 / self.seconds if self.seconds else 0.0
+        return (f"Read {self.rows} rows in {self.seconds:.1f}s "
+                f"({self.rows_per_second:,.0f} rows/s, {mb_per_second:.1f} MB/s): "
+                f"{self.imported} imported, {self.duplicates} duplicates, {self.invalid} invalid")
+
+
+def import_file(path, backend, config_data, fmt=None, chunk_rows=10000, progress=None):
+    """Stream an export into ``backend`` and return an ImportReport.
+
+    Rows are appended in chunks of ``chunk_rows`` sets. ``progress`` is
+    called with the report after every chunk.
+    """
+    fmt = fmt or detect_format(path)
+    report = ImportReport()
+    started = time.perf_counter()
+    seen = existing_keys(backend)
+    validate_row = Validator(config_data)
+    chunk = []
+
+    def flush():
+        if chunk:
+            backend.append_many(chunk)
+            report.imported += len(chunk)
+            chunk.clear()
+        report.seconds = time.perf_counter() - started
+        if progress is not None:
+            progress(report)
+
+    with _open(path) as f:
+        for line_number, row in read_rows(f, fmt):
+            report.rows += 1
+            try:
+                if isinstance(row, InvalidRow):
+                    raise row
+                record = validate_row(row)
+            except InvalidRow as e:
+                report.invalid += 1
+                if len(report.errors) < MAX_ERRORS_SHOWN:
+                    report.errors.append(f"line {line_number}: {e}")
+                continue
+            key = dedup_key(record)
+            if key in seen:
+                report.duplicates += 1
+                continue
+            seen.add(key)
+            chunk.append(record)
+            if len(chunk) >= chunk_rows:
+                flush()
+        flush()
+
+    if isinstance(backend, storage.ParquetStorage):
+        backend.flush()
+    if path != '-':
+        report.bytes = os.path.getsize(path)
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def main(argv=None):
+    config_data = config.get_config()
+    parser = argparse.ArgumentParser(description="Import a CSV or JSON lines export into the training log")
+    parser.add_argument('path', help="Export to import, optionally gzipped; - reads CSV from stdin")
+    parser.add_argument('--format', choices=['csv', 'jsonl'], help="Defaults to the file extension")
+    parser.add_argument('--backend', choices=config.STORAGE_BACKENDS, default=config_data['storage_backend'])
+    parser.add_argument('--target', help="Storage path, defaults to the configured one")
+    parser.add_argument('--chunk-rows', type=int, default=10000, help="Sets appended at a time")
+    parser.add_argument('--quiet', action='store_true', help="Only print the final report")
+    args = parser.parse_args(argv)
+
+    target = args.target or storage.storage_path(config_data, args.backend)
+    backend = storage.open_storage(args.backend, target, storage.log_columns(config_data))
+
+    def progress(report):
+        print(f"{report.rows} rows, {report.imported} imported ({report.rows_per_second:,.0f} rows/s)",
+              file=sys.stderr)
+
+    try:
+        report = import_file(args.path, backend, config_data, args.format, args.chunk_rows,
+                             None if args.quiet else progress)
+    except (OSError, csv.Error, UnicodeDecodeError) as e:
+        print(f"Error: {e}")
+        return 1
+    for error in report.errors:
+        print(f"Skipped {error}")
+    if report.invalid > len(report.errors):
+        print(f"... and {report.invalid - len(report.errors)} more invalid rows")
+    print(report.summary())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+
+import config
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Format every record as one JSON object per line."""
+
+    def format(self, record):
+        return json.dumps({
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }, default=str)
+
+
+class Lazy:
+    """Defer an expensive log argument until the record is actually formatted.
+
+    ``logger.debug("Payload: %s", Lazy(json.dumps, data, indent=2))`` costs
+    only this object's construction when DEBUG is disabled.
+    """
+
+    __slots__ = ('func', 'args', 'kwargs')
+
+    def __init__(self, func, *args, **kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    def __str__(self):
+        return str(self.func(*self.args, **self.kwargs))
+
+
+_lock = threading.Lock()
+_current = None  # (settings, queue handler, listener)
+
+
+def _settings(config_data):
+    defaults = config.DEFAULT_CONFIG
+    return tuple(config_data.get(key, defaults[key]) for key in (
+        'log_level', 'log_format', 'log_file', 'log_max_bytes', 'log_backup_count', 'log_json'
+    ))
+
+
+def configure(config_data):
+    """Route all logging through a queue drained by a background thread.
+
+    The root logger only gets a ``QueueHandler``, so a log call on the
+    request path never waits for the console or disk. A ``QueueListener``
+    thread writes the records to the console and to a size-rotated log
+    file, as plain text or JSON lines. Calling it again with unchanged
+    settings keeps the running listener, so it is cheap on every rerun.
+    """
+    global _current
+    settings = _settings(config_data)
+    level, log_format, log_file, max_bytes, backup_count, json_lines = settings
+    root = logging.getLogger()
+    with _lock:
+        root.setLevel(getattr(logging, str(level).upper()))
+        if _current is not None and _current[0] == settings:
+            return _current[2]
+
+        formatter = JsonLinesFormatter() if json_lines else logging.Formatter(log_format)
+        handlers = [
+            logging.StreamHandler(),
+            logging.handlers.RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count)
+        ]
+        for handler in handlers:
+            handler.setFormatter(formatter)
+        queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+        listener = logging.handlers.QueueListener(queue_handler.queue, *handlers)
+        listener.start()
+
+        if _current is not None:
+            _stop(_current)
+        root.addHandler(queue_handler)
+        _current = (settings, queue_handler, listener)
+        return listener
+
+
+def _stop(current):
+    _, queue_handler, listener = current
+    logging.getLogger().removeHandler(queue_handler)
+    listener.stop()  # Writes out everything still queued
+    for handler in listener.handlers:
+        handler.close()
+
+
+def listener():
+    """Return the running queue listener, or None."""
+    return _current[2] if _current is not None else None
+
+
+def shutdown():
+    """Flush queued records and stop the listener thread."""
+    global _current
+    with _lock:
+        if _current is not None:
+            _stop(_current)
+            _current = None
+
+
+atexit.register(shutdown)
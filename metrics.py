@@ -0,0 +1,183 @@
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+
+# Upper bounds in seconds of the latency histogram buckets
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PREFIX = 'workout_logger'
+
+
+class Histogram:
+    """Cumulative latency histogram with fixed buckets."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self):
+        cumulative = []
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            cumulative.append([bound, total])
+        return {'count': self.count, 'sum': self.sum, 'buckets': cumulative}
+
+
+class Registry:
+    """Thread-safe counters, latency histograms and the last timing of every span."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.last = {}
+
+    def inc(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+            self.last[name] = seconds
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': dict(self.counters),
+                'histograms': {name: histogram.to_dict() for name, histogram in self.histograms.items()},
+                'last': dict(self.last)
+            }
+
+    def to_prometheus(self):
+        """Render the metrics in the Prometheus text exposition format."""
+        data = self.snapshot()
+        lines = []
+        for name, value in sorted(data['counters'].items()):
+            metric = f"{PREFIX}_{_metric_name(name)}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+        metric = f"{PREFIX}_span_seconds"
+        if data['histograms']:
+            lines.append(f"# TYPE {metric} histogram")
+        for name, histogram in sorted(data['histograms'].items()):
+            for bound, count in histogram['buckets']:
+                lines.append(f'{metric}_bucket{{span="{name}",le="{bound}"}} {count}')
+            lines.append(f'{metric}_sum{{span="{name}"}} {histogram["sum"]}')
+            lines.append(f'{metric}_count{{span="{name}"}} {histogram["count"]}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.last.clear()
+
+
+def _metric_name(name):
+    return ''.join(char if char.isalnum() else '_' for char in name)
+
+
+class _Span:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        registry.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOOP = _NoopSpan()
+registry = Registry()
+_enabled = False
+_last_export = None
+
+
+def configure(config_data):
+    """Turn collection on or off from the ``metrics_enabled`` setting."""
+    global _enabled
+    _enabled = bool(config_data.get('metrics_enabled'))
+
+
+def enabled():
+    return _enabled
+
+
+def span(name):
+    """Time a block as ``name``; a shared no-op context manager when disabled."""
+    if not _enabled:
+        return _NOOP
+    return _Span(name)
+
+
+def timed(name):
+    """Decorator that times every call of a function as span ``name``."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def inc(name, value=1):
+    """Increment counter ``name`` when metrics are enabled."""
+    if _enabled:
+        registry.inc(name, value)
+
+
+def export(path, fmt='json'):
+    """Write all metrics to ``path`` as JSON or Prometheus text, atomically."""
+    if fmt == 'prometheus':
+        content = registry.to_prometheus()
+    else:
+        content = json.dumps(registry.snapshot(), indent=2, sort_keys=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def maybe_export(config_data):
+    """Export to ``metrics_file`` at most once per ``metrics_export_interval``."""
+    global _last_export
+    path = config_data.get('metrics_file')
+    if not _enabled or not path:
+        return False
+    now = time.monotonic()
+    if _last_export is not None and now - _last_export < config_data['metrics_export_interval']:
+        return False
+    _last_export = now
+    export(path, config_data['metrics_format'])
+    return True
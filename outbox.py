@@ -0,0 +1,369 @@
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+
+import compact
+import lazy
+import metrics
+
+requests = lazy.module('requests')  # Only needed once something is delivered
+
+logger = logging.getLogger(__name__)
+
+_WAKE = object()  # Queue sentinel that only wakes the worker
+FLUSH_POLL_INTERVAL = 0.1  # Seconds
+LEDGER_FILE = 'delivered.txt'
+
+
+def record_identity(record):
+    """Return the workout, exercise, set number and timestamp identifying a set.
+
+    Set numbers and timestamps are normalized, so a set read back from the
+    log as text matches the one the form sent with numbers.
+    """
+    set_number = record.get('set_number')
+    try:
+        set_number = float(set_number)
+        set_number = int(set_number) if set_number.is_integer() else set_number
+    except (TypeError, ValueError):
+        pass
+    timestamp = record.get('timestamp')
+    moment = compact.local_timestamp(timestamp)
+    if moment is not None:
+        timestamp = moment.isoformat()
+    return record.get('workout_name'), record.get('exercise_name'), set_number, timestamp
+
+
+def record_key(record):
+    """Return a stable key identifying a set by workout, exercise, set number and timestamp."""
+    text = '\x1f'.join('' if part is None else str(part) for part in record_identity(record))
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+
+class DeliveredLedger:
+    """Append-only file of the keys of every set the webhook accepted.
+
+    Lets a backfill tell which sets of the local log the remote side
+    already has. Keys are appended with a single write per delivery, so
+    the outbox worker and a replay can share the file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._keys = set()
+        self._size = 0
+        self.reload()
+
+    def reload(self):
+        """Pick up keys appended by other processes."""
+        with self._lock:
+            try:
+                with open(self.path, 'rb') as f:
+                    f.seek(self._size)
+                    content = f.read()
+            except FileNotFoundError:
+                return
+            end = content.rfind(b'\n') + 1
+            self._keys.update(content[:end].decode('ascii').split())
+            self._size += end
+
+    def __contains__(self, record):
+        return record_key(record) in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add_many(self, records):
+        """Record sets as delivered."""
+        keys = [record_key(record) for record in records]
+        with self._lock:
+            new = [key for key in dict.fromkeys(keys) if key not in self._keys]
+            if not new:
+                return
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, ''.join(key + '\n' for key in new).encode('ascii'))
+            finally:
+                os.close(fd)
+            self._keys.update(new)
+
+
+class Outbox:
+    """Durable webhook outbox delivered by a background worker.
+
+    Every record is first written to a spool directory and only removed once
+    the webhook accepted it, so nothing is lost when the webhook is slow or
+    unreachable or the app restarts. Records the webhook rejects outright
+    (4xx other than 429) are moved to a ``failed`` subdirectory.
+
+    With batching enabled, pending records are posted together as one JSON
+    array once ``batch_size`` records are waiting, ``batch_interval`` seconds
+    have passed since the first one, or ``flush`` is called.
+
+    Accepted records are added to ``ledger``, a DeliveredLedger, if given.
+    """
+
+    def __init__(self, webhook_url, spool_dir='outbox', max_queue=1000, timeout=10,
+                 max_retries=5, backoff=0.5, max_backoff=60.0, rescan_interval=5.0,
+                 batching=False, batch_size=20, batch_interval=30.0, ledger=None):
+        self.spool_dir = spool_dir
+        self.failed_dir = os.path.join(spool_dir, 'failed')
+        self.ledger = ledger
+        self.max_backoff = max_backoff
+        self.rescan_interval = rescan_interval
+
+        os.makedirs(self.failed_dir, exist_ok=True)
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._flush = threading.Event()
+        self._thread = None
+        self._session = None
+        self.configure(webhook_url, max_queue=max_queue, timeout=timeout, max_retries=max_retries,
+                       backoff=backoff, batching=batching, batch_size=batch_size,
+                       batch_interval=batch_interval)
+
+    def configure(self, webhook_url, max_queue=1000, timeout=10, max_retries=5, backoff=0.5,
+                  batching=False, batch_size=20, batch_interval=30.0):
+        """Apply delivery settings; the running worker picks them up on its next batch."""
+        self.webhook_url = webhook_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.batching = batching
+        self.batch_size = batch_size if batching else 1
+        self.batch_interval = batch_interval
+        with self._queue.mutex:
+            self._queue.maxsize = max_queue
+            self._queue.not_full.notify_all()
+
+    @property
+    def session(self):
+        """Pooled HTTP session reused for every delivery."""
+        if self._session is None:
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._session = session
+        return self._session
+
+    def start(self):
+        """Replay the spool and start the delivery worker."""
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._replay()
+        self._thread = threading.Thread(target=self._run, name='webhook-outbox', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Stop the worker; undelivered records stay in the spool."""
+        self._stop.set()
+        try:
+            self._queue.put_nowait(_WAKE)
+        except queue.Full:
+            pass
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def put(self, data):
+        """Durably spool a record and queue it for delivery."""
+        record_id = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+        path = self._path(record_id)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self._enqueue(record_id)
+        return record_id
+
+    def flush(self):
+        """Send the batch being collected without waiting for it to fill."""
+        if not self.batching:
+            return
+        self._flush.set()
+        try:
+            self._queue.put_nowait(_WAKE)
+        except queue.Full:
+            pass  # The collecting worker also polls the flush event
+
+    def pending(self):
+        """Return the ids of records still waiting in the spool, oldest first."""
+        return sorted(
+            name[:-len('.json')] for name in os.listdir(self.spool_dir)
+            if name.endswith('.json')
+        )
+
+    def _path(self, record_id):
+        return os.path.join(self.spool_dir, f"{record_id}.json")
+
+    def _enqueue(self, record_id):
+        with self._lock:
+            if record_id in self._pending:
+                return
+            try:
+                self._queue.put_nowait(record_id)
+            except queue.Full:
+                # Stays in the spool and is picked up by the next rescan
+                logger.warning(f"Outbox queue full, deferring record {record_id}")
+                return
+            self._pending.add(record_id)
+
+    def _replay(self):
+        for record_id in self.pending():
+            self._enqueue(record_id)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                record_id = self._queue.get(timeout=self.rescan_interval)
+            except queue.Empty:
+                self._replay()
+                continue
+            if record_id is _WAKE:
+                if self._queue.empty():
+                    self._flush.clear()  # Nothing left to flush
+                continue
+            batch = self._collect_batch(record_id)
+            try:
+                self._deliver(batch)
+            except Exception as e:
+                logger.error(f"Unexpected error while delivering records {batch}: {str(e)}")
+            finally:
+                with self._lock:
+                    self._pending.difference_update(batch)
+
+    def _collect_batch(self, record_id):
+        batch = [record_id]
+        deadline = time.monotonic() + self.batch_interval
+        while len(batch) < self.batch_size and not self._stop.is_set():
+            if self._flush.is_set():
+                # Take whatever is already queued, then send
+                batch.extend(self._drain(self.batch_size - len(batch)))
+                self._flush.clear()
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                # Bounded wait so a flush is noticed even when the wake-up
+                # sentinel could not be queued
+                record_id = self._queue.get(timeout=min(remaining, FLUSH_POLL_INTERVAL))
+            except queue.Empty:
+                continue
+            if record_id is not _WAKE:
+                batch.append(record_id)
+        return batch
+
+    def _drain(self, limit):
+        records = []
+        while len(records) < limit:
+            try:
+                record_id = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if record_id is not _WAKE:
+                records.append(record_id)
+        return records
+
+    def _deliver(self, record_ids):
+        paths = []
+        records = []
+        for record_id in record_ids:
+            path = self._path(record_id)
+            try:
+                with open(path) as f:
+                    records.append(json.load(f))
+            except FileNotFoundError:
+                continue
+            paths.append(path)
+        if not records:
+            return
+
+        payload = records if self.batching else records[0]
+        label = f"{len(records)} record(s) starting with {os.path.basename(paths[0])}"
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                delay = min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+                if self._stop.wait(delay):
+                    return
+            try:
+                with metrics.span('webhook.deliver'):
+                    response = self.session.post(self.webhook_url, json=payload, timeout=self.timeout)
+            except requests.exceptions.RequestException as e:
+                metrics.inc('webhook_errors')
+                logger.warning(f"Webhook delivery of {label} failed (attempt {attempt + 1}): {str(e)}")
+                continue
+
+            if response.ok:
+                logger.info(f"Delivered {label} to webhook. Status code: {response.status_code}")
+                metrics.inc('webhook_delivered', len(records))
+                if self.ledger is not None:
+                    self.ledger.add_many(records)
+                for path in paths:
+                    os.remove(path)
+                return
+            if 400 <= response.status_code < 500 and response.status_code != 429:
+                logger.error(f"Webhook rejected {label} with status {response.status_code}")
+                metrics.inc('webhook_rejected', len(records))
+                for path in paths:
+                    os.replace(path, os.path.join(self.failed_dir, os.path.basename(path)))
+                return
+            metrics.inc('webhook_errors')
+            logger.warning(f"Webhook returned {response.status_code} for {label} (attempt {attempt + 1})")
+
+        logger.error(f"Giving up on {label} for now, they stay in the outbox")
+
+
+_outboxes = {}
+_outboxes_lock = threading.Lock()
+
+
+def _outbox_settings(config_data):
+    return {
+        'webhook_url': config_data['webhook_url'],
+        'max_queue': config_data['outbox_max_queue'],
+        'timeout': config_data['webhook_timeout'],
+        'max_retries': config_data['webhook_max_retries'],
+        'backoff': config_data['webhook_backoff'],
+        'batching': config_data['webhook_batching'],
+        'batch_size': config_data['webhook_batch_size'],
+        'batch_interval': config_data['webhook_batch_interval']
+    }
+
+
+def get_outbox(config_data):
+    """Return the running process-wide outbox for the configured spool directory.
+
+    There is exactly one worker per spool directory. When the config snapshot
+    changes, the existing outbox is reconfigured in place rather than
+    replaced, so two workers never deliver the same files.
+    """
+    key = os.path.abspath(config_data['outbox_dir'])
+    settings = _outbox_settings(config_data)
+    with _outboxes_lock:
+        entry = _outboxes.get(key)
+        if entry is None:
+            ledger = DeliveredLedger(os.path.join(config_data['outbox_dir'], LEDGER_FILE))
+            outbox = Outbox(spool_dir=config_data['outbox_dir'], ledger=ledger, **settings).start()
+            _outboxes[key] = (outbox, settings)
+        else:
+            outbox, current = entry
+            if settings != current:
+                logger.info("Webhook settings changed, reconfiguring outbox")
+                outbox.configure(**settings)
+                _outboxes[key] = (outbox, settings)
+    return outbox
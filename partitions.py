@@ -0,0 +1,388 @@
+import argparse
+import json
+import os
+import re
+import sys
+from collections import defaultdict
+
+import appender
+import cache
+import config
+import history_index
+import lazy
+import stats
+import storage
+import suggest
+
+pd = lazy.module('pandas')
+
+MANIFEST_FILE = 'manifest.json'
+UNKNOWN_MONTH = 'unknown'
+
+
+def _month(record):
+    month = str(record.get('timestamp') or '')[:7]
+    return month if re.fullmatch(r'\d{4}-\d{2}', month) else UNKNOWN_MONTH
+
+
+class _ManifestLock:
+    """Exclusive lock shared by every process that updates the manifest."""
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        appender._lock(self._fd)
+        return self
+
+    def __exit__(self, *exc_info):
+        appender._unlock(self._fd)
+        os.close(self._fd)
+        self._fd = None
+
+
+class PartitionExerciseIndex:
+    """Exercise history lookups that only read the partitions they need.
+
+    Partitions are visited newest first, skipping those whose manifest entry
+    does not list the exercise, until enough sessions have been collected.
+    """
+
+    def __init__(self, partitioned, manifest):
+        self.partitioned = partitioned
+        self.manifest = manifest
+
+    def last_sessions(self, exercise_name, sessions=2):
+        sessions = int(sessions)
+        if sessions < 1:
+            return None
+        entries = sorted(
+            (entry for entry in self.manifest['partitions'].values() if exercise_name in entry['exercises']),
+            key=lambda entry: entry['end'] or '',
+            reverse=True
+        )
+        by_date = {}
+        for entry in entries:
+            if len(by_date) >= sessions and (entry['end'] or '')[:10] < min(by_date):
+                break
+            found = self.partitioned.partition_index(entry).last_sessions(exercise_name, sessions) or []
+            for workout in found:
+                sets = by_date.setdefault(workout['date'], [])
+                sets.extend(workout['sets'])
+        if not by_date:
+            return None
+        return [
+            {'date': date, 'sets': sorted(by_date[date], key=lambda x: x['set'])}
+            for date in sorted(by_date, reverse=True)[:sessions]
+        ]
+
+
+class PartitionStats:
+    """Exercise and workout aggregates merged from the partitions that hold them."""
+
+    def __init__(self, partitioned, manifest):
+        self.partitioned = partitioned
+        self.manifest = manifest
+        self.version = partitioned.version()
+
+    def _merged(self, key, name):
+        store = stats.StatsStore()
+        for entry in self.manifest['partitions'].values():
+            if name in entry[key]:
+                store.merge(self.partitioned.partition_stats(entry))
+        return store
+
+    def exercise(self, name):
+        return self._merged('exercises', name).exercise(name)
+
+    def workout(self, name):
+        return self._merged('workouts', name).workout(name)
+
+    def session_volumes(self, exercise_name):
+        return self._merged('exercises', exercise_name).session_volumes(exercise_name)
+
+    def daily(self, exercise_name):
+        return self._merged('exercises', exercise_name).daily(exercise_name)
+
+
+class PartitionedStorage(storage.Storage):
+    """Training log split into monthly partitions described by a manifest.
+
+    New sets are appended to ``YYYY-MM.csv`` by month of their timestamp.
+    ``manifest.json`` records every partition's file, format, months,
+    timestamp range, row count and the workouts and exercises it contains,
+    so dropdowns are filled from the manifest alone and exercise history
+    reads only the partitions that contain the exercise. ``compact``
+    merges small closed months into Parquet files.
+    """
+
+    def __init__(self, path, columns, fsync_every=0, fsync_interval=0.0):
+        super().__init__(path, columns)
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        os.makedirs(path, exist_ok=True)
+        self.manifest_path = os.path.join(path, MANIFEST_FILE)
+        self._manifest_lock = _ManifestLock(os.path.join(path, '.manifest.lock'))
+        self._manifest = None
+        self._manifest_version = None
+
+    # Manifest
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'partitions': {}}
+
+    def _write_manifest(self, manifest):
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def manifest(self):
+        """Return the current manifest, re-read only when it changed."""
+        version = self.version()
+        with self._lock:
+            if self._manifest is None or version != self._manifest_version:
+                self._manifest = self._read_manifest()
+                self._manifest_version = version
+            return self._manifest
+
+    def version(self):
+        try:
+            stat = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    # Writing
+
+    def append_many(self, records):
+        by_month = defaultdict(list)
+        for record in records:
+            by_month[_month(record)].append(record)
+
+        with self._lock, self._manifest_lock:
+            manifest = self._read_manifest()
+            for month, rows in by_month.items():
+                name = f"{month}.csv"
+                appender.get_appender(
+                    os.path.join(self.path, name), self.columns, self.fsync_every, self.fsync_interval
+                ).append_many(rows)
+                entry = manifest['partitions'].setdefault(name, {
+                    'file': name,
+                    'format': 'csv',
+                    'months': [month],
+                    'start': None,
+                    'end': None,
+                    'rows': 0,
+                    'workouts': [],
+                    'exercises': []
+                })
+                self._update_entry(entry, rows)
+            self._write_manifest(manifest)
+
+    @staticmethod
+    def _update_entry(entry, rows):
+        timestamps = [str(row['timestamp']) for row in rows if row.get('timestamp')]
+        if timestamps:
+            entry['start'] = min([entry['start']] + timestamps) if entry['start'] else min(timestamps)
+            entry['end'] = max([entry['end']] + timestamps) if entry['end'] else max(timestamps)
+        entry['rows'] += len(rows)
+        for key, field in (('workouts', 'workout_name'), ('exercises', 'exercise_name')):
+            names = set(entry[key])
+            names.update(row[field] for row in rows if row.get(field) is not None)
+            entry[key] = sorted(names)
+
+    # Reading
+
+    def _read_partition(self, entry):
+        path = os.path.join(self.path, entry['file'])
+        if entry['format'] != 'parquet':
+            return pd.read_csv(path).reindex(columns=self.columns)
+        df = pd.read_parquet(path).reindex(columns=self.columns)
+        # Parquet stores every number as float64; restore whole-number columns
+        for column, column_type in storage.NUMERIC_COLUMNS.items():
+            if column_type == 'INTEGER' and column in df.columns:
+                try:
+                    df[column] = df[column].astype('Int64')
+                except TypeError:
+                    pass
+        return df
+
+    def iter_records(self, columns):
+        # One partition at a time, reading only the wanted columns
+        for entry in sorted(self._entries(), key=lambda e: e['start'] or ''):
+            path = os.path.join(self.path, entry['file'])
+            if entry['format'] != 'parquet':
+                df = pd.read_csv(path, usecols=lambda column: column in columns)
+            else:
+                df = pd.read_parquet(path, columns=[column for column in columns if column in self.columns])
+            yield from storage._records(df.reindex(columns=columns))
+
+    def _partition_views(self, entry):
+        path = os.path.abspath(os.path.join(self.path, entry['file']))
+        stat = os.stat(path)
+
+        def build():
+            df = self._read_partition(entry)
+            return (history_index.ExerciseIndex.from_frame(df), stats.StatsStore.from_frame(df))
+
+        return cache.shared.get_or_create(
+            ('partition', path), build, version=(stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        )
+
+    def partition_index(self, entry):
+        """Return the exercise index of one partition, cached until it changes."""
+        return self._partition_views(entry)[0]
+
+    def partition_stats(self, entry):
+        """Return the aggregates of one partition, cached until it changes."""
+        return self._partition_views(entry)[1]
+
+    def _entries(self, exercise_name=None, start=None, end=None):
+        for entry in self.manifest()['partitions'].values():
+            if exercise_name is not None and exercise_name not in entry['exercises']:
+                continue
+            if start is not None and entry['end'] is not None and entry['end'] < start:
+                continue
+            if end is not None and entry['start'] is not None and entry['start'] > end:
+                continue
+            yield entry
+
+    def _concat(self, entries):
+        frames = [self._read_partition(entry) for entry in sorted(entries, key=lambda e: e['start'] or '')]
+        if not frames:
+            return pd.DataFrame(columns=self.columns)
+        return pd.concat(frames, ignore_index=True)
+
+    def load(self):
+        return self._concat(list(self._entries()))
+
+    def query(self, exercise_name=None, start=None, end=None):
+        return storage._filter(self._concat(list(self._entries(exercise_name, start, end))), exercise_name, start, end)
+
+    def _build_history(self):
+        manifest = self.manifest()
+        partitions = manifest['partitions'].values()
+        return (
+            sorted({name for entry in partitions for name in entry['workouts']}),
+            sorted({name for entry in partitions for name in entry['exercises']}),
+            PartitionExerciseIndex(self, manifest),
+            PartitionStats(self, manifest),
+            self._suggestions(manifest)
+        )
+
+    def history(self):
+        key = ('history', type(self).__name__, os.path.abspath(self.path))
+        workouts, exercises, index, partition_stats, suggestions = cache.shared.get_or_create(
+            key, self._build_history, version=self.version()
+        )
+        # The full frame is only read if a caller actually asks for 'data'
+        return history_index.HistorySnapshot(workouts, exercises, self.load, index, partition_stats, suggestions)
+
+    @staticmethod
+    def _suggestions(manifest):
+        # Ranked from the manifest alone: a name counts once per partition holding it
+        suggestions = {'workout_name': suggest.SuggestionIndex(), 'exercise_name': suggest.SuggestionIndex()}
+        for entry in manifest['partitions'].values():
+            for key, column in (('workouts', 'workout_name'), ('exercises', 'exercise_name')):
+                for name in entry[key]:
+                    suggestions[column].add(name, last_seen=entry['end'])
+        return suggestions
+
+    # Compaction
+
+    def compact(self, min_rows=10000, current_month=None):
+        """Merge closed monthly partitions into Parquet files.
+
+        Consecutive closed months are grouped until a group holds at least
+        ``min_rows`` sets; each group is rewritten as one Parquet file. The
+        current month keeps being appended to and is never compacted.
+        Returns the names of the files written.
+        """
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError("Compaction writes Parquet and requires pyarrow (pip install pyarrow)")
+        current_month = current_month or pd.Timestamp.now().strftime('%Y-%m')
+
+        with self._lock, self._manifest_lock:
+            manifest = self._read_manifest()
+            closed = sorted(
+                (entry for entry in manifest['partitions'].values()
+                 if all(month != UNKNOWN_MONTH and month < current_month for month in entry['months'])),
+                key=lambda entry: entry['months'][0]
+            )
+            groups = []
+            group = []
+            for entry in closed:
+                group.append(entry)
+                if sum(e['rows'] for e in group) >= min_rows:
+                    groups.append(group)
+                    group = []
+            if group:
+                groups.append(group)
+
+            written = []
+            for group in groups:
+                if len(group) == 1 and group[0]['format'] == 'parquet':
+                    continue  # Already compacted and nothing to merge with
+                months = sorted({month for entry in group for month in entry['months']})
+                name = f"{months[0]}_{months[-1]}.parquet"
+                frame = storage._normalize(self._concat(group), self.columns)
+                tmp_path = os.path.join(self.path, name + '.tmp')
+                frame.to_parquet(tmp_path, index=False)
+                os.replace(tmp_path, os.path.join(self.path, name))
+
+                merged = {
+                    'file': name,
+                    'format': 'parquet',
+                    'months': months,
+                    'start': None,
+                    'end': None,
+                    'rows': 0,
+                    'workouts': [],
+                    'exercises': []
+                }
+                for entry in group:
+                    merged['start'] = min(filter(None, [merged['start'], entry['start']]), default=None)
+                    merged['end'] = max(filter(None, [merged['end'], entry['end']]), default=None)
+                    merged['rows'] += entry['rows']
+                    merged['workouts'] = sorted(set(merged['workouts']) | set(entry['workouts']))
+                    merged['exercises'] = sorted(set(merged['exercises']) | set(entry['exercises']))
+                    del manifest['partitions'][entry['file']]
+                manifest['partitions'][name] = merged
+                # Publish the manifest before removing the merged sources
+                self._write_manifest(manifest)
+                for entry in group:
+                    if entry['file'] != name:
+                        os.remove(os.path.join(self.path, entry['file']))
+                written.append(name)
+            return written
+
+
+def main(argv=None):
+    config_data = config.get_config()
+    parser = argparse.ArgumentParser(description="Partitioned training log tools")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    compact_parser = subparsers.add_parser('compact', help="Merge closed monthly partitions into Parquet files")
+    compact_parser.add_argument('--dir', default=config_data['partition_dir'], help="Partition directory")
+    compact_parser.add_argument('--min-rows', type=int, default=10000,
+                                help="Minimum number of sets per compacted file")
+    args = parser.parse_args(argv)
+
+    partitioned = PartitionedStorage(args.dir, storage.log_columns(config_data))
+    written = partitioned.compact(args.min_rows)
+    for name in written:
+        print(f"Wrote {os.path.join(args.dir, name)}")
+    print(f"Compacted into {len(written)} file(s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
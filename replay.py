@@ -0,0 +1,354 @@
+"""Backfill the webhook with sets of the local log it has not received.
+
+    python replay.py
+    python replay.py --concurrency 8 --rate 20 --batch-size 50
+
+Sets saved in Local Mode, or whose delivery was given up on, never reach
+the webhook. The replay streams the CSV log and sends every set that is
+not in the delivered ledger kept by the outbox, nor waiting in its spool.
+Progress is checkpointed, so an interrupted backfill resumes where it
+stopped.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+import log_setup
+import metrics
+import outbox
+import storage
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FILE = 'replay.checkpoint'
+CHECKPOINT_INTERVAL = 1.0  # Minimum seconds between checkpoint writes
+
+
+class TokenBucket:
+    """Allows ``rate`` requests per second on average, in bursts of up to ``burst``.
+
+    A rate of 0 disables the limit.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, stop=None):
+        """Take one token, waiting for it if needed. Returns False if ``stop`` was set."""
+        if not self.rate:
+            return True
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                delay = (1 - self.tokens) / self.rate
+            if stop is not None:
+                if stop.wait(delay):
+                    return False
+            else:
+                time.sleep(delay)
+
+
+class Checkpoint:
+    """Byte offset in the log up to which every set has been handled."""
+
+    def __init__(self, path, log_path):
+        self.path = path
+        self.log_path = os.path.abspath(log_path)
+
+    def load(self):
+        """Return the saved offset, or 0 if it belongs to another or a replaced log."""
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+            stat = os.stat(self.log_path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return 0
+        offset = state.get('offset', 0)
+        if state.get('log') != self.log_path or state.get('inode') != stat.st_ino or offset > stat.st_size:
+            return 0
+        return offset
+
+    def save(self, offset):
+        state = {'log': self.log_path, 'inode': os.stat(self.log_path).st_ino, 'offset': offset}
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+    def reset(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def _record(columns, values):
+    """Return a log row as a record, numbers sent as numbers like the form does."""
+    record = {}
+    for column, value in zip(columns, values):
+        if value == '':
+            value = None
+        elif column in storage.NUMERIC_COLUMNS:
+            try:
+                number = float(value)
+                integer = storage.NUMERIC_COLUMNS[column] == 'INTEGER'
+                value = int(number) if integer and number.is_integer() else number
+            except ValueError:
+                pass
+        record[column] = value
+    return record
+
+
+def read_log(path, offset=0):
+    """Yield ``(end offset, record)`` for every complete set after byte ``offset``."""
+    with open(path, 'rb') as f:
+        header = f.readline()
+        if not header.endswith(b'\n'):
+            return
+        columns = next(csv.reader([header.decode('utf-8')]))
+        f.seek(max(offset, len(header)))
+        position = f.tell()
+        pending = b''
+        for line in f:
+            if not line.endswith(b'\n'):
+                return  # A set still being written
+            pending += line
+            # A quoted field may span lines; a row is complete once its quotes are balanced
+            if pending.count(b'"') % 2:
+                continue
+            position += len(pending)
+            values = next(csv.reader([pending.decode('utf-8')]))
+            pending = b''
+            yield position, _record(columns, values)
+
+
+def _spooled_keys(spool_dir):
+    keys = set()
+    for name in os.listdir(spool_dir) if os.path.isdir(spool_dir) else []:
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(spool_dir, name)) as f:
+                keys.add(outbox.record_key(json.load(f)))
+        except (OSError, json.JSONDecodeError):
+            continue
+    return keys
+
+
+class ReplayReport:
+    """Counts and timing of one replay."""
+
+    def __init__(self):
+        self.rows = 0
+        self.skipped = 0
+        self.sent = 0
+        self.failed = 0
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.sent / self.seconds if self.seconds else 0.0
+
+    def summary(self):
+        return (f"Read {self.rows} sets in {self.seconds:.1f}s: {self.sent} sent "
+                f"({self.rows_per_second:,.0f} sets/s), {self.skipped} already delivered, {self.failed} failed")
+
+
+class Replay:
+    """Sends the sets of a CSV log that the webhook has not received.
+
+    Batches of ``batch_size`` sets (posted as a JSON array when larger than
+    one) are sent by up to ``concurrency`` threads, at most ``rate``
+    requests per second. The checkpoint only moves past a batch once it and
+    every batch before it were delivered, so after an interruption or a
+    failed batch the next run resumes at the first set not known to be
+    delivered; the ledger keeps it from sending anything twice.
+    """
+
+    def __init__(self, log_path, webhook_url, state_dir='outbox', batch_size=1, concurrency=4, rate=5.0,
+                 timeout=10, max_retries=5, backoff=0.5, max_backoff=60.0):
+        self.log_path = log_path
+        self.webhook_url = webhook_url
+        self.state_dir = state_dir
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.bucket = TokenBucket(rate)
+        os.makedirs(state_dir, exist_ok=True)
+        self.checkpoint = Checkpoint(os.path.join(state_dir, CHECKPOINT_FILE), log_path)
+        self.ledger = outbox.DeliveredLedger(os.path.join(state_dir, outbox.LEDGER_FILE))
+        self._stop = threading.Event()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def stop(self):
+        """Ask a running replay to stop; batches waiting to be retried are left for the next run."""
+        self._stop.set()
+
+    def _send(self, records):
+        payload = records if self.batch_size > 1 else records[0]
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                delay = min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+                if self._stop.wait(delay):
+                    return False
+            if not self.bucket.acquire(self._stop):
+                return False
+            try:
+                with metrics.span('replay.send'):
+                    response = self.session.post(self.webhook_url, json=payload, timeout=self.timeout)
+            except requests.exceptions.RequestException as e:
+                logger.warning(f"Replay of {len(records)} set(s) failed (attempt {attempt + 1}): {str(e)}")
+                continue
+            if response.ok:
+                self.ledger.add_many(records)
+                return True
+            if 400 <= response.status_code < 500 and response.status_code != 429:
+                logger.error(f"Webhook rejected {len(records)} replayed set(s) with status {response.status_code}")
+                return False
+            logger.warning(f"Webhook returned {response.status_code} for {len(records)} replayed set(s) "
+                           f"(attempt {attempt + 1})")
+        return False
+
+    def run(self, progress=None):
+        """Replay the log and return a ReplayReport; ``progress`` is called after every batch."""
+        report = ReplayReport()
+        started = time.perf_counter()
+        self._stop.clear()
+        if not os.path.exists(self.log_path):
+            return report
+        skip = _spooled_keys(self.state_dir)
+        checkpoint = self.checkpoint.load()
+        if checkpoint:
+            logger.info(f"Resuming replay of {self.log_path} at byte {checkpoint}")
+
+        batches = deque()  # [end offset, done, ok] per batch, in log order
+        in_flight = {}
+        blocked = False
+        last_saved = time.monotonic()
+
+        def settle(done):
+            nonlocal checkpoint, blocked, last_saved
+            for future in done:
+                batch, records = in_flight.pop(future)
+                batch[1] = True
+                batch[2] = future.result()
+                if batch[2]:
+                    report.sent += len(records)
+                else:
+                    report.failed += len(records)
+            while batches and batches[0][1] and not blocked:
+                if not batches[0][2]:
+                    blocked = True  # Resume here next time
+                    break
+                checkpoint = batches.popleft()[0]
+            if time.monotonic() - last_saved >= CHECKPOINT_INTERVAL:
+                self.checkpoint.save(checkpoint)
+                last_saved = time.monotonic()
+            report.seconds = time.perf_counter() - started
+            if progress is not None:
+                progress(report)
+
+        with ThreadPoolExecutor(self.concurrency, thread_name_prefix='webhook-replay') as executor:
+            def submit(records, end):
+                batch = [end, False, False]
+                batches.append(batch)
+                in_flight[executor.submit(self._send, records)] = (batch, records)
+                while len(in_flight) >= self.concurrency * 2:
+                    settle(wait(in_flight, return_when=FIRST_COMPLETED).done)
+
+            records = []
+            end = checkpoint
+            try:
+                for end, record in read_log(self.log_path, checkpoint):
+                    if self._stop.is_set():
+                        break
+                    report.rows += 1
+                    if record in self.ledger or outbox.record_key(record) in skip:
+                        report.skipped += 1
+                        continue
+                    records.append(record)
+                    if len(records) >= self.batch_size:
+                        submit(records, end)
+                        records = []
+                else:
+                    if records:
+                        submit(records, end)
+                    # Trailing sets that were all skipped need no batch to be passed
+                    batches.append([end, True, True])
+            except BaseException:
+                self._stop.set()  # Do not wait out the retries of the batches in flight
+                raise
+            finally:
+                while in_flight:
+                    settle(wait(in_flight, return_when=FIRST_COMPLETED).done)
+                settle([])
+                self.checkpoint.save(checkpoint)
+        report.seconds = time.perf_counter() - started
+        return report
+
+
+def main(argv=None):
+    config_data = config.get_config()
+    parser = argparse.ArgumentParser(description="Send the sets of the local log the webhook has not received")
+    parser.add_argument('--log', default=config_data['local_file'], help="CSV training log to replay")
+    parser.add_argument('--url', default=config_data['webhook_url'], help="Webhook URL")
+    parser.add_argument('--batch-size', type=int,
+                        default=config_data['webhook_batch_size'] if config_data['webhook_batching'] else 1,
+                        help="Sets per request; more than one are posted as a JSON array")
+    parser.add_argument('--concurrency', type=int, default=config_data['replay_concurrency'])
+    parser.add_argument('--rate', type=float, default=config_data['replay_rate'],
+                        help="Requests per second, 0 for no limit")
+    parser.add_argument('--restart', action='store_true', help="Ignore the checkpoint and scan the whole log")
+    args = parser.parse_args(argv)
+    log_setup.configure(config_data)
+
+    replay = Replay(args.log, args.url, config_data['outbox_dir'], args.batch_size, args.concurrency, args.rate,
+                    config_data['webhook_timeout'], config_data['webhook_max_retries'], config_data['webhook_backoff'])
+    if args.restart:
+        replay.checkpoint.reset()
+    last = [time.monotonic()]
+
+    def progress(report):
+        if time.monotonic() - last[0] >= 5:
+            last[0] = time.monotonic()
+            print(f"{report.rows} sets read, {report.sent} sent ({report.rows_per_second:,.0f} sets/s)",
+                  file=sys.stderr)
+
+    try:
+        report = replay.run(progress)
+    except KeyboardInterrupt:
+        replay.stop()
+        print("Interrupted, the next run resumes from the checkpoint")
+        return 1
+    print(report.summary())
+    return 1 if report.failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,215 @@
+"""Weekly progression reports across many users' training logs.
+
+    python reports.py users/*/training_log.csv --output reports
+    python reports.py users/ --output reports --format parquet --workers 8
+
+Each log is summarized per week and exercise in a pool of worker
+processes; the small per-file summaries are then combined with grouped
+operations into three tables written to the output directory:
+
+- ``weekly``: sets, reps, volume, top weight and best estimated 1RM per
+  user, week and exercise, with the change in volume over the user's
+  previous week of that exercise
+- ``prs``: the weeks in which a user's estimated 1RM of an exercise beat
+  every earlier week
+- ``muscle_groups``: sets and volume per user, week and muscle group
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import compact
+import config
+import lazy
+
+pd = lazy.module('pandas')
+
+LOG_FILE = 'training_log.csv'
+# Muscle group of an exercise whose name contains the keyword, checked in order;
+# the ``muscle_groups`` setting maps exact exercise names and takes precedence
+MUSCLE_KEYWORDS = (
+    ('squat', 'legs'), ('lunge', 'legs'), ('leg ', 'legs'), ('calf', 'legs'),
+    ('deadlift', 'back'), ('row', 'back'), ('pull', 'back'), ('chin', 'back'), ('lat ', 'back'),
+    ('bench', 'chest'), ('chest', 'chest'), ('fly', 'chest'), ('dip', 'chest'), ('push-up', 'chest'),
+    ('overhead', 'shoulders'), ('shoulder', 'shoulders'), ('lateral', 'shoulders'), ('press', 'shoulders'),
+    ('curl', 'arms'), ('tricep', 'arms'), ('extension', 'arms'),
+    ('plank', 'core'), ('crunch', 'core'), ('ab ', 'core')
+)
+OTHER_GROUP = 'other'
+REPORTS = ('weekly', 'prs', 'muscle_groups')
+
+
+def find_logs(paths):
+    """Expand directories and glob patterns into a sorted list of log files."""
+    found = set()
+    for path in paths:
+        if os.path.isdir(path):
+            found.update(glob.glob(os.path.join(path, '**', LOG_FILE), recursive=True))
+        else:
+            found.update(glob.glob(path) or [path])
+    return sorted(found)
+
+
+def user_id(path):
+    """Name a log's user: the directory of a ``training_log.csv``, otherwise the file name."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if stem != os.path.splitext(LOG_FILE)[0]:
+        return stem
+    return os.path.basename(os.path.dirname(os.path.abspath(path)))
+
+
+def muscle_group(exercise_name, overrides=None):
+    """Return the muscle group an exercise trains."""
+    if overrides and exercise_name in overrides:
+        return overrides[exercise_name]
+    name = f" {str(exercise_name).casefold()} "
+    for keyword, group in MUSCLE_KEYWORDS:
+        if keyword in name:
+            return group
+    return OTHER_GROUP
+
+
+def summarize_log(path):
+    """Return ``(path, weekly summary, error)`` for one log; runs in a worker process.
+
+    The summary has one row per week and exercise, so only a small frame
+    travels back to the parent process, however long the log is.
+    """
+    try:
+        df = compact.read_csv(path)
+        df = df.dropna(subset=['exercise_name', 'timestamp'])
+        weight = compact.widen_weights(pd.to_numeric(df['weight_kg'], errors='coerce'))
+        reps = pd.to_numeric(df['reps'], errors='coerce')
+        rows = pd.DataFrame({
+            # Weeks start on Monday
+            'week': df['timestamp'].dt.to_period('W-SUN').dt.start_time,
+            'exercise_name': df['exercise_name'],
+            'weight': weight,
+            'reps': reps,
+            'volume': weight * reps,
+            'e1rm': weight.where(reps <= 1, weight * (1 + reps / 30)).where(reps.notna())
+        })
+        weekly = rows.groupby(['week', 'exercise_name'], observed=True).agg(
+            sets=('weight', 'size'),
+            reps=('reps', 'sum'),
+            volume=('volume', 'sum'),
+            top_weight=('weight', 'max'),
+            best_e1rm=('e1rm', 'max')
+        ).reset_index()
+        weekly.insert(0, 'user', user_id(path))
+    except Exception as e:
+        # A log that cannot be summarized is reported, not fatal to the whole run
+        return path, None, f"{type(e).__name__}: {e}"
+    return path, weekly, None
+
+
+def combine(summaries, overrides=None):
+    """Build the report tables from per-log weekly summaries."""
+    frames = [summary for summary in summaries if summary is not None and not summary.empty]
+    if not frames:
+        empty = pd.DataFrame(columns=['user', 'week', 'exercise_name'])
+        return {name: empty for name in REPORTS}
+    weekly = pd.concat(frames, ignore_index=True)
+    weekly['user'] = weekly['user'].astype('category')
+    weekly['exercise_name'] = weekly['exercise_name'].astype(str).astype('category')
+
+    # Each distinct exercise name is looked up once, not once per row
+    categories = weekly['exercise_name'].cat.categories
+    groups = pd.Series([muscle_group(name, overrides) for name in categories], index=categories)
+    weekly['muscle_group'] = weekly['exercise_name'].map(groups).astype('category')
+
+    weekly = weekly.sort_values(['user', 'exercise_name', 'week'], kind='stable').reset_index(drop=True)
+    by_exercise = weekly.groupby(['user', 'exercise_name'], observed=True)
+    weekly['volume_change'] = by_exercise['volume'].pct_change(fill_method=None)
+    keys = [weekly['user'], weekly['exercise_name']]
+    running_best = by_exercise['best_e1rm'].cummax().groupby(keys, observed=True).ffill()
+    previous_best = running_best.groupby(keys, observed=True).shift()
+    weekly['is_pr'] = weekly['best_e1rm'] > previous_best.fillna(0)
+
+    prs = weekly.loc[weekly['is_pr'], ['user', 'week', 'exercise_name', 'muscle_group', 'top_weight', 'best_e1rm']]
+    prs = prs.assign(previous_best=previous_best[weekly['is_pr']]).reset_index(drop=True)
+
+    muscle_groups = weekly.groupby(['user', 'week', 'muscle_group'], observed=True).agg(
+        sets=('sets', 'sum'),
+        volume=('volume', 'sum')
+    ).reset_index()
+    return {'weekly': weekly, 'prs': prs, 'muscle_groups': muscle_groups}
+
+
+def build_reports(paths, workers=None, overrides=None, progress=None):
+    """Summarize every log in a process pool and return ``(reports, errors)``.
+
+    ``errors`` maps the path of every unreadable log to its error message.
+    """
+    summaries = []
+    errors = {}
+    workers = workers or os.cpu_count() or 1
+    # Hand out logs in batches so thousands of small files do not cost one round trip each
+    chunksize = max(1, len(paths) // (workers * 8))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for done, (path, summary, error) in enumerate(executor.map(summarize_log, paths, chunksize=chunksize), 1):
+            if error is not None:
+                errors[path] = error
+            else:
+                summaries.append(summary)
+            if progress is not None:
+                progress(done, len(paths))
+    return combine(summaries, overrides), errors
+
+
+def write_reports(reports, output_dir, fmt='csv'):
+    """Write every report table as ``<name>.csv`` or ``<name>.parquet``; returns the paths."""
+    if fmt == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError("Parquet reports require pyarrow (pip install pyarrow)")
+    os.makedirs(output_dir, exist_ok=True)
+    written = []
+    for name, table in reports.items():
+        path = os.path.join(output_dir, f"{name}.{fmt}")
+        if fmt == 'parquet':
+            table.to_parquet(path, index=False)
+        else:
+            table.to_csv(path, index=False)
+        written.append(path)
+    return written
+
+
+def main(argv=None):
+    config_data = config.get_config()
+    parser = argparse.ArgumentParser(description="Weekly progression reports across training logs")
+    parser.add_argument('paths', nargs='+', help="Log files, glob patterns or directories searched for " + LOG_FILE)
+    parser.add_argument('--output', default='reports', help="Directory the report tables are written to")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--workers', type=int, help="Worker processes, defaults to the number of cores")
+    args = parser.parse_args(argv)
+
+    paths = find_logs(args.paths)
+    if not paths:
+        print("Error: no training logs found")
+        return 1
+    started = time.perf_counter()
+    reports, errors = build_reports(paths, args.workers, config_data['muscle_groups'])
+    for path, error in errors.items():
+        print(f"Skipped {path}: {error}")
+    if len(errors) == len(paths):
+        print("Error: none of the training logs could be read")
+        return 1
+    try:
+        written = write_reports(reports, args.output, args.format)
+    except ImportError as e:
+        print(f"Error: {e}")
+        return 1
+    elapsed = time.perf_counter() - started
+    print(f"Summarized {len(paths) - len(errors)} logs in {elapsed:.1f}s ({len(paths) / elapsed:,.1f} logs/s)")
+    for path in written:
+        print(f"Wrote {path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
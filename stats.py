@@ -0,0 +1,228 @@
+import itertools
+import math
+import threading
+
+import compact
+import lazy
+
+pd = lazy.module('pandas')
+
+# Frames up to this many rows are added set by set rather than grouped
+SMALL_FRAME = 64
+# Sizes of an aggregate and of one session's daily values, measured with
+# tracemalloc, for cache budgets
+AGGREGATE_BYTES = 490
+VOLUME_BYTES = 245
+
+# Store versions are unique across stores, so a rebuilt store never reuses one
+_versions = itertools.count(1)
+
+
+def epley(weight, reps):
+    """Estimated one-rep max using the Epley formula."""
+    return weight if reps <= 1 else weight * (1 + reps / 30)
+
+
+def _number(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+
+def _date(timestamp):
+    moment = compact.local_timestamp(timestamp)
+    return moment.strftime('%Y-%m-%d') if moment is not None else None
+
+
+def _max(current, value):
+    if value is None:
+        return current
+    return value if current is None else max(current, value)
+
+
+class Aggregate:
+    """Running totals for one exercise or workout."""
+
+    __slots__ = ('best_weight', 'best_e1rm', 'sets', 'last_date', 'volumes', 'tops')
+
+    def __init__(self):
+        self.best_weight = None
+        self.best_e1rm = None
+        self.sets = 0
+        self.last_date = None
+        self.volumes = {}  # Session date -> total weight x reps
+        self.tops = {}  # Session date -> [top set weight, best estimated 1RM]
+
+    def add(self, weight, reps, date):
+        e1rm = epley(weight, reps) if weight is not None and reps is not None else None
+        self.best_weight = _max(self.best_weight, weight)
+        self.best_e1rm = _max(self.best_e1rm, e1rm)
+        self.sets += 1
+        if date is not None:
+            self.last_date = _max(self.last_date, date)
+            volume = weight * reps if weight is not None and reps is not None else 0.0
+            self.volumes[date] = self.volumes.get(date, 0.0) + volume
+            self.add_tops(date, weight, e1rm)
+
+    def add_tops(self, date, weight, e1rm):
+        tops = self.tops.get(date)
+        if tops is None:
+            self.tops[date] = [weight, e1rm]
+        else:
+            tops[0] = _max(tops[0], weight)
+            tops[1] = _max(tops[1], e1rm)
+
+    def merge(self, other):
+        self.best_weight = _max(self.best_weight, other.best_weight)
+        self.best_e1rm = _max(self.best_e1rm, other.best_e1rm)
+        self.sets += other.sets
+        self.last_date = _max(self.last_date, other.last_date)
+        for date, volume in other.volumes.items():
+            self.volumes[date] = self.volumes.get(date, 0.0) + volume
+        for date, (weight, e1rm) in other.tops.items():
+            self.add_tops(date, weight, e1rm)
+
+    def summary(self):
+        return {
+            'best_weight': self.best_weight,
+            'best_e1rm': self.best_e1rm,
+            'sets': self.sets,
+            'sessions': len(self.volumes),
+            'last_date': self.last_date,
+            'last_volume': self.volumes.get(self.last_date) if self.last_date else None
+        }
+
+
+class StatsStore:
+    """Per-exercise and per-workout aggregates kept up to date as sets arrive.
+
+    ``update`` folds a single set in with a handful of dictionary operations;
+    ``add_frame`` adds many rows with one grouped pass, so rebuilding the
+    store from a whole log never iterates over individual rows. ``version``
+    changes whenever sets are added, for caches of values derived from it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.exercises = {}
+        self.workouts = {}
+        self.version = next(_versions)
+
+    @classmethod
+    def from_frame(cls, df):
+        """Build a store from a history DataFrame."""
+        store = cls()
+        store.add_frame(df)
+        return store
+
+    def update(self, record):
+        """Add one saved set."""
+        weight = _number(record.get('weight_kg'))
+        reps = _number(record.get('reps'))
+        date = _date(record.get('timestamp'))
+        with self._lock:
+            self.version = next(_versions)
+            for name, target in ((record.get('exercise_name'), self.exercises),
+                                 (record.get('workout_name'), self.workouts)):
+                if name is None or (isinstance(name, float) and math.isnan(name)):
+                    continue
+                aggregate = target.get(name)
+                if aggregate is None:
+                    aggregate = target[name] = Aggregate()
+                aggregate.add(weight, reps, date)
+
+    def add_frame(self, df):
+        """Add the rows of a DataFrame."""
+        if df.empty:
+            return
+        if 'weight_kg' in df.columns:
+            df = df.assign(weight_kg=compact.widen_weights(df['weight_kg']))
+        if len(df) <= SMALL_FRAME:
+            for record in df.to_dict('records'):
+                self.update(record)
+            return
+
+        weight = pd.to_numeric(df['weight_kg'], errors='coerce')
+        reps = pd.to_numeric(df['reps'], errors='coerce')
+        rows = pd.DataFrame({
+            'weight': weight,
+            'e1rm': weight.where(reps <= 1, weight * (1 + reps / 30)).where(reps.notna()),
+            'volume': weight * reps,
+            # Formatting happens per group below, which is far cheaper than per row
+            'date': compact.parse_timestamps(df['timestamp']).dt.normalize()
+        })
+        with self._lock:
+            for column, target in (('exercise_name', self.exercises), ('workout_name', self.workouts)):
+                grouped = rows.assign(name=df[column]).dropna(subset=['name'])
+                per_name = grouped.groupby('name', observed=True).agg(
+                    best_weight=('weight', 'max'),
+                    best_e1rm=('e1rm', 'max'),
+                    sets=('weight', 'size')
+                )
+                dated = grouped.dropna(subset=['date'])
+                last_dates = dated.groupby('name', observed=True)['date'].max().dt.strftime('%Y-%m-%d')
+                per_session = dated.groupby(['name', 'date'], observed=True).agg(
+                    volume=('volume', 'sum'),
+                    top_weight=('weight', 'max'),
+                    best_e1rm=('e1rm', 'max')
+                )
+                per_session.index = per_session.index.set_levels(
+                    per_session.index.levels[1].strftime('%Y-%m-%d'), level=1
+                )
+                for name, best_weight, best_e1rm, sets in per_name.itertuples():
+                    aggregate = target.get(name)
+                    if aggregate is None:
+                        aggregate = target[name] = Aggregate()
+                    aggregate.best_weight = _max(aggregate.best_weight, _number(best_weight))
+                    aggregate.best_e1rm = _max(aggregate.best_e1rm, _number(best_e1rm))
+                    aggregate.sets += int(sets)
+                    aggregate.last_date = _max(aggregate.last_date, last_dates.get(name))
+                for (name, date), volume, top_weight, best_e1rm in per_session.itertuples():
+                    aggregate = target[name]
+                    aggregate.volumes[date] = aggregate.volumes.get(date, 0.0) + float(volume)
+                    aggregate.add_tops(date, _number(top_weight), _number(best_e1rm))
+            self.version = next(_versions)
+
+    def merge(self, other):
+        """Fold another store into this one."""
+        with self._lock:
+            self.version = next(_versions)
+            for source, target in ((other.exercises, self.exercises), (other.workouts, self.workouts)):
+                for name, aggregate in source.items():
+                    target.setdefault(name, Aggregate()).merge(aggregate)
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the store."""
+        with self._lock:
+            aggregates = list(self.exercises.values()) + list(self.workouts.values())
+        return sum(AGGREGATE_BYTES + VOLUME_BYTES * len(aggregate.volumes) for aggregate in aggregates)
+
+    def exercise(self, name):
+        """Return the summary of an exercise, or None if it was never logged."""
+        with self._lock:
+            aggregate = self.exercises.get(name)
+            return aggregate.summary() if aggregate is not None else None
+
+    def workout(self, name):
+        """Return the summary of a workout, or None if it was never logged."""
+        with self._lock:
+            aggregate = self.workouts.get(name)
+            return aggregate.summary() if aggregate is not None else None
+
+    def session_volumes(self, exercise_name):
+        """Return ``{date: volume}`` of every session of an exercise."""
+        with self._lock:
+            aggregate = self.exercises.get(exercise_name)
+            return dict(aggregate.volumes) if aggregate is not None else {}
+
+    def daily(self, exercise_name):
+        """Return ``(date, top set weight, best estimated 1RM, volume)`` per session, oldest first."""
+        with self._lock:
+            aggregate = self.exercises.get(exercise_name)
+            if aggregate is None:
+                return []
+            return [(date, *aggregate.tops.get(date, (None, None)), aggregate.volumes[date])
+                    for date in sorted(aggregate.volumes)]
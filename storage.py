@@ -0,0 +1,535 @@
+import argparse
+import csv
+import glob
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+
+import appender
+import cache
+import compact
+import config
+import history_index
+import lazy
+
+pd = lazy.module('pandas')
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched at a time when streaming stored sets
+CHUNK_ROWS = 10000
+# Fewer new rows than this are added to a history as records rather than a frame
+SMALL_APPEND_ROWS = 500
+# Columns stored as numbers; everything else is stored as text
+NUMERIC_COLUMNS = {
+    'set_number': 'INTEGER',
+    'weight_kg': 'REAL',
+    'reps': 'INTEGER',
+    'rpe': 'INTEGER',
+    'rest_sec': 'INTEGER'
+}
+
+
+def log_columns(config_data):
+    """Return the ordered list of columns stored for every set."""
+    return list(config_data['required_fields']) + list(config_data['optional_fields']) + ['timestamp']
+
+
+def _normalize(df, columns):
+    """Give a frame the stored columns with stable dtypes."""
+    df = df.reindex(columns=columns)
+    for column in columns:
+        if column in NUMERIC_COLUMNS:
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype('float64')
+        else:
+            df[column] = df[column].astype('string')
+    return df
+
+
+def _filter(df, exercise_name=None, start=None, end=None):
+    """Filter a frame by exercise and an inclusive ISO timestamp range."""
+    if df.empty:
+        return df
+    mask = pd.Series(True, index=df.index)
+    if exercise_name is not None:
+        mask &= df['exercise_name'] == exercise_name
+    if start is not None:
+        mask &= df['timestamp'] >= start
+    if end is not None:
+        mask &= df['timestamp'] <= end
+    return df[mask]
+
+
+def _records(df):
+    """Convert a frame to records with missing values as None."""
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+
+class Storage(ABC):
+    """Base class for training log storage backends."""
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = list(columns)
+        self._lock = threading.RLock()
+
+    def append(self, record):
+        """Store a single set."""
+        self.append_many([record])
+
+    @abstractmethod
+    def append_many(self, records):
+        """Store several sets at once."""
+
+    @abstractmethod
+    def load(self):
+        """Return the whole log as a DataFrame."""
+
+    def query(self, exercise_name=None, start=None, end=None):
+        """Return sets filtered by exercise and an inclusive ISO timestamp range."""
+        return _filter(self.load(), exercise_name, start, end)
+
+    def iter_records(self, columns):
+        """Yield every stored set as a record of ``columns`` only.
+
+        Backends stream the rows, so scanning a large log does not load it
+        whole. Values come as the backend stores them: CSV values are text.
+        """
+        yield from _records(self.load().reindex(columns=columns))
+
+    @abstractmethod
+    def version(self):
+        """Return a value that changes whenever the stored data changes."""
+
+    def _open_history(self):
+        """Return a new ``history_index.IncrementalHistory`` of the stored sets."""
+        raise NotImplementedError
+
+    def _history_version(self):
+        """Return a value that changes when the history must be rebuilt rather than extended."""
+        raise NotImplementedError
+
+    def history(self):
+        """Return the history structure used by the app, kept up to date incrementally.
+
+        The history lives in the shared ``cache``, so every session reading
+        the same storage shares one copy. Sets added since the last call are
+        folded into it; it is only rebuilt when ``_history_version`` changes.
+        """
+        key = ('history', type(self).__name__, os.path.abspath(self.path))
+        history = cache.shared.get_or_create(key, self._open_history, version=self._history_version())
+        return history.snapshot()
+
+
+class CsvStorage(Storage):
+    """Append-only CSV file, the original storage format.
+
+    Writes go through the shared lock-protected appender, so rows follow the
+    header of an existing file, or ``columns`` for a new one, whatever order
+    the keys of the appended records are in.
+    """
+
+    def __init__(self, path, columns, fsync_every=0, fsync_interval=0.0):
+        super().__init__(path, columns)
+        self.appender = appender.get_appender(path, columns, fsync_every, fsync_interval)
+
+    def append_many(self, records):
+        self.appender.append_many(records)
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return pd.DataFrame(columns=self.columns)
+        return pd.read_csv(self.path)
+
+    def iter_records(self, columns):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                yield {column: row.get(column) or None for column in columns}
+
+    def version(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def history(self):
+        # The incremental index only parses rows appended since the last call
+        return history_index.get_history_index(self.path).snapshot()
+
+
+class SqliteStorage(Storage):
+    """SQLite database with indexes on exercise and timestamp."""
+
+    def __init__(self, path, columns):
+        super().__init__(path, columns)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS sets (id INTEGER PRIMARY KEY AUTOINCREMENT)')
+            existing = {row[1] for row in self._conn.execute('PRAGMA table_info(sets)')}
+            for column in self.columns:
+                if column not in existing:
+                    column_type = NUMERIC_COLUMNS.get(column, 'TEXT')
+                    self._conn.execute(f'ALTER TABLE sets ADD COLUMN "{column}" {column_type}')
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_sets_exercise_timestamp ON sets (exercise_name, timestamp)'
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_sets_timestamp ON sets (timestamp)')
+
+    def _select(self):
+        return 'SELECT ' + ', '.join(f'"{column}"' for column in self.columns) + ' FROM sets'
+
+    def append_many(self, records):
+        placeholders = ', '.join('?' for _ in self.columns)
+        names = ', '.join(f'"{column}"' for column in self.columns)
+        rows = [tuple(record.get(column) for column in self.columns) for record in records]
+        with self._lock, self._conn:
+            self._conn.executemany(f'INSERT INTO sets ({names}) VALUES ({placeholders})', rows)
+
+    def load(self):
+        with self._lock:
+            return pd.read_sql_query(self._select() + ' ORDER BY id', self._conn)
+
+    def rows_after(self, last_id, columns, limit=-1):
+        """Return ``(id, *columns)`` tuples of the sets stored after ``last_id``, oldest first."""
+        names = ', '.join(f'"{column}"' for column in columns)
+        with self._lock:
+            return self._conn.execute(
+                f'SELECT id, {names} FROM sets WHERE id > ? ORDER BY id LIMIT ?', (last_id, limit)
+            ).fetchall()
+
+    def iter_records(self, columns):
+        last_id = 0
+        while True:
+            # Keyset pages, so no cursor stays open between chunks
+            rows = self.rows_after(last_id, columns, CHUNK_ROWS)
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            for row in rows:
+                yield dict(zip(columns, row[1:]))
+
+    def query(self, exercise_name=None, start=None, end=None):
+        clauses = []
+        params = []
+        if exercise_name is not None:
+            clauses.append('exercise_name = ?')
+            params.append(exercise_name)
+        if start is not None:
+            clauses.append('timestamp >= ?')
+            params.append(start)
+        if end is not None:
+            clauses.append('timestamp <= ?')
+            params.append(end)
+        sql = self._select()
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        with self._lock:
+            return pd.read_sql_query(sql + ' ORDER BY timestamp', self._conn, params=params)
+
+    def version(self):
+        with self._lock:
+            return self._conn.execute('SELECT max(id) FROM sets').fetchone()[0]
+
+    def _open_history(self):
+        return SqliteHistory(self)
+
+    def _history_version(self):
+        # Sets are only ever inserted; a replaced database is a new file
+        return os.stat(self.path).st_ino
+
+
+class SqliteHistory(history_index.IncrementalHistory):
+    """History of a SQLite store, extended with the sets past the last id read.
+
+    A save costs one indexed query for the new row, however large the
+    table. A maximum id below the last one read means the table was
+    emptied or replaced, and the history starts over.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        super().__init__()
+
+    def _reset(self):
+        super()._reset()
+        self.columns = [column for column in self.storage.columns if column not in compact.LAZY_COLUMNS]
+        self.last_id = 0
+
+    def refresh(self):
+        with self._lock:
+            last_id = self.storage.version() or 0
+            if last_id < self.last_id:
+                logger.info(f"History database {self.storage.path} changed, rebuilding index")
+                self._reset()
+            if last_id == self.last_id:
+                return self
+            rows = self.storage.rows_after(self.last_id, self.columns)
+            if not rows:
+                return self
+            self.last_id = rows[-1][0]
+            if len(rows) < SMALL_APPEND_ROWS:
+                self._append_records([dict(zip(self.columns, row[1:])) for row in rows])
+            else:
+                frame = pd.DataFrame.from_records([row[1:] for row in rows], columns=self.columns)
+                self._append_rows(compact.compact_frame(frame))
+            return self
+
+
+class ParquetStorage(Storage):
+    """Parquet dataset partitioned by month, for fast columnar scans.
+
+    Parquet files cannot be appended to, so new sets go to a small CSV
+    staging file inside the dataset directory. Once it holds ``flush_rows``
+    sets it is renamed aside and rewritten into the monthly partitions.
+    """
+
+    STAGING_FILE = '_staging.csv'
+    FLUSHING_FILE = '_flushing.csv'
+
+    def __init__(self, path, columns, flush_rows=500):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError("The parquet storage backend requires pyarrow (pip install pyarrow)")
+        super().__init__(path, columns)
+        self.flush_rows = flush_rows
+        os.makedirs(path, exist_ok=True)
+        self.staging = CsvStorage(os.path.join(path, self.STAGING_FILE), columns)
+        # A flush interrupted by a crash left its rows in the flushing file
+        self._flush_file(os.path.join(path, self.FLUSHING_FILE))
+        self._staged_count = len(self._staged_rows())
+
+    def _staged_rows(self):
+        return self.staging.load()
+
+    def _parquet_files(self):
+        return glob.glob(os.path.join(self.path, 'year_month=*', '*.parquet'))
+
+    def append_many(self, records):
+        with self._lock:
+            self.staging.append_many(records)
+            self._staged_count += len(records)
+            if self._staged_count >= self.flush_rows:
+                self.flush()
+
+    def flush(self):
+        """Move staged sets into the monthly Parquet partitions."""
+        with self._lock:
+            if not os.path.exists(self.staging.path):
+                return
+            flushing = os.path.join(self.path, self.FLUSHING_FILE)
+            # Rotate the staging file first so the rows being written out
+            # can never be mixed up with rows appended afterwards
+            os.replace(self.staging.path, flushing)
+            self._staged_count = 0
+            self._flush_file(flushing)
+
+    def _flush_file(self, path):
+        if not os.path.exists(path):
+            return
+        staged = CsvStorage(path, self.columns).load()
+        if not staged.empty:
+            self._write(staged)
+        os.remove(path)
+
+    def _write(self, df):
+        df = _normalize(df, self.columns)
+        df['year_month'] = df['timestamp'].str.slice(0, 7).fillna('unknown')
+        df.to_parquet(
+            self.path,
+            partition_cols=['year_month'],
+            index=False,
+            basename_template=f"part-{time.time_ns()}-{{i}}.parquet"
+        )
+
+    def _read(self, filters=None):
+        with self._lock:
+            return self._read_unlocked(filters)
+
+    def _read_unlocked(self, filters):
+        frames = []
+        if self._parquet_files():
+            frames.append(pd.read_parquet(self.path, columns=self.columns, filters=filters))
+        staged = self._staged_rows()
+        if not staged.empty:
+            frames.append(_normalize(staged, self.columns))
+        if not frames:
+            return _normalize(pd.DataFrame(columns=self.columns), self.columns)
+        return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+    def load(self):
+        return self._read()
+
+    def iter_records(self, columns):
+        import pyarrow.dataset as ds
+
+        # Held for the whole scan, so a flush cannot move staged rows past it
+        with self._lock:
+            if self._parquet_files():
+                dataset = ds.dataset(self.path, format='parquet', partitioning='hive')
+                stored = [column for column in columns if column in dataset.schema.names]
+                for batch in dataset.to_batches(columns=stored, batch_size=CHUNK_ROWS):
+                    for row in batch.to_pylist():
+                        yield {column: row.get(column) for column in columns}
+            yield from self.staging.iter_records(columns)
+
+    def query(self, exercise_name=None, start=None, end=None):
+        filters = []
+        if exercise_name is not None:
+            filters.append(('exercise_name', '==', exercise_name))
+        # Partition pruning on the month directories
+        if start is not None:
+            filters.append(('year_month', '>=', start[:7]))
+        if end is not None:
+            filters.append(('year_month', '<=', end[:7]))
+        return _filter(self._read(filters or None), exercise_name, start, end)
+
+    def version(self):
+        return self._history_version() + (self.staging.version(),)
+
+    def _history_version(self):
+        # Only a flush changes the Parquet files; staged sets are followed like a CSV log
+        files = self._parquet_files()
+        return (len(files), max((os.stat(f).st_mtime_ns for f in files), default=0))
+
+    def _open_history(self):
+        return ParquetHistory(self)
+
+
+class ParquetHistory(history_index.HistoryIndex):
+    """History of a Parquet store: the Parquet files read once, the staging CSV followed.
+
+    Saved sets are parsed from the staging file incrementally, like a CSV
+    log. A flush moves them into new Parquet files and removes the staging
+    file, which starts the history over from the Parquet files.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        super().__init__(storage.staging.path)
+
+    def _reset(self):
+        super()._reset()
+        self.columns = list(self.storage.columns)
+        with self.storage._lock:
+            if self.storage._parquet_files():
+                stored = pd.read_parquet(self.storage.path, columns=self._kept_columns())
+                self._append_rows(compact.compact_frame(stored))
+
+    def lazy_column(self, column):
+        """Read a column left out of ``data`` from the whole store, aligned with its rows."""
+        return self.storage.load()[column].reset_index(drop=True)
+
+
+def storage_path(config_data, backend=None):
+    """Return the configured path for a storage backend."""
+    backend = backend or config_data['storage_backend']
+    return {
+        'csv': config_data['local_file'],
+        'sqlite': config_data['sqlite_file'],
+        'parquet': config_data['parquet_dir'],
+        'partitioned': config_data['partition_dir']
+    }[backend]
+
+
+_storages = {}
+_storages_lock = threading.Lock()
+
+
+def open_storage(backend, path, columns, **options):
+    """Return the process-wide storage instance for a backend and path."""
+    if backend not in config.STORAGE_BACKENDS:
+        raise ValueError(f"Unknown storage backend: {backend}")
+    key = (backend, os.path.abspath(path), tuple(columns), tuple(sorted(options.items())))
+    with _storages_lock:
+        storage = _storages.get(key)
+        if storage is None:
+            if backend == 'partitioned':
+                # Imported here because partitions builds on this module
+                from partitions import PartitionedStorage as cls
+            else:
+                cls = {'csv': CsvStorage, 'sqlite': SqliteStorage, 'parquet': ParquetStorage}[backend]
+            storage = cls(path, columns, **options)
+            _storages[key] = storage
+    return storage
+
+
+def get_storage(config_data, backend=None, path=None):
+    """Return the storage backend selected in the config.
+
+    ``backend`` and ``path`` override the configured ones; reads and writes
+    of one store must both come through here, so they share one instance.
+    """
+    backend = backend or config_data['storage_backend']
+    options = {}
+    if backend in ('csv', 'partitioned'):
+        options = {'fsync_every': config_data['fsync_every'], 'fsync_interval': config_data['fsync_interval']}
+    path = path or storage_path(config_data, backend)
+    return open_storage(backend, path, log_columns(config_data), **options)
+
+
+def migrate(source, backend, target, columns, chunksize=50000, overwrite=False):
+    """Copy an existing CSV training log into another storage backend.
+
+    Refuses to write into a target that already holds sets unless
+    ``overwrite`` is set, in which case the target is replaced.
+    """
+    if os.path.exists(target):
+        if not overwrite:
+            existing = open_storage(backend, target, columns)
+            if not existing.load().empty:
+                raise ValueError(f"{target} already contains data, use --overwrite to replace it")
+        else:
+            with _storages_lock:
+                for key in [key for key in _storages if key[:2] == (backend, os.path.abspath(target))]:
+                    del _storages[key]
+            if os.path.isdir(target):
+                shutil.rmtree(target)
+            else:
+                for suffix in ('', '-wal', '-shm'):
+                    if os.path.exists(target + suffix):
+                        os.remove(target + suffix)
+    destination = open_storage(backend, target, columns)
+    total = 0
+    for chunk in pd.read_csv(source, chunksize=chunksize):
+        destination.append_many(_records(chunk.reindex(columns=columns)))
+        total += len(chunk)
+    if isinstance(destination, ParquetStorage):
+        destination.flush()
+    return total
+
+
+def main(argv=None):
+    config_data = config.get_config()
+    parser = argparse.ArgumentParser(description="Training log storage tools")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    migrate_parser = subparsers.add_parser('migrate', help="Convert a CSV training log to another backend")
+    migrate_parser.add_argument('--to', dest='backend', required=True, choices=['sqlite', 'parquet', 'partitioned'])
+    migrate_parser.add_argument('--source', default=config_data['local_file'], help="CSV log to convert")
+    migrate_parser.add_argument('--target', help="Destination path, defaults to the configured one")
+    migrate_parser.add_argument('--chunksize', type=int, default=50000)
+    migrate_parser.add_argument('--overwrite', action='store_true', help="Replace a target that already has data")
+    args = parser.parse_args(argv)
+
+    target = args.target or storage_path(config_data, args.backend)
+    try:
+        total = migrate(args.source, args.backend, target, log_columns(config_data), args.chunksize, args.overwrite)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    print(f"Migrated {total} sets from {args.source} to {args.backend} storage at {target}")
+    print(f"Set storage_backend: {args.backend} in config.yaml to use it")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
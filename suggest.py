@@ -0,0 +1,128 @@
+import bisect
+import difflib
+import math
+import threading
+from datetime import date
+
+import lazy
+
+pd = lazy.module('pandas')
+
+HALF_LIFE_DAYS = 30  # A name's recency bonus halves after this many days without use
+RECENCY_WEIGHT = 2.0
+FUZZY_CUTOFF = 0.6
+NAME_BYTES = 260  # Size of one indexed name, measured with tracemalloc, for cache budgets
+
+
+def _day(timestamp):
+    if isinstance(timestamp, date):
+        return timestamp.toordinal()
+    try:
+        return date.fromisoformat(str(timestamp)[:10]).toordinal()
+    except ValueError:
+        return None
+
+
+class SuggestionIndex:
+    """Workout or exercise names ranked by how often and how recently they were used.
+
+    Names are kept in a case-folded sorted list, so a prefix lookup is a
+    binary search; substring and fuzzy matches fill up short result lists.
+    Every lookup returns at most ``limit`` names, however many exist.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}  # name -> [count, last day as ordinal]
+        self._keys = []  # Sorted (case-folded name, name)
+        self._ranked = None
+        self._newest = None
+
+    @classmethod
+    def from_frame(cls, df, column):
+        """Build an index from the ``column`` of a history DataFrame."""
+        index = cls()
+        index.add_frame(df, column)
+        return index
+
+    def __contains__(self, name):
+        return name in self._stats
+
+    def __len__(self):
+        return len(self._stats)
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the index."""
+        return len(self._stats) * NAME_BYTES
+
+    def add(self, name, count=1, last_seen=None):
+        """Record ``count`` uses of ``name``, the latest at ``last_seen``."""
+        if name is None or (isinstance(name, float) and math.isnan(name)):
+            return
+        name = str(name)
+        day = _day(last_seen) if last_seen is not None else None
+        with self._lock:
+            entry = self._stats.get(name)
+            if entry is None:
+                self._stats[name] = [count, day]
+                bisect.insort(self._keys, (name.casefold(), name))
+            else:
+                entry[0] += count
+                if day is not None and (entry[1] is None or day > entry[1]):
+                    entry[1] = day
+            if day is not None and (self._newest is None or day > self._newest):
+                self._newest = day
+            self._ranked = None
+
+    def add_frame(self, df, column):
+        """Add every use of a name in ``column`` with one grouped pass."""
+        if df.empty or column not in df.columns:
+            return
+        rows = pd.DataFrame({'name': df[column], 'timestamp': df.get('timestamp')}).dropna(subset=['name'])
+        grouped = rows.groupby('name', observed=True).agg(count=('name', 'size'), last_seen=('timestamp', 'max'))
+        for name, count, last_seen in grouped.itertuples():
+            self.add(name, int(count), None if pd.isna(last_seen) else last_seen)
+
+    def _score(self, name):
+        count, day = self._stats[name]
+        score = math.log1p(count)
+        if day is not None and self._newest is not None:
+            score += RECENCY_WEIGHT * 0.5 ** ((self._newest - day) / HALF_LIFE_DAYS)
+        return score
+
+    def _rank(self, names):
+        return sorted(names, key=lambda name: (-self._score(name), name.casefold()))
+
+    def names(self):
+        """Return every name in alphabetical order."""
+        with self._lock:
+            return [name for _, name in self._keys]
+
+    def suggest(self, query='', limit=20):
+        """Return up to ``limit`` names matching ``query``, best first.
+
+        An empty query returns the top-ranked names. Otherwise names that
+        start with the query come first, then names containing it, then
+        close fuzzy matches, each group ranked by frequency and recency.
+        """
+        query = query.strip().casefold()
+        with self._lock:
+            if not query:
+                if self._ranked is None:
+                    self._ranked = self._rank(self._stats)
+                return self._ranked[:limit]
+
+            start = bisect.bisect_left(self._keys, (query,))
+            end = bisect.bisect_left(self._keys, (query + '\U0010ffff',))
+            results = self._rank(name for _, name in self._keys[start:end])[:limit]
+            if len(results) < limit:
+                found = set(results)
+                contains = [name for key, name in self._keys if query in key and name not in found]
+                results.extend(self._rank(contains)[:limit - len(results)])
+            if len(results) < limit:
+                found = set(results)
+                keys = {key: name for key, name in self._keys}
+                close = difflib.get_close_matches(query, keys, n=limit, cutoff=FUZZY_CUTOFF)
+                results.extend(keys[key] for key in close if keys[key] not in found)
+            return results[:limit]
@@ -2,10 +2,17 @@ import pytest
 import pandas as pd
 import os
 import json
+import subprocess
+import sys
 from unittest.mock import patch, MagicMock
 import app
+import compact
 import config
+import history_index
+import stats
+from benchmarks.generate import generate_log
 import logging
+import logging.handlers
 
 @pytest.fixture
 def sample_workout_data():
@@ -105,6 +112,93 @@ def test_load_history(mock_config):
         # Clean up
         os.remove(mock_config['local_file'])
 
+def test_load_history_incremental(tmp_path):
+    log_file = tmp_path / 'training_log.csv'
+    pd.DataFrame([
+        {'workout_name': 'Workout 1', 'exercise_name': 'Exercise 1', 'set_number': 1, 'weight_kg': 100.0, 'reps': 10}
+    ]).to_csv(log_file, index=False)
+
+    history = app.load_history(str(log_file))
+    assert len(history['data']) == 1
+
+    # Appended rows are picked up without re-parsing the whole file
+    index = history_index.get_history_index(str(log_file))
+    offset = index.offset
+    with open(log_file, 'a') as f:
+        f.write('Workout 2,Exercise 2,1,50.0,12\n')
+    history = app.load_history(str(log_file))
+    assert index.offset > offset
+    assert len(history['data']) == 2
+    assert history['workouts'] == ['Workout 1', 'Workout 2']
+    assert history['exercises'] == ['Exercise 1', 'Exercise 2']
+    assert history['stats'].exercise('Exercise 2')['best_weight'] == 50.0
+
+    # A truncated file triggers a full rebuild
+    pd.DataFrame([
+        {'workout_name': 'Workout 3', 'exercise_name': 'Exercise 3', 'set_number': 1, 'weight_kg': 20.0, 'reps': 5}
+    ]).to_csv(log_file, index=False)
+    history = app.load_history(str(log_file))
+    assert len(history['data']) == 1
+    assert history['workouts'] == ['Workout 3']
+    assert history['stats'].exercise('Exercise 1') is None
+
+def test_load_history_detects_in_place_rewrite(tmp_path):
+    log_file = tmp_path / 'training_log.csv'
+    log_file.write_text('workout_name,exercise_name,set_number,weight_kg,reps\nW1,E1,1,100,10\n')
+    assert app.load_history(str(log_file))['workouts'] == ['W1']
+
+    # Same inode, same header, larger file, but the parsed row changed
+    with open(log_file, 'r+') as f:
+        f.write('workout_name,exercise_name,set_number,weight_kg,reps\nWX,E1,1,999,10\nW2,E2,1,50,12\n')
+    history = app.load_history(str(log_file))
+    assert history['workouts'] == ['W2', 'WX']
+    assert history['data']['weight_kg'].tolist() == [999, 50]
+
+
+def test_load_history_snapshot_is_private(tmp_path):
+    log_file = tmp_path / 'training_log.csv'
+    log_file.write_text('workout_name,exercise_name,set_number,weight_kg,reps\nW1,E1,1,100,10\n')
+    history = app.load_history(str(log_file))
+    history['data'].loc[0, 'weight_kg'] = -1
+    with pytest.raises(TypeError):
+        history['workouts'] = []
+    assert app.load_history(str(log_file))['data'].loc[0, 'weight_kg'] == 100
+
+def test_small_appends_match_full_parse(tmp_path):
+    log_file = tmp_path / 'training_log.csv'
+    generate_log(str(log_file), 2000, seed=1)
+    history_index.get_history_index(str(log_file)).snapshot()
+    # Appends below SMALL_CHUNK_BYTES are parsed row by row
+    with open(log_file, 'a') as f:
+        f.write('Workout Z,Bench,1,100.5,5,8,90,,2030-01-01T10:00:00\n')
+        f.write('Workout Z,Bench,2,102.5,5,,90,"a, note",2030-01-01T10:05:00\n')
+    history = app.load_history(str(log_file))
+
+    full = compact.read_csv(str(log_file))
+    pd.testing.assert_frame_equal(history['data'], full, check_dtype=False, check_categorical=False)
+    expected = history_index.ExerciseIndex.from_frame(full).last_sessions('Bench', 3)
+    assert history['index'].last_sessions('Bench', 3) == expected
+    assert history['workouts'][-1] == 'Workout Z'
+    assert history['stats'].exercise('Bench') == stats.StatsStore.from_frame(full).exercise('Bench')
+
+def test_save_and_history_without_pandas(tmp_path):
+    code = (
+        "import sys, config, history_index, storage\n"
+        "config_data = dict(config.DEFAULT_CONFIG, local_file='log.csv')\n"
+        "storage.get_storage(config_data).append({'workout_name': 'Legs', 'exercise_name': 'Squat',"
+        " 'set_number': 1, 'weight_kg': 100.0, 'reps': 5, 'timestamp': '2024-01-01T10:00:00'})\n"
+        "history = history_index.get_history_index('log.csv').snapshot()\n"
+        "assert history['workouts'] == ['Legs']\n"
+        "assert history['index'].last_sessions('Squat')[0]['sets'] == [{'set': 1, 'weight': 100.0, 'reps': 5}]\n"
+        "assert history['stats'].exercise('Squat')['best_weight'] == 100.0\n"
+        "assert history['suggestions']['exercise_name'].suggest('sq') == ['Squat']\n"
+        "assert 'pandas' not in sys.modules, 'pandas was imported'\n"
+    )
+    root = os.path.dirname(os.path.abspath(app.__file__))
+    result = subprocess.run([sys.executable, '-c', code], cwd=tmp_path, capture_output=True, text=True,
+                            env={**os.environ, 'PYTHONPATH': root})
+    assert result.returncode == 0, result.stderr
+
 def test_get_exercise_history(mock_config):
     with patch('app.config.load_config', return_value=mock_config):
         # Create test data with multiple sets
@@ -140,14 +234,54 @@ def test_get_exercise_history(mock_config):
         # Clean up
         os.remove(mock_config['local_file'])
 
+def test_get_exercise_history_sessions():
+    test_data = pd.DataFrame([
+        {'workout_name': 'Workout 1', 'exercise_name': 'Exercise 1', 'set_number': 2,
+         'weight_kg': 105.0, 'reps': 8, 'timestamp': '2024-01-03T10:00:00'},
+        {'workout_name': 'Workout 1', 'exercise_name': 'Exercise 1', 'set_number': 1,
+         'weight_kg': 100.0, 'reps': 10, 'timestamp': '2024-01-03T09:00:00'},
+        {'workout_name': 'Workout 1', 'exercise_name': 'Exercise 1', 'set_number': 1,
+         'weight_kg': 95.0, 'reps': 10, 'timestamp': '2024-01-02T09:00:00'},
+        {'workout_name': 'Workout 1', 'exercise_name': 'Exercise 1', 'set_number': 1,
+         'weight_kg': 90.0, 'reps': 10, 'timestamp': '2024-01-01T09:00:00'},
+        {'workout_name': 'Workout 1', 'exercise_name': 'Exercise 2', 'set_number': 1,
+         'weight_kg': 50.0, 'reps': 12, 'timestamp': '2024-01-03T09:30:00'}
+    ])
+    index = history_index.ExerciseIndex.from_frame(test_data)
+
+    history = app.get_exercise_history(test_data, 'Exercise 1', sessions=3, index=index)
+    assert [workout['date'] for workout in history] == ['2024-01-03', '2024-01-02', '2024-01-01']
+    assert [s['set'] for s in history[0]['sets']] == [1, 2]
+
+    # Sets saved later are merged into the existing session
+    index.add_frame(pd.DataFrame([
+        {'workout_name': 'Workout 1', 'exercise_name': 'Exercise 1', 'set_number': 3,
+         'weight_kg': 110.0, 'reps': 6, 'timestamp': '2024-01-03T11:00:00'}
+    ]))
+    history = app.get_exercise_history(test_data, 'Exercise 1', index=index)
+    assert len(history) == 2
+    assert history[0]['sets'][-1]['weight'] == 110.0
+    assert app.get_exercise_history(test_data, 'Missing', index=index) is None
+    assert app.get_exercise_history(test_data, 'Exercise 1', sessions=0, index=index) is None
+    assert len(app.get_exercise_history(test_data, 'Exercise 1', sessions=1.0, index=index)) == 1
+
 def test_setup_logging(mock_config):
     with patch('app.config.load_config', return_value=mock_config):
         # Test logging setup
         logger = app.setup_logging(mock_config)
         
-        # Verify logger is configured
-        assert logger.level == logging.DEBUG
-        assert len(logger.handlers) == 2  # Stream and file handlers
+        # Verify logging goes through a single queue handler
+        assert logger.getEffectiveLevel() == logging.DEBUG
+        root_handlers = [h for h in logging.getLogger().handlers if isinstance(h, logging.handlers.QueueHandler)]
+        assert len(root_handlers) == 1
+        # The background listener writes to the stream and rotating file handlers
+        handler_types = [type(h) for h in app.log_setup.listener().handlers]
+        assert handler_types == [logging.StreamHandler, logging.handlers.RotatingFileHandler]
+
+        # Same settings on the next rerun keep the running listener
+        listener = app.log_setup.listener()
+        app.setup_logging(mock_config)
+        assert app.log_setup.listener() is listener
 
 if __name__ == '__main__':
     pytest.main([__file__]) 
\ No newline at end of file
@@ -0,0 +1,67 @@
+import csv
+import multiprocessing
+
+import appender
+from conftest import COLUMNS, make_set
+
+
+def read_rows(path):
+    with open(path, newline='') as f:
+        return list(csv.reader(f))
+
+
+def test_appender_writes_fixed_column_order(tmp_path):
+    path = tmp_path / 'log.csv'
+    writer = appender.CsvAppender(str(path), COLUMNS)
+    writer.append({'timestamp': 't1', 'reps': 5, 'workout_name': 'W1', 'exercise_name': 'E1',
+                   'set_number': 1, 'weight_kg': 80.0, 'unknown': 'x'})
+    writer.close()
+
+    rows = read_rows(path)
+    assert rows[0] == COLUMNS
+    assert rows[1] == ['W1', 'E1', '1', '80.0', '5', '', '', '', 't1']
+
+
+def test_appender_follows_existing_header(tmp_path):
+    path = tmp_path / 'log.csv'
+    path.write_text('timestamp,workout_name,exercise_name,set_number,weight_kg,reps\n')
+    writer = appender.CsvAppender(str(path), COLUMNS)
+    writer.append(make_set(workout='W1'))
+    writer.close()
+
+    assert read_rows(path)[1] == ['2024-01-15T10:00:00', 'W1', 'Squat', '1', '100.0', '5']
+
+
+def test_appender_reopens_replaced_file(tmp_path):
+    path = tmp_path / 'log.csv'
+    writer = appender.CsvAppender(str(path), COLUMNS, fsync_every=1)
+    writer.append(make_set(workout='W1'))
+    path.unlink()
+    writer.append(make_set(workout='W2'))
+    writer.close()
+
+    rows = read_rows(path)
+    assert rows[0] == COLUMNS
+    assert [row[0] for row in rows[1:]] == ['W2']
+
+
+def _write_many(path, worker, count):
+    writer = appender.CsvAppender(path, COLUMNS, fsync_every=50)
+    for set_number in range(count):
+        writer.append(make_set(set_number=set_number, workout=f'W{worker}'))
+    writer.close()
+
+
+def test_appender_concurrent_processes(tmp_path):
+    path = str(tmp_path / 'log.csv')
+    workers = [multiprocessing.Process(target=_write_many, args=(path, worker, 250)) for worker in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    rows = read_rows(path)
+    assert rows[0] == COLUMNS
+    assert len(rows) == 1 + 4 * 250
+    assert all(len(row) == len(COLUMNS) for row in rows[1:])
+    assert sum(row == COLUMNS for row in rows) == 1
@@ -0,0 +1,59 @@
+import pandas as pd
+import pytest
+
+from benchmarks import load_test, run
+from benchmarks.generate import generate_frame, generate_log
+
+
+def test_generated_log_is_reproducible(tmp_path):
+    first = generate_log(str(tmp_path / 'a.csv'), 500, seed=3)
+    second = generate_log(str(tmp_path / 'b.csv'), 500, seed=3)
+    df = pd.read_csv(first)
+    assert len(df) == 500
+    assert df.equals(pd.read_csv(second))
+    assert not df.equals(pd.read_csv(generate_log(str(tmp_path / 'c.csv'), 500, seed=4)))
+
+
+def test_generated_sets_are_grouped_into_sessions():
+    df = generate_frame(40)
+    assert df['set_number'].tolist()[:5] == [1, 2, 3, 4, 1]
+    assert df['timestamp'].is_monotonic_increasing
+    assert df['workout_name'].nunique() == 2
+
+
+def test_compare_flags_only_slower_medians():
+    baseline = {'results': {'a': {'median': 1.0}, 'b': {'median': 1.0}}}
+    current = {'results': {'a': {'median': 1.2}, 'b': {'median': 1.3}, 'new': {'median': 9.0}}}
+    assert run.compare(current, baseline, 1.25) == [('b', 1.0, 1.3)]
+
+
+def test_import_profile_lists_direct_imports():
+    names = [name for name, _ in run.import_profile('storage')]
+    assert 'history_index' in names
+    assert 'pandas' not in names
+
+
+def test_percentile_uses_nearest_rank():
+    samples = list(range(1, 101))
+    assert load_test.percentile(samples, 50) == 50
+    assert load_test.percentile(samples, 99) == 99
+    assert load_test.percentile([3.0], 95) == 3.0
+    assert load_test.percentile([], 50) is None
+
+
+def test_load_test_requires_the_validated_streamlit():
+    load_test.check_streamlit_version(load_test.STREAMLIT_VERSION)
+    with pytest.raises(RuntimeError, match=load_test.STREAMLIT_VERSION):
+        load_test.check_streamlit_version('1.32.0')
+
+
+def test_load_test_saves_every_set_once():
+    results = load_test.run_load_test([2], sets=2, rows=200, timeout=30)['results']
+    assert len(results) == 1
+    level = results[0]
+    assert level['session_errors'] == 0, level['error_samples']
+    assert (level['sets_saved'], level['missing_sets'], level['malformed_rows']) == (4, 0, 0)
+    assert level['webhook_delivered'] == 4
+    # mode, start, workout, exercise, two saves and end for each session, plus the first run
+    assert level['reruns'] == 2 * 8
+    assert 0 < level['p50'] <= level['p95'] <= level['p99']
@@ -0,0 +1,126 @@
+import gc
+import threading
+import time
+import tracemalloc
+
+import pandas as pd
+import pytest
+
+import cache
+import history_index
+import storage
+from benchmarks.generate import generate_log
+from conftest import COLUMNS, make_set
+
+
+class Sized:
+    def __init__(self, nbytes):
+        self.nbytes = nbytes
+
+
+def test_hits_misses_and_versions():
+    lru = cache.LRUCache(budget_bytes=1000)
+    calls = []
+
+    def create():
+        calls.append(1)
+        return Sized(10)
+
+    first = lru.get_or_create('log', create, version=1)
+    assert lru.get_or_create('log', create, version=1) is first
+    # A new file version replaces the entry
+    assert lru.get_or_create('log', create, version=2) is not first
+    assert len(calls) == 2
+    assert lru.stats() == {
+        'hits': 1, 'misses': 2, 'evictions': 0, 'entries': 1, 'bytes': 10, 'budget_bytes': 1000
+    }
+
+
+def test_evicts_least_recently_used_over_budget():
+    lru = cache.LRUCache(budget_bytes=250)
+    for key in 'abc':
+        lru.get_or_create(key, lambda: Sized(100))
+    assert lru.stats()['evictions'] == 1
+    # 'b' is used again, so 'c' is now the oldest entry
+    lru.get_or_create('b', lambda: Sized(100))
+    lru.get_or_create('d', lambda: Sized(100))
+    assert list(lru._entries) == ['b', 'd']
+
+    # The newest entry is kept even when it alone exceeds the budget
+    lru.get_or_create('huge', lambda: Sized(1000))
+    assert list(lru._entries) == ['huge']
+    lru.set_budget(2000)
+    assert lru.stats()['evictions'] == 4
+
+
+def test_growing_entries_are_measured_again():
+    lru = cache.LRUCache(budget_bytes=150)
+    growing = lru.get_or_create('growing', lambda: Sized(50))
+    lru.get_or_create('other', lambda: Sized(50))
+    growing.nbytes = 120
+    lru.get_or_create('growing', lambda: Sized(0))
+    assert list(lru._entries) == ['growing']
+    assert lru.stats()['bytes'] == 120
+
+
+def test_concurrent_misses_create_once():
+    lru = cache.LRUCache()
+    calls = []
+
+    def create():
+        calls.append(1)
+        time.sleep(0.05)
+        return Sized(1)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(lru.get_or_create('log', create)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+
+
+def test_estimate_size():
+    df = pd.DataFrame({'a': range(100)}, dtype='int64')
+    assert cache.estimate_size(df) == 800
+    assert cache.estimate_size((df, [Sized(5)], {'x': Sized(7)}, 'text')) == 812
+
+
+def test_sessions_share_parsed_history(tmp_path):
+    log_file = tmp_path / 'log.csv'
+    backend = storage.CsvStorage(str(log_file), COLUMNS)
+    backend.append(make_set('E1', timestamp='2024-01-01T10:00:00', workout='W1'))
+
+    index = history_index.get_history_index(str(log_file))
+    assert history_index.get_history_index(str(tmp_path / '.' / 'log.csv')) is index
+    index.refresh()
+    assert index.nbytes > 0
+
+    sqlite = storage.SqliteStorage(str(tmp_path / 'log.db'), COLUMNS)
+    sqlite.append(make_set('E1', timestamp='2024-01-01T10:00:00', workout='W1'))
+    other = storage.SqliteStorage(str(tmp_path / 'log.db'), COLUMNS)
+    assert sqlite.history()['index'] is other.history()['index']
+    sqlite.append(make_set('E1', timestamp='2024-01-02T10:00:00', workout='W2'))
+    assert other.history()['workouts'] == ['W1', 'W2']
+
+
+def test_history_nbytes_matches_measured_memory(tmp_path):
+    log_file = tmp_path / 'log.csv'
+    generate_log(str(log_file), 50000, seed=4)
+    history_index.HistoryIndex(str(log_file)).refresh()  # Warm up pandas' own caches
+    gc.collect()
+    tracemalloc.start()
+    try:
+        index = history_index.HistoryIndex(str(log_file)).refresh()
+        with open(log_file, 'a') as f:
+            f.writelines(f'Workout Z,Bench,{i},100.5,5,8,90,,2030-01-01T10:{i % 60:02d}:00\n' for i in range(200))
+        index.refresh()
+        gc.collect()
+        measured = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    # The estimate weighs the index against cache_budget_mb, so it must not undercount
+    assert index.nbytes == pytest.approx(measured, rel=0.2)
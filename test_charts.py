@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+import cache
+import charts
+import stats
+from conftest import make_set
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.shared.clear()
+    yield
+    cache.shared.clear()
+
+
+def test_lttb_keeps_endpoints_and_spikes():
+    x = np.arange(1000)
+    y = np.zeros(1000)
+    y[437] = 50.0  # A one-day spike must survive downsampling
+    kept = charts.lttb(x, y, 50)
+    assert len(kept) == 50
+    assert kept[0] == 0 and kept[-1] == 999
+    assert 437 in kept
+    assert (np.diff(kept) > 0).all()
+
+
+def test_lttb_short_series_are_unchanged():
+    assert charts.lttb([1, 2, 3], [1, 2, 3], 10).tolist() == [0, 1, 2]
+    with pytest.raises(ValueError):
+        charts.lttb(np.arange(10), np.arange(10), 2)
+
+
+def test_progress_plots_daily_values():
+    store = stats.StatsStore()
+    store.update(make_set(timestamp='2024-01-15T10:00:00', weight=100.0, reps=5))
+    store.update(make_set(timestamp='2024-01-15T10:05:00', weight=110.0, reps=3))
+    store.update(make_set(timestamp='2024-01-17T10:00:00', weight=90.0, reps=10))
+
+    chart = charts.progress(store, 'Squat', 'top_weight', source='log')
+    assert list(chart.columns) == [charts.METRICS['top_weight']]
+    assert chart.index.strftime('%Y-%m-%d').tolist() == ['2024-01-15', '2024-01-17']
+    assert chart.iloc[:, 0].tolist() == [110.0, 90.0]
+    assert charts.progress(store, 'Squat', 'volume', source='log').iloc[:, 0].tolist() == [830.0, 900.0]
+    assert charts.progress(store, 'Missing', source='log').empty
+    with pytest.raises(ValueError):
+        charts.progress(store, 'Squat', 'speed')
+
+
+def test_progress_is_downsampled_and_cached_until_new_sets():
+    store = stats.StatsStore()
+    for day in range(1000):
+        timestamp = (np.datetime64('2020-01-01') + day).astype(str) + 'T10:00:00'
+        store.update(make_set(timestamp=timestamp, weight=100.0 + day % 37))
+
+    chart = charts.progress(store, 'Squat', points=100, source='log')
+    assert len(chart) == 100
+    assert chart.index[0].strftime('%Y-%m-%d') == '2020-01-01'
+    assert charts.progress(store, 'Squat', points=100, source='log') is chart
+
+    store.update(make_set(timestamp='2030-01-01T10:00:00', weight=200.0))
+    updated = charts.progress(store, 'Squat', points=100, source='log')
+    assert updated is not chart
+    assert updated.index[-1].strftime('%Y-%m-%d') == '2030-01-01'
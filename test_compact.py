@@ -0,0 +1,70 @@
+import io
+from datetime import datetime, timezone
+
+import pandas as pd
+
+import compact
+import history_index
+
+CSV = (
+    "workout_name,exercise_name,set_number,weight_kg,reps,rpe,rest_sec,notes,timestamp\n"
+    "Legs,Squat,1,100.5,5,8,120,felt heavy,2024-01-15T10:00:00\n"
+    "Legs,Squat,2,102.5,5,,90,,2024-01-15T10:05:00\n"
+)
+
+
+def test_read_csv_uses_compact_dtypes_and_skips_notes():
+    df = compact.read_csv(io.BytesIO(CSV.encode()))
+    assert 'notes' not in df.columns
+    assert isinstance(df['exercise_name'].dtype, pd.CategoricalDtype)
+    assert df['weight_kg'].dtype == 'float32'
+    assert df['set_number'].dtype == 'int8'
+    assert df['rest_sec'].dtype == 'int8'
+    # A missing RPE keeps the column float
+    assert df['rpe'].dtype == 'float32'
+    assert pd.api.types.is_datetime64_any_dtype(df['timestamp'])
+
+
+def test_concat_keeps_categories():
+    first = compact.compact_frame(pd.DataFrame({'workout_name': ['Legs'], 'exercise_name': ['Squat']}))
+    second = compact.compact_frame(pd.DataFrame({'workout_name': ['Push'], 'exercise_name': ['Bench']}))
+    df = compact.concat([first, second])
+    assert isinstance(df['exercise_name'].dtype, pd.CategoricalDtype)
+    assert df['exercise_name'].tolist() == ['Squat', 'Bench']
+
+
+def test_widen_weights_rounds_float32():
+    weights = compact.widen_weights(pd.Series([20.3, 102.5], dtype='float32'))
+    assert weights.tolist() == [20.3, 102.5]
+
+
+def test_history_index_is_compact_and_loads_notes_on_request(tmp_path):
+    log_file = tmp_path / 'training_log.csv'
+    log_file.write_text(CSV)
+    index = history_index.HistoryIndex(str(log_file)).refresh()
+    with open(log_file, 'a') as f:
+        f.write("Push,Bench,1,80,8,7,60,new,2024-01-16T10:00:00\n")
+    index.refresh()
+
+    assert 'notes' not in index.data.columns
+    assert isinstance(index.data['workout_name'].dtype, pd.CategoricalDtype)
+    assert index.data['workout_name'].tolist() == ['Legs', 'Legs', 'Push']
+    assert index.lazy_column('notes').tolist()[::2] == ['felt heavy', 'new']
+    usage = index.memory_usage()
+    assert usage['rows'] == 3
+    assert usage['indexes']['exercise_index'] == index.exercise_index.nbytes > 0
+    assert usage['total'] == usage['bytes'] + sum(usage['indexes'].values())
+    assert index.exercise_index.last_sessions('Squat')[0]['sets'][0]['weight'] == 100.5
+
+
+def test_mixed_utc_offsets_are_read_as_local_time(tmp_path):
+    log = CSV + "Legs,Squat,1,105,5,8,90,,2024-01-20T10:00:00+01:00\nLegs,Squat,1,107.5,5,8,90,,2024-01-25T23:30:00Z\n"
+    df = compact.read_csv(io.BytesIO(log.encode()))
+    assert df['timestamp'].dtype == 'datetime64[ns]'
+    expected = [
+        datetime(2024, 1, 20, 9, tzinfo=timezone.utc), datetime(2024, 1, 25, 23, 30, tzinfo=timezone.utc)
+    ]
+    assert df['timestamp'].tolist()[2:] == [moment.astimezone().replace(tzinfo=None) for moment in expected]
+
+    index = history_index.ExerciseIndex.from_frame(df)
+    assert len(index.last_sessions('Squat', 5)) == 3
@@ -0,0 +1,93 @@
+import os
+from unittest.mock import patch
+
+import pytest
+import yaml
+
+import config
+
+
+def write_config(path, data, mtime_ns=None):
+    with open(path, 'w') as f:
+        yaml.dump(data, f)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_validate_config_fills_defaults_and_rejects_bad_values():
+    data = config.validate_config({'history_sessions': 'three', 'log_level': 'LOUD', 'webhook_batching': True})
+    assert data['history_sessions'] == config.DEFAULT_CONFIG['history_sessions']
+    assert data['log_level'] == config.DEFAULT_CONFIG['log_level']
+    assert data['webhook_batching'] is True
+    assert data['local_file'] == config.DEFAULT_CONFIG['local_file']
+
+
+@pytest.mark.parametrize('key, value', [
+    ('history_sessions', 0),
+    ('history_sessions', 2.5),
+    ('webhook_max_retries', 1.5),
+    ('webhook_max_retries', -1),
+    ('outbox_max_queue', 0),
+    ('webhook_timeout', 0),
+    ('webhook_batch_interval', -5)
+])
+def test_validate_config_enforces_numeric_ranges(key, value):
+    assert config.validate_config({key: value})[key] == config.DEFAULT_CONFIG[key]
+
+
+def test_validate_config_accepts_valid_numbers():
+    data = config.validate_config({'webhook_timeout': 3, 'webhook_max_retries': 0, 'webhook_backoff': 0})
+    assert data['webhook_timeout'] == 3
+    assert data['webhook_max_retries'] == 0
+    assert data['webhook_backoff'] == 0
+
+
+def test_config_cache_returns_immutable_snapshot(tmp_path):
+    path = tmp_path / 'config.yaml'
+    write_config(path, {'local_file': 'a.csv'})
+    cache = config.ConfigCache(str(path), check_interval=0)
+
+    snapshot = cache.get()
+    assert snapshot['local_file'] == 'a.csv'
+    assert isinstance(snapshot['required_fields'], tuple)
+    with pytest.raises(TypeError):
+        snapshot['local_file'] = 'b.csv'
+
+    # Unchanged file returns the very same snapshot
+    assert cache.get() is snapshot
+
+
+def test_config_cache_reloads_on_mtime_change(tmp_path):
+    path = tmp_path / 'config.yaml'
+    write_config(path, {'local_file': 'a.csv'}, mtime_ns=1_000_000_000)
+    cache = config.ConfigCache(str(path), check_interval=60)
+    assert cache.get()['local_file'] == 'a.csv'
+
+    write_config(path, {'local_file': 'b.csv'}, mtime_ns=2_000_000_000)
+    # Within the check interval the cached snapshot is served without a stat
+    assert cache.get()['local_file'] == 'a.csv'
+    cache.invalidate()
+    assert cache.get()['local_file'] == 'b.csv'
+
+
+def test_config_cache_notices_edit_made_while_loading(tmp_path):
+    path = tmp_path / 'config.yaml'
+    write_config(path, {'local_file': 'a.csv'}, mtime_ns=1_000_000_000)
+    cache = config.ConfigCache(str(path), check_interval=0)
+    original_load = config.load_config
+
+    def load_then_edit(load_path):
+        data = original_load(load_path)
+        write_config(path, {'local_file': 'b.csv'}, mtime_ns=2_000_000_000)
+        return data
+
+    with patch('config.load_config', side_effect=load_then_edit):
+        assert cache.get()['local_file'] == 'a.csv'
+    assert cache.get()['local_file'] == 'b.csv'
+
+
+def test_config_cache_writes_default_file(tmp_path):
+    path = tmp_path / 'config.yaml'
+    cache = config.ConfigCache(str(path))
+    assert cache.get()['local_file'] == config.DEFAULT_CONFIG['local_file']
+    assert path.exists()
@@ -0,0 +1,94 @@
+import gzip
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+import pandas as pd
+
+import config
+import importer
+import storage
+from conftest import COLUMNS, make_set
+
+
+def test_validate():
+    row = make_set('Squat', '2', '2024-01-01T10:00:00', '102.5', rest_sec='')
+    record = importer.validate(row, config.DEFAULT_CONFIG)
+    assert record['set_number'] == 2
+    assert record['weight_kg'] == 102.5
+    assert record['rest_sec'] is None
+    assert record['notes'] is None
+
+    for row, message in [
+        ({**make_set('Squat', 1, '2024-01-01'), 'exercise_name': ''}, 'missing exercise_name'),
+        (make_set('Squat', 1.5, '2024-01-01'), 'not a whole number'),
+        (make_set('Squat', 1, '2024-01-01', 'heavy'), 'not a number'),
+        (make_set('Squat', 1, 'yesterday'), 'invalid timestamp'),
+        ({**make_set('Squat', 1, '2024-01-01'), 'timestamp': None}, 'missing timestamp')
+    ]:
+        try:
+            importer.validate(row, config.DEFAULT_CONFIG)
+        except importer.InvalidRow as e:
+            assert message in str(e)
+        else:
+            raise AssertionError(f"{row} was accepted")
+
+
+def test_import_csv_in_chunks_and_skip_duplicates(tmp_path):
+    export = tmp_path / 'export.csv'
+    rows = [make_set('Squat', i % 4 + 1, f'2024-01-{i // 4 + 1:02d}T10:00:00') for i in range(40)]
+    pd.DataFrame(rows + rows[:5]).to_csv(export, index=False)
+    backend = storage.CsvStorage(str(tmp_path / 'log.csv'), COLUMNS)
+    backend.append(dict(rows[0], set_number=1.0))
+
+    chunks = []
+    report = importer.import_file(str(export), backend, config.DEFAULT_CONFIG, chunk_rows=8,
+                                  progress=lambda r: chunks.append(r.imported))
+    assert report.rows == 45
+    assert report.imported == 39
+    assert report.duplicates == 6
+    assert chunks == [8, 16, 24, 32, 39]
+    assert len(backend.load()) == 40
+    assert 'rows/s' in report.summary()
+
+    again = importer.import_file(str(export), backend, config.DEFAULT_CONFIG)
+    assert again.imported == 0
+    assert again.duplicates == 45
+
+
+def test_import_gzipped_jsonl_into_sqlite(tmp_path):
+    export = tmp_path / 'export.jsonl.gz'
+    with gzip.open(export, 'wt') as f:
+        f.write(json.dumps(make_set('Bench', 1, '2024-01-01T10:00:00Z')) + '\n')
+        f.write('not json\n\n')
+        f.write(json.dumps([1, 2]) + '\n')
+        f.write(json.dumps(make_set('Bench', 2, '2024-01-01T10:05:00')) + '\n')
+    backend = storage.SqliteStorage(str(tmp_path / 'log.db'), COLUMNS)
+
+    report = importer.import_file(str(export), backend, config.DEFAULT_CONFIG)
+    assert (report.imported, report.invalid) == (2, 2)
+    assert report.errors[0].startswith('line 2: invalid JSON')
+    assert report.errors[1] == 'line 4: not a JSON object'
+    # Offsets are converted to the naive local time the app logs
+    utc = datetime(2024, 1, 1, 10, tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+    assert backend.load()['timestamp'].tolist() == [utc.isoformat(), '2024-01-01T10:05:00']
+    assert importer.import_file(str(export), backend, config.DEFAULT_CONFIG).duplicates == 2
+
+
+def test_cli_does_not_load_streamlit(tmp_path):
+    export = tmp_path / 'export.csv'
+    pd.DataFrame([make_set('Squat', 1, '2024-01-01T10:00:00')]).to_csv(export, index=False)
+    target = tmp_path / 'log.csv'
+    code = (
+        "import sys, importer\n"
+        f"assert importer.main([{str(export)!r}, '--backend', 'csv', '--target', {str(target)!r}]) == 0\n"
+        "assert 'streamlit' not in sys.modules\n"
+        "assert 'pandas' not in sys.modules\n"
+    )
+    result = subprocess.run([sys.executable, '-c', code], cwd=tmp_path, capture_output=True, text=True,
+                            env={**os.environ, 'PYTHONPATH': os.path.dirname(os.path.abspath(importer.__file__))})
+    assert result.returncode == 0, result.stderr
+    assert '1 imported' in result.stdout
+    assert target.read_text().count('\n') == 2
@@ -0,0 +1,54 @@
+import json
+import logging
+
+import pytest
+
+import log_setup
+
+
+@pytest.fixture
+def log_config(tmp_path):
+    yield {'log_level': 'INFO', 'log_file': str(tmp_path / 'app.log'), 'log_json': False}
+    log_setup.shutdown()
+
+
+def test_records_are_written_by_the_listener(log_config):
+    log_setup.configure(log_config)
+    logging.getLogger('test').info("hello %s", 'world')
+    log_setup.shutdown()
+    with open(log_config['log_file']) as f:
+        assert f.read().strip().endswith("INFO - hello world")
+
+
+def test_json_lines_mode(log_config):
+    log_setup.configure(dict(log_config, log_json=True))
+    logging.getLogger('test').warning("careful")
+    log_setup.shutdown()
+    with open(log_config['log_file']) as f:
+        entry = json.loads(f.readline())
+    assert entry['level'] == 'WARNING'
+    assert entry['logger'] == 'test'
+    assert entry['message'] == 'careful'
+
+
+def test_reconfigure_replaces_queue_handler(log_config):
+    first = log_setup.configure(log_config)
+    second = log_setup.configure(dict(log_config, log_json=True))
+    assert second is not first
+    queue_handlers = [h for h in logging.getLogger().handlers if isinstance(h, logging.handlers.QueueHandler)]
+    assert len(queue_handlers) == 1
+
+
+def test_lazy_arguments_are_only_evaluated_when_emitted(log_config):
+    calls = []
+
+    def payload():
+        calls.append(1)
+        return 'payload'
+
+    log_setup.configure(log_config)
+    logging.getLogger('test').debug("data: %s", log_setup.Lazy(payload))
+    assert calls == []
+    logging.getLogger('test').info("data: %s", log_setup.Lazy(payload))
+    log_setup.shutdown()
+    assert calls
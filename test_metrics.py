@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+import metrics
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    metrics.registry.reset()
+    yield
+    metrics.configure({})
+    metrics.registry.reset()
+
+
+def test_span_is_shared_noop_when_disabled():
+    metrics.configure({'metrics_enabled': False})
+    assert metrics.span('a') is metrics.span('b')
+    with metrics.span('a'):
+        pass
+    metrics.inc('reruns')
+    assert metrics.registry.snapshot() == {'counters': {}, 'histograms': {}, 'last': {}}
+
+
+def test_span_and_counter_record_when_enabled():
+    metrics.configure({'metrics_enabled': True})
+    for _ in range(3):
+        with metrics.span('form'):
+            pass
+    metrics.inc('reruns')
+    metrics.inc('reruns', 2)
+
+    data = metrics.registry.snapshot()
+    assert data['counters'] == {'reruns': 3}
+    assert data['histograms']['form']['count'] == 3
+    assert data['histograms']['form']['buckets'][-1] == ['+Inf', 3]
+    assert 'form' in data['last']
+
+
+def test_timed_decorator_keeps_result_and_records():
+    @metrics.timed('double')
+    def double(x):
+        return x * 2
+
+    metrics.configure({'metrics_enabled': True})
+    assert double(2) == 4
+    assert double.__name__ == 'double'
+    assert metrics.registry.snapshot()['histograms']['double']['count'] == 1
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = metrics.Histogram(buckets=(0.01, 0.1))
+    for value in (0.005, 0.05, 0.05, 1.0):
+        histogram.observe(value)
+    assert histogram.to_dict()['buckets'] == [[0.01, 1], [0.1, 3], ['+Inf', 4]]
+
+
+def test_prometheus_export(tmp_path):
+    metrics.configure({'metrics_enabled': True})
+    metrics.registry.observe('load history', 0.002)
+    metrics.inc('sets_saved')
+    path = tmp_path / 'metrics.prom'
+    metrics.export(str(path), 'prometheus')
+
+    text = path.read_text()
+    assert '# TYPE workout_logger_sets_saved_total counter' in text
+    assert 'workout_logger_sets_saved_total 1' in text
+    assert 'workout_logger_span_seconds_bucket{span="load history",le="0.0025"} 1' in text
+    assert 'workout_logger_span_seconds_count{span="load history"} 1' in text
+
+
+def test_maybe_export_respects_interval(tmp_path):
+    path = tmp_path / 'metrics.json'
+    config_data = {'metrics_enabled': True, 'metrics_file': str(path),
+                   'metrics_format': 'json', 'metrics_export_interval': 3600.0}
+    metrics.configure(config_data)
+    metrics._last_export = None
+    metrics.inc('reruns')
+    assert metrics.maybe_export(config_data)
+    assert json.loads(path.read_text())['counters'] == {'reruns': 1}
+    assert not metrics.maybe_export(config_data)
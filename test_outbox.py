@@ -0,0 +1,137 @@
+import threading
+import time
+
+import pytest
+
+import config
+import outbox
+from benchmarks.stub_server import StubWebhook
+
+
+@pytest.fixture
+def stub():
+    server = StubWebhook()
+    yield server
+    server.close()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_outbox_delivers_in_background(stub, tmp_path):
+    box = outbox.Outbox(stub.url, spool_dir=str(tmp_path), backoff=0.01).start()
+    try:
+        box.put({'exercise_name': 'Squat', 'set_number': 1})
+        box.put({'exercise_name': 'Squat', 'set_number': 2})
+        assert wait_for(lambda: len(stub.payloads) == 2)
+        assert [p['set_number'] for p in stub.payloads] == [1, 2]
+        assert wait_for(lambda: box.pending() == [])
+    finally:
+        box.stop()
+
+
+def test_outbox_retries_server_errors(stub, tmp_path):
+    stub.statuses = [500, 503]
+    box = outbox.Outbox(stub.url, spool_dir=str(tmp_path), backoff=0.01).start()
+    try:
+        box.put({'exercise_name': 'Bench'})
+        assert wait_for(lambda: len(stub.payloads) == 1)
+        assert stub.statuses == []
+    finally:
+        box.stop()
+
+
+def test_outbox_moves_rejected_records_aside(stub, tmp_path):
+    stub.statuses = [400]
+    box = outbox.Outbox(stub.url, spool_dir=str(tmp_path), backoff=0.01).start()
+    try:
+        record_id = box.put({'exercise_name': 'Bench'})
+        assert wait_for(lambda: (tmp_path / 'failed' / f"{record_id}.json").exists())
+        assert box.pending() == []
+        assert stub.payloads == []
+    finally:
+        box.stop()
+
+
+def test_outbox_replays_spool_after_restart(stub, tmp_path):
+    # Records spooled while the webhook was unreachable survive a restart
+    offline = outbox.Outbox('http://127.0.0.1:9/hook', spool_dir=str(tmp_path), timeout=0.5)
+    offline.put({'exercise_name': 'Deadlift', 'set_number': 1})
+    assert len(offline.pending()) == 1
+
+    box = outbox.Outbox(stub.url, spool_dir=str(tmp_path)).start()
+    try:
+        assert wait_for(lambda: len(stub.payloads) == 1)
+        assert stub.payloads[0]['exercise_name'] == 'Deadlift'
+        assert wait_for(lambda: box.pending() == [])
+    finally:
+        box.stop()
+
+
+def test_outbox_batches_by_size(stub, tmp_path):
+    box = outbox.Outbox(stub.url, spool_dir=str(tmp_path), batching=True,
+                        batch_size=3, batch_interval=60).start()
+    try:
+        for set_number in range(1, 7):
+            box.put({'exercise_name': 'Row', 'set_number': set_number})
+        assert wait_for(lambda: len(stub.payloads) == 2)
+        assert [[r['set_number'] for r in batch] for batch in stub.payloads] == [[1, 2, 3], [4, 5, 6]]
+    finally:
+        box.stop()
+
+
+def test_outbox_flush_sends_partial_batch(stub, tmp_path):
+    box = outbox.Outbox(stub.url, spool_dir=str(tmp_path), batching=True,
+                        batch_size=10, batch_interval=60).start()
+    try:
+        box.put({'exercise_name': 'Row', 'set_number': 1})
+        box.put({'exercise_name': 'Row', 'set_number': 2})
+        time.sleep(0.1)
+        assert stub.payloads == []
+
+        box.flush()
+        assert wait_for(lambda: len(stub.payloads) == 1)
+        assert len(stub.payloads[0]) == 2
+        assert wait_for(lambda: box.pending() == [])
+    finally:
+        box.stop()
+
+
+def test_outbox_flush_with_full_queue(stub, tmp_path):
+    # The queue bound is smaller than the batch, so no wake-up sentinel fits
+    box = outbox.Outbox(stub.url, spool_dir=str(tmp_path), batching=True, max_queue=2,
+                        batch_size=10, batch_interval=60).start()
+    try:
+        for set_number in range(1, 4):
+            box.put({'exercise_name': 'Row', 'set_number': set_number})
+        time.sleep(0.2)
+        box.flush()
+        assert wait_for(lambda: len(stub.payloads) == 1, timeout=2)
+        assert [r['set_number'] for r in stub.payloads[0]] == [1, 2, 3]
+    finally:
+        box.stop()
+
+
+def test_get_outbox_reconfigures_single_worker(stub, tmp_path):
+    config_data = dict(config.DEFAULT_CONFIG, webhook_url='http://127.0.0.1:9/hook',
+                       outbox_dir=str(tmp_path), webhook_timeout=0.5)
+    box = outbox.get_outbox(config_data)
+    try:
+        changed = dict(config_data, webhook_url=stub.url, webhook_timeout=3)
+        assert outbox.get_outbox(changed) is box
+        assert box.webhook_url == stub.url
+        assert box.timeout == 3
+        workers = [t for t in threading.enumerate() if t.name == 'webhook-outbox' and t.is_alive()]
+        assert len(workers) == 1
+
+        box.put({'exercise_name': 'Squat'})
+        assert wait_for(lambda: len(stub.payloads) == 1)
+    finally:
+        box.stop()
+        outbox._outboxes.pop(str(tmp_path), None)
@@ -0,0 +1,113 @@
+import pandas as pd
+import pytest
+
+import partitions
+import storage
+from conftest import COLUMNS, make_set
+
+
+SETS = [
+    make_set('Squat', 1, '2024-01-10T10:00:00', 100.0),
+    make_set('Squat', 2, '2024-01-10T10:05:00', 105.0),
+    make_set('Bench', 1, '2024-02-12T10:00:00', 80.0, workout='Push'),
+    make_set('Squat', 1, '2024-03-05T10:00:00', 110.0),
+    make_set('Squat', 1, '2024-03-20T10:00:00', 112.5)
+]
+
+
+@pytest.fixture
+def partitioned(tmp_path):
+    backend = partitions.PartitionedStorage(str(tmp_path / 'parts'), COLUMNS)
+    backend.append_many(SETS)
+    return backend
+
+
+@pytest.fixture
+def partitions_read(partitioned, monkeypatch):
+    read = []
+    read_partition = partitioned._read_partition
+
+    def spy(entry):
+        read.append(entry['file'])
+        return read_partition(entry)
+
+    monkeypatch.setattr(partitioned, '_read_partition', spy)
+    return read
+
+
+def test_appends_go_to_monthly_partitions(partitioned, tmp_path):
+    manifest = partitioned.manifest()['partitions']
+    assert sorted(manifest) == ['2024-01.csv', '2024-02.csv', '2024-03.csv']
+    assert manifest['2024-01.csv']['rows'] == 2
+    assert manifest['2024-03.csv']['start'] == '2024-03-05T10:00:00'
+    assert manifest['2024-03.csv']['end'] == '2024-03-20T10:00:00'
+    assert manifest['2024-02.csv']['exercises'] == ['Bench']
+    assert len(partitioned.load()) == 5
+
+
+def test_history_reads_only_needed_partitions(partitioned, partitions_read):
+    history = partitioned.history()
+    assert history['workouts'] == ['Legs', 'Push']
+    assert history['exercises'] == ['Bench', 'Squat']
+
+    sessions = history['index'].last_sessions('Squat', 2)
+    assert [s['date'] for s in sessions] == ['2024-03-20', '2024-03-05']
+    # The two newest sessions live in March, so older partitions were never read
+    assert partitions_read == ['2024-03.csv']
+
+    sessions = history['index'].last_sessions('Squat', 3)
+    assert [s['sets'][-1]['weight'] for s in sessions] == [112.5, 110.0, 105.0]
+
+
+def test_history_stats_merge_partitions(partitioned, partitions_read):
+    stats = partitioned.history()['stats']
+    assert stats.exercise('Bench')['sets'] == 1
+    # Bench only lives in February, so no other partition was read
+    assert partitions_read == ['2024-02.csv']
+
+    squat = stats.exercise('Squat')
+    assert squat['best_weight'] == 112.5
+    assert squat['sets'] == 4
+    assert squat['sessions'] == 3
+    assert squat['last_date'] == '2024-03-20'
+    assert stats.workout('Legs')['sets'] == 4
+    assert [(date, top_weight) for date, top_weight, _, _ in stats.daily('Squat')] == [
+        ('2024-01-10', 105.0), ('2024-03-05', 110.0), ('2024-03-20', 112.5)
+    ]
+    assert stats.version == partitioned.version()
+
+
+def test_query_prunes_by_manifest(partitioned):
+    squats = partitioned.query(exercise_name='Squat', start='2024-03-01', end='2024-03-31T23:59:59')
+    assert squats['weight_kg'].tolist() == [110.0, 112.5]
+
+
+def test_compact_merges_closed_months(partitioned, tmp_path):
+    pytest.importorskip('pyarrow')
+    written = partitioned.compact(min_rows=3, current_month='2024-03')
+
+    assert written == ['2024-01_2024-02.parquet']
+    manifest = partitioned.manifest()['partitions']
+    assert sorted(manifest) == ['2024-01_2024-02.parquet', '2024-03.csv']
+    merged = manifest['2024-01_2024-02.parquet']
+    assert merged['rows'] == 3
+    assert merged['exercises'] == ['Bench', 'Squat']
+    assert not (tmp_path / 'parts' / '2024-01.csv').exists()
+
+    df = partitioned.load()
+    assert len(df) == 5
+    records = list(partitioned.iter_records(['exercise_name', 'set_number']))
+    assert sorted((record['exercise_name'], record['set_number']) for record in records) == [
+        ('Bench', 1), ('Squat', 1), ('Squat', 1), ('Squat', 1), ('Squat', 2)
+    ]
+    sessions = partitioned.history()['index'].last_sessions('Squat', 3)
+    assert sessions[-1]['sets'] == [{'set': 1, 'weight': 100.0, 'reps': 5}, {'set': 2, 'weight': 105.0, 'reps': 5}]
+
+
+def test_migrate_into_partitions(tmp_path):
+    source = tmp_path / 'training_log.csv'
+    pd.DataFrame(SETS).to_csv(source, index=False)
+    total = storage.migrate(str(source), 'partitioned', str(tmp_path / 'parts'), COLUMNS)
+    assert total == 5
+    backend = storage.open_storage('partitioned', str(tmp_path / 'parts'), COLUMNS)
+    assert len(backend.manifest()['partitions']) == 3
@@ -0,0 +1,130 @@
+import json
+import os
+import time
+
+import pytest
+
+import appender
+import config
+import outbox
+import replay
+from benchmarks.stub_server import StubWebhook
+from conftest import COLUMNS, make_set
+
+
+@pytest.fixture
+def stub():
+    server = StubWebhook()
+    yield server
+    server.close()
+
+
+def numbered_set(i, notes=None):
+    """Return the ``i``-th set of a log of five-set sessions, one per day."""
+    return make_set(set_number=i % 5 + 1, timestamp=f'2024-01-{i // 5 + 1:02d}T10:{i % 5:02d}:00',
+                    weight=100.0 + i, rpe=None, rest_sec=90, notes=notes)
+
+
+def write_log(path, sets):
+    appender.CsvAppender(str(path), COLUMNS).append_many(sets)
+
+
+def delivered(stub):
+    records = []
+    for payload in stub.payloads:
+        records.extend(payload if isinstance(payload, list) else [payload])
+    return records
+
+
+def test_read_log_handles_multiline_fields(tmp_path):
+    log = tmp_path / 'log.csv'
+    write_log(log, [numbered_set(0, notes='felt "heavy"\nstop early'), numbered_set(1)])
+    rows = list(replay.read_log(str(log)))
+    assert rows[0][1]['notes'] == 'felt "heavy"\nstop early'
+    assert rows[0][1]['set_number'] == 1
+    assert rows[0][1]['weight_kg'] == 100.0
+    assert rows[0][1]['rpe'] is None
+    assert rows[-1][0] == os.path.getsize(log)
+    assert list(replay.read_log(str(log), rows[0][0])) == rows[1:]
+
+
+def test_token_bucket_limits_rate():
+    bucket = replay.TokenBucket(rate=50, burst=1)
+    started = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    assert time.monotonic() - started >= 0.09
+    assert replay.TokenBucket(rate=0).acquire()
+
+
+def test_replay_sends_missing_sets_once(stub, tmp_path):
+    log = tmp_path / 'log.csv'
+    sets = [numbered_set(i) for i in range(23)]
+    write_log(log, sets)
+    state = tmp_path / 'outbox'
+    os.makedirs(state)
+    # Already delivered by the outbox, and waiting in its spool
+    outbox.DeliveredLedger(str(state / outbox.LEDGER_FILE)).add_many([sets[0], sets[1]])
+    with open(state / 'pending.json', 'w') as f:
+        json.dump(sets[2], f)
+
+    report = replay.Replay(str(log), stub.url, str(state), batch_size=4, concurrency=3, rate=0).run()
+    assert (report.rows, report.skipped, report.sent, report.failed) == (23, 3, 20, 0)
+    assert sorted(r['weight_kg'] for r in delivered(stub)) == [100.0 + i for i in range(3, 23)]
+    assert all(isinstance(payload, list) and len(payload) <= 4 for payload in stub.payloads)
+
+    # Nothing is sent twice, and only new sets are read
+    write_log(log, [numbered_set(23)])
+    report = replay.Replay(str(log), stub.url, str(state), rate=0).run()
+    assert (report.rows, report.sent) == (1, 1)
+    assert stub.payloads[-1]['weight_kg'] == 123.0
+
+
+def test_failed_batch_is_resumed(tmp_path):
+    log = tmp_path / 'log.csv'
+    write_log(log, [numbered_set(i) for i in range(10)])
+    state = str(tmp_path / 'outbox')
+    stub = StubWebhook(statuses=[200, 500])
+    try:
+        first = replay.Replay(str(log), stub.url, state, batch_size=2, concurrency=1, rate=0, max_retries=0).run()
+        assert (first.sent, first.failed) == (8, 2)
+        # The checkpoint stops at the failed batch
+        assert replay.Checkpoint(os.path.join(state, replay.CHECKPOINT_FILE), str(log)).load() < os.path.getsize(log)
+
+        second = replay.Replay(str(log), stub.url, state, batch_size=2, concurrency=1, rate=0).run()
+        assert (second.skipped, second.sent, second.failed) == (6, 2, 0)
+        assert sorted(r['weight_kg'] for r in delivered(stub)) == [100.0 + i for i in range(10)]
+        assert replay.Checkpoint(os.path.join(state, replay.CHECKPOINT_FILE), str(log)).load() == os.path.getsize(log)
+    finally:
+        stub.close()
+
+
+def test_interrupted_replay_resumes(stub, tmp_path):
+    log = tmp_path / 'log.csv'
+    write_log(log, [numbered_set(i) for i in range(200)])
+    state = str(tmp_path / 'outbox')
+    first = replay.Replay(str(log), stub.url, state, batch_size=5, concurrency=2, rate=0)
+    first.run(progress=lambda report: report.sent >= 50 and first.stop())
+    assert 50 <= len(delivered(stub)) < 200
+
+    report = replay.Replay(str(log), stub.url, state, batch_size=5, concurrency=2, rate=0).run()
+    assert report.rows < 200
+    assert sorted(r['weight_kg'] for r in delivered(stub)) == [100.0 + i for i in range(200)]
+
+
+def test_outbox_records_delivered_sets(stub, tmp_path):
+    config_data = dict(config.DEFAULT_CONFIG, webhook_url=stub.url, outbox_dir=str(tmp_path))
+    box = outbox.get_outbox(config_data)
+    try:
+        box.put(numbered_set(0))
+        ledger = outbox.DeliveredLedger(str(tmp_path / outbox.LEDGER_FILE))
+        deadline = time.time() + 5
+        while numbered_set(0) not in ledger and time.time() < deadline:
+            time.sleep(0.01)
+            ledger.reload()
+        assert numbered_set(0) in ledger
+        # The form sends numbers, the log stores text; both give the same key
+        assert outbox.record_key(numbered_set(0)) == outbox.record_key(dict(numbered_set(0), set_number='1.0'))
+    finally:
+        box.stop()
+        outbox._outboxes.pop(str(tmp_path), None)
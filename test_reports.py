@@ -0,0 +1,121 @@
+import os
+
+import pandas as pd
+import pytest
+
+import reports
+from benchmarks.generate import generate_log
+from conftest import make_set
+
+
+def write_log(path, sets):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pd.DataFrame(sets).to_csv(path, index=False)
+
+
+@pytest.fixture
+def logs(tmp_path):
+    alice = str(tmp_path / 'alice' / reports.LOG_FILE)
+    write_log(alice, [
+        make_set('Back Squat', 1, '2024-01-01T10:00:00', 100),  # Monday
+        make_set('Back Squat', 1, '2024-01-07T10:00:00', 105),  # Sunday, same week
+        make_set('Back Squat', 1, '2024-01-08T10:00:00', 100),
+        make_set('Back Squat', 1, '2024-01-15T10:00:00', 110),
+        make_set('Bench Press', 1, '2024-01-02T10:00:00', 80, reps=1)
+    ])
+    bob = str(tmp_path / 'bob.csv')
+    write_log(bob, [make_set('Cable Thing', 1, '2024-01-03T10:00:00', 20, reps=10)])
+    return [alice, bob]
+
+
+def test_find_logs_and_user_ids(logs, tmp_path):
+    assert reports.find_logs([str(tmp_path), str(tmp_path / '*.csv')]) == sorted(logs)
+    assert [reports.user_id(path) for path in logs] == ['alice', 'bob']
+
+
+def test_muscle_groups():
+    assert reports.muscle_group('Back Squat') == 'legs'
+    assert reports.muscle_group('Bench Press') == 'chest'
+    assert reports.muscle_group('Leg Press') == 'legs'
+    assert reports.muscle_group('Overhead Press') == 'shoulders'
+    assert reports.muscle_group('Cable Thing') == 'other'
+    assert reports.muscle_group('Cable Thing', {'Cable Thing': 'back'}) == 'back'
+
+
+def test_weekly_volume_and_prs(logs):
+    tables, errors = reports.build_reports(logs, workers=2, overrides={'Cable Thing': 'back'})
+    assert errors == {}
+
+    weekly = tables['weekly']
+    squat = weekly[(weekly['user'] == 'alice') & (weekly['exercise_name'] == 'Back Squat')]
+    assert squat['week'].dt.strftime('%Y-%m-%d').tolist() == ['2024-01-01', '2024-01-08', '2024-01-15']
+    assert squat['sets'].tolist() == [2, 1, 1]
+    assert squat['volume'].tolist() == [1025.0, 500.0, 550.0]
+    assert squat['top_weight'].tolist() == [105.0, 100.0, 110.0]
+    assert squat['volume_change'].round(3).tolist()[1:] == [-0.512, 0.1]
+    assert squat['is_pr'].tolist() == [True, False, True]
+
+    prs = tables['prs']
+    assert prs[prs['exercise_name'] == 'Back Squat']['best_e1rm'].tolist() == [105 * (1 + 5 / 30), 110 * (1 + 5 / 30)]
+    # A single rep counts as the 1RM itself
+    assert prs[prs['exercise_name'] == 'Bench Press']['best_e1rm'].tolist() == [80.0]
+
+    groups = tables['muscle_groups'].groupby(['user', 'muscle_group'], observed=True).sum(numeric_only=True)
+    assert groups.loc[('alice', 'legs'), 'sets'] == 4
+    assert groups.loc[('alice', 'chest'), 'volume'] == 80.0
+    assert groups.loc[('bob', 'back'), 'sets'] == 1
+
+
+def test_unreadable_logs_are_reported(logs, tmp_path):
+    missing = str(tmp_path / 'missing.csv')
+    tables, errors = reports.build_reports(logs + [missing], workers=1)
+    assert list(errors) == [missing]
+    assert set(tables['weekly']['user']) == {'alice', 'bob'}
+
+
+def test_malformed_log_is_reported_not_raised(logs, tmp_path):
+    malformed = str(tmp_path / 'dave.csv')
+    write_log(malformed, [make_set('Back Squat', 1, '2024-01-01T10:00:00', 100)])
+    pd.read_csv(malformed).drop(columns='reps').to_csv(malformed, index=False)
+    path, weekly, error = reports.summarize_log(malformed)
+    assert (path, weekly) == (malformed, None)
+    assert error.startswith('KeyError')
+
+    tables, errors = reports.build_reports(logs + [malformed], workers=1)
+    assert list(errors) == [malformed]
+    assert set(tables['weekly']['user']) == {'alice', 'bob'}
+
+
+def test_mixed_utc_offsets_are_summarized(tmp_path):
+    path = str(tmp_path / 'erin.csv')
+    write_log(path, [
+        make_set('Back Squat', 1, '2024-01-02T10:00:00', 100),
+        make_set('Back Squat', 1, '2024-01-03T10:00:00+01:00', 105),
+        make_set('Back Squat', 1, '2024-01-10T10:00:00Z', 110)
+    ])
+    _, weekly, error = reports.summarize_log(path)
+    assert error is None
+    assert weekly['week'].dt.strftime('%Y-%m-%d').tolist() == ['2024-01-01', '2024-01-08']
+    assert weekly['sets'].tolist() == [2, 1]
+
+
+def test_summary_matches_the_log(tmp_path):
+    path = str(tmp_path / 'carol' / reports.LOG_FILE)
+    os.makedirs(os.path.dirname(path))
+    generate_log(path, 3000, seed=2)
+    _, weekly, error = reports.summarize_log(path)
+    assert error is None
+    log = pd.read_csv(path)
+    assert weekly['sets'].sum() == len(log)
+    assert weekly['volume'].sum() == pytest.approx((log['weight_kg'] * log['reps']).sum())
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'parquet'])
+def test_write_reports(logs, tmp_path, fmt):
+    if fmt == 'parquet':
+        pytest.importorskip('pyarrow')
+    tables, _ = reports.build_reports(logs, workers=1)
+    written = reports.write_reports(tables, str(tmp_path / 'out'), fmt)
+    assert sorted(os.path.basename(path) for path in written) == sorted(f"{name}.{fmt}" for name in reports.REPORTS)
+    read = pd.read_parquet if fmt == 'parquet' else pd.read_csv
+    assert len(read(os.path.join(str(tmp_path / 'out'), f"weekly.{fmt}"))) == len(tables['weekly'])
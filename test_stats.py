@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+
+import stats
+from benchmarks.generate import generate_frame
+from conftest import make_set
+
+
+def test_update_tracks_bests_volume_and_last_date():
+    store = stats.StatsStore()
+    store.update(make_set('Squat', 1, '2024-01-15T10:00:00', 100.0, 5))
+    store.update(make_set('Squat', 2, '2024-01-15T10:05:00', 110.0, 3))
+    store.update(make_set('Squat', 1, '2024-01-17T10:00:00', 90.0, 10))
+
+    summary = store.exercise('Squat')
+    assert summary['best_weight'] == 110.0
+    assert summary['best_e1rm'] == pytest.approx(110.0 * (1 + 3 / 30))
+    assert summary['sets'] == 3
+    assert summary['sessions'] == 2
+    assert summary['last_date'] == '2024-01-17'
+    assert summary['last_volume'] == 900.0
+    assert store.session_volumes('Squat') == {'2024-01-15': 830.0, '2024-01-17': 900.0}
+    assert store.daily('Squat') == [
+        ('2024-01-15', 110.0, pytest.approx(110.0 * (1 + 3 / 30)), 830.0),
+        ('2024-01-17', 90.0, 120.0, 900.0)
+    ]
+    assert store.workout('Legs')['sets'] == 3
+    assert store.exercise('Missing') is None
+
+
+def test_epley_single_rep_is_the_weight():
+    assert stats.epley(100.0, 1) == 100.0
+    assert stats.epley(100.0, 30) == 200.0
+
+
+def test_vectorized_rebuild_matches_set_by_set_updates():
+    df = generate_frame(2000, seed=1)
+    df.loc[5, 'weight_kg'] = None
+    df.loc[7, 'timestamp'] = 'not a date'
+    rebuilt = stats.StatsStore.from_frame(df)
+    incremental = stats.StatsStore()
+    for record in df.to_dict('records'):
+        incremental.update(record)
+
+    for name in df['exercise_name'].unique():
+        assert rebuilt.exercise(name) == pytest.approx(incremental.exercise(name))
+        assert rebuilt.session_volumes(name) == pytest.approx(incremental.session_volumes(name))
+        rebuilt_daily, incremental_daily = rebuilt.daily(name), incremental.daily(name)
+        assert [day[0] for day in rebuilt_daily] == [day[0] for day in incremental_daily]
+        assert [value for day in rebuilt_daily for value in day[1:]] == pytest.approx(
+            [value for day in incremental_daily for value in day[1:]], nan_ok=True
+        )
+    for name in df['workout_name'].unique():
+        assert rebuilt.workout(name) == pytest.approx(incremental.workout(name))
+
+
+def test_merge_combines_stores():
+    first = stats.StatsStore.from_frame(pd.DataFrame([make_set('Squat', 1, '2024-01-15T10:00:00', 100.0, 5)]))
+    second = stats.StatsStore.from_frame(pd.DataFrame([make_set('Squat', 1, '2024-02-01T10:00:00', 120.0, 1)]))
+    first.merge(second)
+    summary = first.exercise('Squat')
+    assert summary['best_weight'] == 120.0
+    assert summary['sets'] == 2
+    assert summary['last_date'] == '2024-02-01'
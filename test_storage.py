@@ -0,0 +1,172 @@
+import threading
+
+import pandas as pd
+import pytest
+
+import storage
+from conftest import COLUMNS, make_set
+
+
+SETS = [
+    make_set('Squat', 1, '2024-01-15T10:00:00'),
+    make_set('Squat', 2, '2024-01-15T10:05:00', 105.0),
+    make_set('Bench', 1, '2024-01-15T10:30:00', 80.0),
+    make_set('Squat', 1, '2024-02-01T10:00:00', 110.0)
+]
+
+
+@pytest.fixture(params=['csv', 'sqlite', 'parquet'])
+def backend(request, tmp_path):
+    if request.param == 'parquet':
+        pytest.importorskip('pyarrow')
+    path = tmp_path / {'csv': 'log.csv', 'sqlite': 'log.db', 'parquet': 'log_parquet'}[request.param]
+    cls = {'csv': storage.CsvStorage, 'sqlite': storage.SqliteStorage, 'parquet': storage.ParquetStorage}[request.param]
+    return cls(str(path), COLUMNS)
+
+
+def test_storage_round_trip(backend):
+    backend.append(SETS[0])
+    backend.append_many(SETS[1:])
+    df = backend.load()
+    assert len(df) == 4
+    assert sorted(df['exercise_name'].unique().tolist()) == ['Bench', 'Squat']
+    assert sorted(df['weight_kg'].tolist()) == [80.0, 100.0, 105.0, 110.0]
+
+
+def test_storage_query(backend):
+    backend.append_many(SETS)
+    squats = backend.query(exercise_name='Squat')
+    assert len(squats) == 3
+    january = backend.query(exercise_name='Squat', start='2024-01-01', end='2024-01-31T23:59:59')
+    assert sorted(january['set_number'].tolist()) == [1, 2]
+
+
+def test_storage_history_tracks_appends(backend):
+    backend.append_many(SETS[:2])
+    history = backend.history()
+    assert history['exercises'] == ['Squat']
+    backend.append(SETS[2])
+    history = backend.history()
+    assert history['exercises'] == ['Bench', 'Squat']
+    assert history['index'].last_sessions('Bench')[0]['sets'][0]['weight'] == 80.0
+
+
+def test_storage_iter_records_reads_only_the_given_columns(backend):
+    backend.append_many(SETS)
+    records = list(backend.iter_records(['exercise_name', 'timestamp']))
+    assert all(list(record) == ['exercise_name', 'timestamp'] for record in records)
+    assert sorted(record['timestamp'] for record in records) == sorted(s['timestamp'] for s in SETS)
+
+
+def test_sqlite_history_reads_only_new_rows(tmp_path, monkeypatch):
+    backend = storage.SqliteStorage(str(tmp_path / 'log.db'), COLUMNS)
+    backend.append_many(SETS[:3])
+    history = backend.history()
+    read_after = []
+    rows_after = backend.rows_after
+
+    def spy(last_id, *args):
+        read_after.append(last_id)
+        return rows_after(last_id, *args)
+
+    monkeypatch.setattr(backend, 'rows_after', spy)
+
+    backend.append(SETS[3])
+    updated = backend.history()
+    assert read_after == [3]
+    assert updated['index'] is history['index']
+    assert updated['stats'].exercise('Squat')['sets'] == 3
+    assert updated['index'].last_sessions('Squat')[0]['date'] == '2024-02-01'
+    assert len(updated['data']) == 4
+
+
+def test_parquet_history_follows_staged_sets(tmp_path, monkeypatch):
+    pytest.importorskip('pyarrow')
+    backend = storage.ParquetStorage(str(tmp_path / 'log_parquet'), COLUMNS, flush_rows=3)
+    backend.append_many(SETS[:3])
+    history = backend.history()
+    reads = []
+    read_parquet = pd.read_parquet
+    monkeypatch.setattr(pd, 'read_parquet', lambda *args, **kwargs: reads.append(args) or read_parquet(*args, **kwargs))
+
+    # Staged sets are parsed from the staging file alone
+    backend.append(SETS[3])
+    updated = backend.history()
+    assert reads == []
+    assert updated['index'] is history['index']
+    assert updated['stats'].exercise('Squat')['sets'] == 3
+    assert len(updated['data']) == 4
+
+    # A flush rebuilds the history from the Parquet files once
+    backend.append_many([
+        make_set('Deadlift', 1, '2024-02-02T10:00:00'),
+        make_set('Deadlift', 2, '2024-02-02T10:05:00')
+    ])
+    flushed = backend.history()
+    assert len(reads) == 1
+    assert flushed['exercises'] == ['Bench', 'Deadlift', 'Squat']
+    assert len(flushed['data']) == 6
+
+
+def test_parquet_flushes_staging_into_partitions(tmp_path):
+    pytest.importorskip('pyarrow')
+    backend = storage.ParquetStorage(str(tmp_path / 'log_parquet'), COLUMNS, flush_rows=3)
+    backend.append_many(SETS[:3])
+    backend.append(SETS[3])
+    assert (tmp_path / 'log_parquet' / 'year_month=2024-01').is_dir()
+    assert len(backend.load()) == 4
+    # Flushed and staged sets are both streamed
+    assert sorted(float(r['weight_kg']) for r in backend.iter_records(['weight_kg'])) == [80.0, 100.0, 105.0, 110.0]
+
+
+def test_migrate_csv_to_sqlite(tmp_path):
+    source = tmp_path / 'training_log.csv'
+    pd.DataFrame(SETS).to_csv(source, index=False)
+    target = tmp_path / 'training_log.db'
+
+    total = storage.migrate(str(source), 'sqlite', str(target), COLUMNS, chunksize=2)
+
+    assert total == 4
+    migrated = storage.SqliteStorage(str(target), COLUMNS).load()
+    assert migrated['exercise_name'].tolist() == [s['exercise_name'] for s in SETS]
+
+
+def test_csv_storage_follows_column_order(tmp_path):
+    backend = storage.CsvStorage(str(tmp_path / 'log.csv'), COLUMNS)
+    backend.append(SETS[0])
+    reordered = {'timestamp': '2024-03-01T10:00:00', 'reps': 5, 'exercise_name': 'Row',
+                 'workout_name': 'Workout 2', 'set_number': 1, 'weight_kg': 60.0}
+    backend.append(reordered)
+    df = backend.load()
+    assert df.columns.tolist() == COLUMNS
+    assert df.iloc[1]['workout_name'] == 'Workout 2'
+    assert df.iloc[1]['timestamp'] == '2024-03-01T10:00:00'
+    assert pd.isna(df.iloc[1]['notes'])
+
+
+def test_parquet_concurrent_appends_keep_every_row(tmp_path):
+    pytest.importorskip('pyarrow')
+    backend = storage.ParquetStorage(str(tmp_path / 'log_parquet'), COLUMNS, flush_rows=5)
+
+    def writer(thread):
+        for set_number in range(40):
+            backend.append(make_set(f'Exercise {thread}', set_number, '2024-01-15T10:00:00'))
+
+    threads = [threading.Thread(target=writer, args=(thread,)) for thread in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(backend.load()) == 160
+
+
+def test_migrate_refuses_non_empty_target(tmp_path):
+    source = tmp_path / 'training_log.csv'
+    pd.DataFrame(SETS[:1]).to_csv(source, index=False)
+    target = str(tmp_path / 'training_log.db')
+
+    storage.migrate(str(source), 'sqlite', target, COLUMNS)
+    with pytest.raises(ValueError):
+        storage.migrate(str(source), 'sqlite', target, COLUMNS)
+    assert storage.migrate(str(source), 'sqlite', target, COLUMNS, overwrite=True) == 1
+    assert len(storage.SqliteStorage(target, COLUMNS).load()) == 1
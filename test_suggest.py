@@ -0,0 +1,54 @@
+import pandas as pd
+
+import suggest
+
+
+def make_index():
+    index = suggest.SuggestionIndex()
+    index.add('Bench Press', count=20, last_seen='2024-01-01T10:00:00')
+    index.add('Back Squat', count=5, last_seen='2024-06-01T10:00:00')
+    index.add('Barbell Row', count=1, last_seen='2023-01-01T10:00:00')
+    index.add('Deadlift', count=8, last_seen='2024-05-20T10:00:00')
+    return index
+
+
+def test_empty_query_ranks_by_frequency_and_recency():
+    index = make_index()
+    ranked = index.suggest()
+    # Recent use outweighs a larger but older count
+    assert ranked[:2] == ['Back Squat', 'Deadlift']
+    assert ranked[-1] == 'Barbell Row'
+    assert index.suggest(limit=2) == ranked[:2]
+
+
+def test_prefix_then_substring_then_fuzzy():
+    index = make_index()
+    assert index.suggest('ba') == ['Back Squat', 'Barbell Row']
+    assert index.suggest('BENCH') == ['Bench Press']
+    assert index.suggest('squat') == ['Back Squat']
+    assert index.suggest('dedlift') == ['Deadlift']
+    assert index.suggest('zzz') == []
+
+
+def test_results_are_capped():
+    index = suggest.SuggestionIndex()
+    for i in range(500):
+        index.add(f"Exercise {i:03d}", last_seen='2024-01-01')
+    assert len(index) == 500
+    assert len(index.suggest(limit=10)) == 10
+    assert index.suggest('exercise 1', limit=5) == [f"Exercise {i:03d}" for i in range(100, 105)]
+
+
+def test_add_frame_counts_and_updates_incrementally():
+    df = pd.DataFrame({
+        'exercise_name': ['Squat', 'Squat', 'Bench', None],
+        'timestamp': ['2024-01-01T10:00:00', '2024-01-02T10:00:00', '2024-01-02T11:00:00', '2024-01-03T10:00:00']
+    })
+    index = suggest.SuggestionIndex.from_frame(df, 'exercise_name')
+    assert index.names() == ['Bench', 'Squat']
+    assert index.suggest() == ['Squat', 'Bench']
+
+    for _ in range(3):
+        index.add('Bench', last_seen='2024-01-03T10:00:00')
+    assert index.suggest() == ['Bench', 'Squat']
+    assert 'Bench' in index and 'Row' not in index